@@ -0,0 +1,308 @@
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import asyncio
+import subprocess
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import httpx
+import numpy as np
+from benchmarks.synthetic import write_documents, generate_questions
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Working directory of a run, deleted at the start of every run
+BENCHMARK_DIR = os.path.abspath(os.getenv("BENCHMARK_DIR", "benchmark_run"))
+# Results file, to be compared with another run by `python -m benchmarks.run compare`.
+# Defaults to benchmark_results/<UTC timestamp>.json.
+BENCHMARK_OUTPUT = os.getenv("BENCHMARK_OUTPUT", "")
+# Size of the synthetic corpus: articles per document (one document per LegalDocsEnum member) and words per article
+BENCHMARK_ARTICLES = int(os.getenv("BENCHMARK_ARTICLES", "500"))
+BENCHMARK_ARTICLE_WORDS = int(os.getenv("BENCHMARK_ARTICLE_WORDS", "120"))
+BENCHMARK_SEED = int(os.getenv("BENCHMARK_SEED", "0"))
+# Embedding dimension and context size of the generated tiny model
+BENCHMARK_MODEL_DIM = int(os.getenv("BENCHMARK_MODEL_DIM", "64"))
+BENCHMARK_MODEL_SEQ_LENGTH = int(os.getenv("BENCHMARK_MODEL_SEQ_LENGTH", "128"))
+# Load test: concurrent clients, measured requests per endpoint, distinct questions and unmeasured warm-up requests
+BENCHMARK_CONCURRENCY = int(os.getenv("BENCHMARK_CONCURRENCY", "16"))
+BENCHMARK_REQUESTS = int(os.getenv("BENCHMARK_REQUESTS", "400"))
+BENCHMARK_QUESTIONS = int(os.getenv("BENCHMARK_QUESTIONS", "200"))
+BENCHMARK_WARMUP = int(os.getenv("BENCHMARK_WARMUP", "10"))
+BENCHMARK_TOP_K = int(os.getenv("BENCHMARK_TOP_K", "5"))
+# Skip the answer cache of /ask, so every request reaches the (fake) LLM
+BENCHMARK_ASK_BYPASS_CACHE = os.getenv("BENCHMARK_ASK_BYPASS_CACHE", "true") == "true"
+# Simulated latency of the fake LLM, in seconds
+BENCHMARK_LLM_FIRST_TOKEN_DELAY = os.getenv("BENCHMARK_LLM_FIRST_TOKEN_DELAY", "0.05")
+BENCHMARK_LLM_TOKEN_DELAY = os.getenv("BENCHMARK_LLM_TOKEN_DELAY", "0.001")
+BENCHMARK_STARTUP_TIMEOUT = float(os.getenv("BENCHMARK_STARTUP_TIMEOUT", "180"))
+
+SERVICES_DIR = os.path.join(ROOT, "services")
+PERCENTILES = [50, 90, 95, 99]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def stand_in_env(model_path: str) -> Dict[str, str]:
+    """Environment pointing every service at the local stand-ins inside BENCHMARK_DIR"""
+    from benchmarks.tiny_model import TINY_MODEL_NAME
+
+    return {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.getenv("PYTHONPATH")])),
+        "PYTHONUNBUFFERED": "1",
+        "MINIO_BACKEND": "local",
+        "LOCAL_STORAGE_PATH": os.path.join(BENCHMARK_DIR, "minio"),
+        "DATABASE_URL": f"sqlite:///{os.path.join(BENCHMARK_DIR, 'articles.db')}",
+        "VECTOR_BACKEND": "local",
+        "LOCAL_INDEX_PATH": os.path.join(BENCHMARK_DIR, "local_index"),
+        "LEXICAL_INDEX_PATH": os.path.join(BENCHMARK_DIR, "lexical_index"),
+        "STUB_DOCS_DIR": os.path.join(BENCHMARK_DIR, "docs"),
+        "EMBEDDING_MODEL": TINY_MODEL_NAME,
+        "ENCODER_MODEL_PATH": model_path,
+        "EMBEDDING_DIM": str(BENCHMARK_MODEL_DIM),
+        "HF_HUB_OFFLINE": "1",
+    }
+
+
+def run_stage(stage: str, service: str, env: Dict[str, str]) -> Dict:
+    """Run one stage of `benchmarks.stages` in the directory of its service and return its measurements"""
+    output = os.path.join(BENCHMARK_DIR, f"{stage}.json")
+    print(f"Running the {stage} stage...")
+    with open(os.path.join(BENCHMARK_DIR, "logs", f"{stage}.log"), "w") as log:
+        subprocess.run([sys.executable, "-m", "benchmarks.stages", stage, output], cwd=os.path.join(SERVICES_DIR, service),
+                       env=env, stdout=log, stderr=subprocess.STDOUT, check=True)
+    with open(output) as file:
+        return json.load(file)
+
+
+def start_server(name: str, args: List[str], env: Dict[str, str]) -> subprocess.Popen:
+    log = open(os.path.join(BENCHMARK_DIR, "logs", f"{name}.log"), "w")
+    return subprocess.Popen([sys.executable, "-m", *args], cwd=os.path.join(SERVICES_DIR, "legal_search_api"),
+                            env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout=BENCHMARK_STARTUP_TIMEOUT) -> float:
+    """Poll `url` until it answers, return the startup time"""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode} before answering {url}, see {BENCHMARK_DIR}/logs")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return time.perf_counter() - start
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not answer within {timeout:.0f}s")
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    """Durations in milliseconds from a Server-Timing header, e.g. "encode;dur=1.2, search;dur=3.4" """
+    timings = {}
+    for entry in filter(None, (entry.strip() for entry in header.split(","))):
+        name, _, duration = entry.partition(";dur=")
+        if duration:
+            timings[name] = timings.get(name, 0.0) + float(duration)
+    return timings
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float, server_timings: List[Dict[str, float]]) -> Dict:
+    """Throughput and latency percentiles (ms) of a load test, with the mean duration of every server-side stage"""
+    latencies_ms = np.asarray(latencies) * 1000
+    summary = {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": elapsed,
+        "requests_per_sec": len(latencies) / elapsed if elapsed else 0.0,
+        "mean_ms": float(latencies_ms.mean()) if len(latencies) else None,
+        **{f"p{q}_ms": float(np.percentile(latencies_ms, q)) if len(latencies) else None for q in PERCENTILES},
+    }
+    stages = sorted({stage for timings in server_timings for stage in timings})
+    summary["server_timing_mean_ms"] = {
+        stage: sum(timings.get(stage, 0.0) for timings in server_timings) / len(server_timings) for stage in stages
+    }
+    return summary
+
+
+async def load_test(url: str, payloads: List[Dict], concurrency: int) -> Dict:
+    """Send every payload to `url` from `concurrency` concurrent clients"""
+    latencies = []
+    server_timings = []
+    errors = 0
+    pending = iter(payloads)
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal errors
+        for payload in pending:
+            start = time.perf_counter()
+            try:
+                response = await client.post(url, json=payload)
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            if response.status_code != 200:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            server_timings.append(parse_server_timing(response.headers.get("Server-Timing", "")))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[worker(client) for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+    return summarize(latencies, errors, elapsed, server_timings)
+
+
+def serve_stage(env: Dict[str, str]) -> Dict:
+    """Start the fake LLM and the search API on the stand-ins, then load /query and /ask concurrently"""
+    llm_port, api_port = free_port(), free_port()
+    llm = start_server("fake_llm", ["src.fake_llm"], {
+        **env,
+        "FAKE_LLM_PORT": str(llm_port),
+        "FAKE_LLM_FIRST_TOKEN_DELAY": BENCHMARK_LLM_FIRST_TOKEN_DELAY,
+        "FAKE_LLM_TOKEN_DELAY": BENCHMARK_LLM_TOKEN_DELAY,
+    })
+    api = start_server("legal_search_api", ["uvicorn", "src.main:app", "--host", "127.0.0.1", "--port", str(api_port)], {
+        **env,
+        "LLM_BASE_URL": f"http://127.0.0.1:{llm_port}",
+        "DEEPSEEK_API_KEY": "benchmark",
+    })
+    api_url = f"http://127.0.0.1:{api_port}"
+    try:
+        wait_until_ready(f"http://127.0.0.1:{llm_port}/stats", llm)
+        print("Starting the search API...")
+        result = {"api_startup_seconds": wait_until_ready(f"{api_url}/stats", api)}
+
+        questions = generate_questions(BENCHMARK_QUESTIONS, BENCHMARK_SEED)
+        for endpoint in ("query", "ask"):
+            payloads = [
+                {"question": questions[idx % len(questions)], "top_k": BENCHMARK_TOP_K}
+                for idx in range(BENCHMARK_WARMUP + BENCHMARK_REQUESTS)
+            ]
+            if endpoint == "ask":
+                for payload in payloads:
+                    payload["bypass_cache"] = BENCHMARK_ASK_BYPASS_CACHE
+            asyncio.run(load_test(f"{api_url}/{endpoint}", payloads[:BENCHMARK_WARMUP], BENCHMARK_CONCURRENCY))
+            print(f"Load testing /{endpoint} with {BENCHMARK_CONCURRENCY} concurrent clients...")
+            result[endpoint] = asyncio.run(load_test(f"{api_url}/{endpoint}", payloads[BENCHMARK_WARMUP:], BENCHMARK_CONCURRENCY))
+        return result
+    finally:
+        for process in (api, llm):
+            process.terminate()
+            process.wait()
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def read_documents(directory: str):
+    for name in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, name), encoding="utf-8") as file:
+            yield file.read()
+
+
+def run() -> Dict:
+    from benchmarks.tiny_model import build_tiny_model
+
+    shutil.rmtree(BENCHMARK_DIR, ignore_errors=True)
+    os.makedirs(os.path.join(BENCHMARK_DIR, "logs"))
+    started_at = datetime.now(timezone.utc).isoformat()
+    start = time.perf_counter()
+
+    print("Generating the synthetic corpus...")
+    corpus_bytes = write_documents(os.path.join(BENCHMARK_DIR, "docs"), BENCHMARK_ARTICLES, BENCHMARK_ARTICLE_WORDS, BENCHMARK_SEED)
+    model_path = os.path.join(BENCHMARK_DIR, "model")
+    print("Building the tiny embedding model...")
+    build_tiny_model(model_path, read_documents(os.path.join(BENCHMARK_DIR, "docs")), dim=BENCHMARK_MODEL_DIM,
+                     max_seq_length=BENCHMARK_MODEL_SEQ_LENGTH, seed=BENCHMARK_SEED)
+
+    env = stand_in_env(model_path)
+    stages = {
+        "collect": run_stage("collect", "data_collection", env),
+        "process": run_stage("process", "data_processing", env),
+        "embed": run_stage("embed", "embeddings_generation", env),
+    }
+    stages["collect"]["mb_per_sec"] = corpus_bytes / 2**20 / stages["collect"]["cold"]["seconds"]
+    stages["serve"] = serve_stage(env)
+
+    return {
+        "started_at": started_at,
+        "commit": git_commit(),
+        "total_seconds": time.perf_counter() - start,
+        "settings": {
+            "articles_per_document": BENCHMARK_ARTICLES,
+            "words_per_article": BENCHMARK_ARTICLE_WORDS,
+            "corpus_bytes": corpus_bytes,
+            "model_dim": BENCHMARK_MODEL_DIM,
+            "model_seq_length": BENCHMARK_MODEL_SEQ_LENGTH,
+            "concurrency": BENCHMARK_CONCURRENCY,
+            "requests": BENCHMARK_REQUESTS,
+            "questions": BENCHMARK_QUESTIONS,
+            "ask_bypass_cache": BENCHMARK_ASK_BYPASS_CACHE,
+            "seed": BENCHMARK_SEED,
+        },
+        "stages": stages,
+    }
+
+
+def flatten(result: Dict, prefix="") -> Dict[str, float]:
+    """Numeric leaves of a results file, keyed by their dotted path"""
+    flat = {}
+    for key, value in result.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{path}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(baseline_path: str, current_path: str):
+    """Print every measurement of two results files side by side, with the relative change"""
+    with open(baseline_path) as file:
+        baseline = flatten(json.load(file)["stages"])
+    with open(current_path) as file:
+        current = flatten(json.load(file)["stages"])
+    print(f"{'measurement':<52} {'baseline':>12} {'current':>12} {'change':>8}")
+    for key in sorted(set(baseline) | set(current)):
+        old, new = baseline.get(key), current.get(key)
+        change = f"{(new - old) / old * 100:+.1f}%" if old and new is not None else ""
+        print(f"{key:<52} {'' if old is None else f'{old:.3f}':>12} {'' if new is None else f'{new:.3f}':>12} {change:>8}")
+
+
+def main():
+    """
+    Usage: python -m benchmarks.run              run every stage and write the results to BENCHMARK_OUTPUT
+           python -m benchmarks.run compare <baseline.json> <current.json>
+    """
+    if len(sys.argv) > 1:
+        if sys.argv[1] != "compare" or len(sys.argv) != 4:
+            print(main.__doc__.strip())
+            sys.exit(1)
+        compare(sys.argv[2], sys.argv[3])
+        return
+
+    output = BENCHMARK_OUTPUT or os.path.join("benchmark_results", f"{datetime.now(timezone.utc):%Y%m%d-%H%M%S}.json")
+    result = run()
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(result, file, indent=2)
+    print(json.dumps(result["stages"], indent=2))
+    print(f"Results written to {output} in {result['total_seconds']:.1f}s.")
+
+
+if __name__ == '__main__':
+    main()
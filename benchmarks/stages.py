@@ -0,0 +1,151 @@
+import sys
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer
+from typing import Dict
+from core.legal_docs import LegalDocsEnum
+
+
+BUCKET_NAME = "legal-docs-minio-bucket"
+
+
+def collect_stage() -> Dict:
+    """
+    Collect every document from a local stub of the legislation portal twice: a cold run that downloads and
+    stores everything, then a warm run where every document is answered with a 304. Runs in data_collection.
+    """
+    from src.main import SavingUtilities
+    from src.stub_server import StubHandler
+
+    class QuietStubHandler(StubHandler):
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), QuietStubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    result = {}
+    try:
+        for run in ("cold", "warm"):
+            start = time.perf_counter()
+            manifest = SavingUtilities(base_url=base_url).collect()
+            result[run] = {
+                "seconds": time.perf_counter() - start,
+                **{status: len(manifest[status]) for status in ("changed", "unchanged", "failed")},
+            }
+    finally:
+        server.shutdown()
+    result["documents"] = len(LegalDocsEnum)
+    return result
+
+
+def process_stage() -> Dict:
+    """
+    Fetch and parse every document in the current process, then time the bulk write of the articles and the
+    build of the lexical index. Runs in data_processing.
+    """
+    from core.postgres_db import create_schema, bulk_upsert_articles
+    from core.lexical_index import update_lexical_index
+    from src.main import parse_legal_doc, PARSER
+
+    create_schema()
+    fetch_seconds = parse_seconds = 0.0
+    articles = []
+    for document in LegalDocsEnum:
+        parsed = parse_legal_doc(document, BUCKET_NAME, PARSER)
+        if parsed["articles"] is None:
+            raise RuntimeError(f"{document.name} was not collected")
+        fetch_seconds += parsed["fetch_time"]
+        parse_seconds += parsed["parse_time"]
+        articles.extend(parsed["articles"])
+
+    start = time.perf_counter()
+    written = bulk_upsert_articles(articles)
+    write_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    update_lexical_index(written["touched_ids"])
+    lexical_seconds = time.perf_counter() - start
+
+    return {
+        "parser": PARSER,
+        "articles": len(articles),
+        "body_chars": sum(len(article["article_body"]) for article in articles),
+        "fetch_seconds": fetch_seconds,
+        "parse_seconds": parse_seconds,
+        "articles_per_sec": len(articles) / parse_seconds if parse_seconds else 0.0,
+        "write_seconds": write_seconds,
+        "inserted": written["inserted"],
+        "lexical_index_seconds": lexical_seconds,
+    }
+
+
+def embed_stage() -> Dict:
+    """
+    Chunk, encode and index every article, timing each step on its own instead of interleaved like
+    `run_batched_pipeline`. Runs in embeddings_generation.
+    """
+    from core.encoder import load_encoder, encoder_id, ENCODER_BACKEND
+    from core.postgres_db import stream_articles
+    from core.qdrant_db import get_qdrant_client, setup_qdrant_collection, store_embeddings_bulk_qdrant
+    from src.pipeline import CHUNKER, encode_buffer, iter_chunk_buffers, with_content_hashes
+
+    start = time.perf_counter()
+    model = load_encoder()
+    load_seconds = time.perf_counter() - start
+
+    setup_qdrant_collection()
+    hashed = list(with_content_hashes(stream_articles(), encoder_id(), model))
+    extra_payloads = {article.id: {"content_hash": content_hash} for article, content_hash in hashed}
+
+    start = time.perf_counter()
+    buffers = list(iter_chunk_buffers(model, [article for article, _ in hashed]))
+    chunk_seconds = time.perf_counter() - start
+    chunks = sum(len(entry[1]) for buffer in buffers for entry in buffer)
+
+    start = time.perf_counter()
+    encoded = [encode_buffer(model, buffer) for buffer in buffers]
+    encode_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for buffer, records in zip(buffers, encoded):
+        chunk_spans = {article.id: spans for article, _, _, spans in buffer if spans is not None}
+        store_embeddings_bulk_qdrant(records, extra_payloads=extra_payloads, chunk_spans=chunk_spans)
+    client = get_qdrant_client()
+    if hasattr(client, "flush"):
+        client.flush()
+    index_seconds = time.perf_counter() - start
+
+    return {
+        "encoder_backend": ENCODER_BACKEND,
+        "chunker": CHUNKER,
+        "articles": len(hashed),
+        "chunks": chunks,
+        "model_load_seconds": load_seconds,
+        "chunk_seconds": chunk_seconds,
+        "encode_seconds": encode_seconds,
+        "encode_chunks_per_sec": chunks / encode_seconds if encode_seconds else 0.0,
+        "index_seconds": index_seconds,
+    }
+
+
+STAGES = {"collect": collect_stage, "process": process_stage, "embed": embed_stage}
+
+
+def main():
+    """
+    Usage: python -m benchmarks.stages collect|process|embed <output.json>
+    Run from the directory of the stage's service, with the repository root on PYTHONPATH.
+    """
+    if len(sys.argv) != 3 or sys.argv[1] not in STAGES:
+        print(main.__doc__.strip())
+        sys.exit(1)
+    result = STAGES[sys.argv[1]]()
+    with open(sys.argv[2], "w") as file:
+        json.dump(result, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
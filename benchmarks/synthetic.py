@@ -0,0 +1,109 @@
+import os
+import random
+from html import escape
+from typing import List
+from core.legal_docs import LegalDocsEnum
+
+
+# Heading levels of the legislatie.just.ro markup, outermost first, with the name shown in their title
+LEVELS = [("S_PRT", "Partea"), ("S_TTL", "Titlul"), ("S_CAP", "Capitolul"), ("S_SEC", "Secțiunea")]
+# Sub-divisions of every heading, and articles in every section
+DIVISION_FANOUT = 3
+ARTICLES_PER_SECTION = 8
+
+WORDS = (
+    "persoana fizică juridică instanța judecătorească contractul obligația dreptul proprietate pedeapsa închisoare "
+    "amenda penală contravenție infracțiunea fapta săvârșită intenție culpă prejudiciul despăgubire termenul "
+    "prescripție procedura apel recurs hotărârea definitivă executare silită creditorul debitorul impozitul taxa "
+    "contribuabilul declarația fiscală organul fiscal control inspecție salariatul angajatorul contractul individual "
+    "muncă concediu salariu minim lege ordonanță urgență dispozițiile prezentului cod aplicabile condițiile prevăzute "
+    "alineatul articolul sancțiunea nulitatea actului moștenire succesiune căsătoria divorț minorul tutela "
+    "reprezentantul legal parchetul procurorul urmărirea penală inculpatul martorul probele expertiza"
+).split()
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def _article(number: int, rng: random.Random, words_per_article: int) -> str:
+    """An S_ART span: title and body are its 2nd and 4th child nodes, the body holds numbered paragraphs"""
+    paragraphs = rng.randint(1, 3)
+    lengths = [max(1, words_per_article // paragraphs)] * paragraphs
+    body = "".join(
+        f'<span class="S_ALN"><span class="S_ALN_TTL">({idx + 1})</span> '
+        f'<span class="S_ALN_BDY">{escape(_words(rng, length))}.</span></span> '
+        for idx, length in enumerate(lengths)
+    )
+    return (
+        f'<span class="S_ART" id="id_artA{number}"> <span class="S_ART_TTL">Articolul {number}</span> '
+        f'<span class="S_ART_BDY">{body}</span></span>\n'
+    )
+
+
+def _division(parts: List[str], level: int, counter: List[int], n_articles: int, rng: random.Random, words_per_article: int):
+    """Append one heading of `LEVELS[level]` with its sub-divisions (or articles), until `n_articles` are written"""
+    css_class, name = LEVELS[level]
+    number = rng.randint(1, 20)
+    parts.append(
+        f'<span class="{css_class}"><span class="{css_class}_TTL">{name} {number}</span> '
+        f'<span class="{css_class}_DEN">{escape(_words(rng, 4))}</span> <span class="{css_class}_BDY">\n'
+    )
+    for _ in range(ARTICLES_PER_SECTION if level == len(LEVELS) - 1 else DIVISION_FANOUT):
+        if counter[0] > n_articles:
+            break
+        if level == len(LEVELS) - 1:
+            parts.append(_article(counter[0], rng, words_per_article))
+            counter[0] += 1
+        else:
+            _division(parts, level + 1, counter, n_articles, rng, words_per_article)
+    parts.append("</span></span>\n")
+
+
+def generate_document(document: LegalDocsEnum, n_articles: int, words_per_article: int, seed: int = 0) -> bytes:
+    """
+    Generate an HTML document with the markup of legislatie.just.ro: nested part, title, chapter and section
+    headings (S_PRT, S_TTL, S_CAP, S_SEC with their _TTL, _DEN and _BDY spans) around S_ART articles.
+
+    :param document: Document whose name appears in the page title.
+    :param n_articles: Number of articles.
+    :param words_per_article: Approximate number of words in the body of every article.
+    :param seed: Seed of the random text, the same arguments always give the same document.
+    """
+    rng = random.Random(f"{document.name}-{seed}")
+    parts = [
+        f'<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>{document.name}</title></head>'
+        f'<body><div id="div_Formatare">\n'
+    ]
+    counter = [1]
+    while counter[0] <= n_articles:
+        _division(parts, 0, counter, n_articles, rng, words_per_article)
+    parts.append("</div></body></html>\n")
+    return "".join(parts).encode("utf-8")
+
+
+def write_documents(directory: str, n_articles: int, words_per_article: int, seed: int = 0) -> int:
+    """
+    Write one generated document per LegalDocsEnum member as "<document id>.html", the layout served by
+    data_collection's src.stub_server.
+
+    :return: Total size of the documents in bytes.
+    """
+    os.makedirs(directory, exist_ok=True)
+    total = 0
+    for document in LegalDocsEnum:
+        content = generate_document(document, n_articles, words_per_article, seed)
+        document_id = document.value.rstrip("/").rsplit("/", 1)[-1]
+        with open(os.path.join(directory, f"{document_id}.html"), "wb") as file:
+            file.write(content)
+        total += len(content)
+    return total
+
+
+def generate_questions(count: int, seed: int = 0) -> List[str]:
+    """Distinct questions made of corpus words, so that lexical and vector search both find hits"""
+    rng = random.Random(seed)
+    questions = set()
+    while len(questions) < count:
+        questions.add(f"ce se întâmplă cu {_words(rng, rng.randint(3, 8))}")
+    return sorted(questions)
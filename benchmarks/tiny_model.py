@@ -0,0 +1,67 @@
+import os
+import tempfile
+from collections import Counter
+from typing import Iterable
+
+
+TINY_MODEL_NAME = "benchmark-tiny-bert"
+SPECIAL_TOKENS = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+
+
+def build_tiny_model(path: str, corpus: Iterable[str], dim: int = 64, layers: int = 2, max_seq_length: int = 128,
+                     vocab_size: int = 5000, seed: int = 0) -> str:
+    """
+    Build a small, randomly initialized BERT sentence encoder with a word-level fast tokenizer trained on
+    `corpus`, and save it as a SentenceTransformer directory loadable with ENCODER_MODEL_PATH. Nothing is
+    downloaded. Its embeddings are meaningless, but it runs the same tokenization, chunking, encoding and
+    search code paths as the real model, at a fraction of the cost.
+
+    :param path: Output directory.
+    :param corpus: Texts the vocabulary is built from.
+    :param dim: Hidden size, i.e. the embedding dimension (EMBEDDING_DIM).
+    :param layers: Number of transformer layers.
+    :param max_seq_length: Context size of the model, which sets the chunk size.
+    :param vocab_size: Maximum number of words in the vocabulary.
+    :param seed: Seed of the weight initialization.
+    :return: The output directory.
+    """
+    import torch
+    from tokenizers import Tokenizer, models, normalizers, pre_tokenizers, processors
+    from transformers import BertConfig, BertModel, PreTrainedTokenizerFast
+    from sentence_transformers import SentenceTransformer, models as st_models
+
+    normalizer = normalizers.Lowercase()
+    pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    counts = Counter()
+    for text in corpus:
+        counts.update(word for word, _ in pre_tokenizer.pre_tokenize_str(normalizer.normalize_str(text)))
+    vocab = {token: idx for idx, token in enumerate(SPECIAL_TOKENS)}
+    for word, _ in counts.most_common(vocab_size - len(vocab)):
+        vocab[word] = len(vocab)
+
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="[UNK]"))
+    tokenizer.normalizer = normalizer
+    tokenizer.pre_tokenizer = pre_tokenizer
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]",
+        pair="[CLS] $A [SEP] $B:1 [SEP]:1",
+        special_tokens=[("[CLS]", vocab["[CLS]"]), ("[SEP]", vocab["[SEP]"])],
+    )
+    fast_tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer, model_max_length=max_seq_length,
+        pad_token="[PAD]", unk_token="[UNK]", cls_token="[CLS]", sep_token="[SEP]", mask_token="[MASK]",
+    )
+
+    torch.manual_seed(seed)
+    config = BertConfig(
+        vocab_size=len(vocab), hidden_size=dim, num_hidden_layers=layers, num_attention_heads=max(1, dim // 32),
+        intermediate_size=dim * 4, max_position_embeddings=max_seq_length,
+    )
+    with tempfile.TemporaryDirectory() as hf_path:
+        BertModel(config).save_pretrained(hf_path)
+        fast_tokenizer.save_pretrained(hf_path)
+        transformer = st_models.Transformer(hf_path, max_seq_length=max_seq_length)
+        pooling = st_models.Pooling(transformer.get_word_embedding_dimension(), pooling_mode="mean")
+        os.makedirs(path, exist_ok=True)
+        SentenceTransformer(modules=[transformer, pooling]).save(path)
+    return path
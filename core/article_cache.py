@@ -0,0 +1,75 @@
+import time
+from typing import Dict, Iterable
+from core.cache import LRUCache
+from core.postgres_db import Session, Article, get_articles_by_ids, get_data_version
+
+
+ARTICLES_DATA_VERSION = "articles"
+
+
+class ArticleCache:
+    def __init__(self, maxsize: int, check_interval: float = 30.0):
+        """
+        Initializes an in-process cache of article display fields, keyed by article ID.
+
+        :param maxsize: Maximum number of cached articles.
+        :param check_interval: Seconds between checks of the "articles" data version. The cache is
+            reloaded when `data_processing` has bumped the version since the last load.
+        """
+        self.cache = LRUCache(maxsize)
+        self.check_interval = check_interval
+        self.version = None
+        self._checked_at = 0.0
+
+    def load(self):
+        """
+        Clears the cache and fills it with up to `maxsize` articles from PostgreSQL.
+        """
+        self.version = get_data_version(ARTICLES_DATA_VERSION)
+        self._checked_at = time.monotonic()
+        self.cache.clear()
+        session = Session()
+        try:
+            rows = session.query(
+                Article.id, Article.source, Article.article_title, Article.article_body, Article.link
+            ).limit(self.cache.maxsize)
+            for row in rows:
+                self.cache.put(row.id, row._asdict())
+        finally:
+            session.close()
+        print(f"Loaded {len(self.cache)} articles in cache (data version {self.version}).")
+
+    def refresh_if_stale(self):
+        """
+        Reloads the cache if the article data version changed. Checked at most once per `check_interval`.
+        """
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        if get_data_version(ARTICLES_DATA_VERSION) != self.version:
+            print("Article data changed, reloading article cache...")
+            self.load()
+
+    def get_many(self, ids: Iterable[int]) -> Dict[int, Dict]:
+        """
+        Returns the requested articles, fetching the ones missing from the cache with a single query.
+        """
+        self.refresh_if_stale()
+        found = {}
+        missing = []
+        for article_id in set(ids):
+            article = self.cache.get(article_id)
+            if article is None:
+                missing.append(article_id)
+            else:
+                found[article_id] = article
+        if missing:
+            fetched = get_articles_by_ids(missing)
+            for article_id, article in fetched.items():
+                self.cache.put(article_id, article)
+            found.update(fetched)
+        return found
+
+    def stats(self) -> Dict:
+        return {**self.cache.stats(), "version": self.version}
@@ -0,0 +1,43 @@
+import os
+from sentence_transformers import SentenceTransformer
+
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "BlackKakapo/stsb-xlm-r-multilingual-ro")
+
+# "torch" runs the reference model, "torch-int8" the same model with its linear layers dynamically quantized
+# to int8, "onnx" / "onnx-int8" the ONNX export of the model (see embeddings_generation's src.export_encoder)
+ENCODER_BACKEND = os.getenv("ENCODER_BACKEND", "torch")
+# Local directory of the model, e.g. the output of the export script. Defaults to the Hugging Face model.
+ENCODER_MODEL_PATH = os.getenv("ENCODER_MODEL_PATH") or None
+# ONNX file loaded by the "onnx-int8" backend, relative to the model directory
+ENCODER_ONNX_INT8_FILE = os.getenv("ENCODER_ONNX_INT8_FILE", "onnx/model_qint8_avx2.onnx")
+ENCODER_BACKENDS = ["torch", "torch-int8", "onnx", "onnx-int8"]
+
+
+def load_encoder(backend=ENCODER_BACKEND, model_path=ENCODER_MODEL_PATH) -> SentenceTransformer:
+    """
+    Load the sentence embedding model with the given inference backend. Every backend returns a
+    SentenceTransformer, so callers keep using `encode` and the tokenizer as before.
+
+    :param backend: One of ENCODER_BACKENDS.
+    :param model_path: Local model directory, or None for EMBEDDING_MODEL.
+    """
+    model_path = model_path or EMBEDDING_MODEL
+    if backend == "torch":
+        return SentenceTransformer(model_path)
+    if backend == "torch-int8":
+        import torch
+
+        model = SentenceTransformer(model_path, device="cpu")
+        torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        return model
+    if backend == "onnx":
+        return SentenceTransformer(model_path, backend="onnx")
+    if backend == "onnx-int8":
+        return SentenceTransformer(model_path, backend="onnx", model_kwargs={"file_name": ENCODER_ONNX_INT8_FILE})
+    raise ValueError(f"Unknown encoder backend: {backend}")
+
+
+def encoder_id(backend=ENCODER_BACKEND) -> str:
+    """Identifies the model and backend that produced an embedding, e.g. to re-embed articles when it changes"""
+    return EMBEDDING_MODEL if backend == "torch" else f"{EMBEDDING_MODEL}:{backend}"
@@ -1,4 +1,11 @@
+import json
 from enum import Enum
+from typing import Dict, Optional
+
+
+# Object written by data collection with the documents whose content changed in the last run, and the
+# documents still pending processing (cleared by data processing)
+CHANGED_SOURCES_MANIFEST = "manifests/changed_sources.json"
 
 
 class LegalDocsEnum(Enum):
@@ -9,3 +16,22 @@ class LegalDocsEnum(Enum):
     CODUL_FISCAL = "https://legislatie.just.ro/Public/DetaliiDocument/171282"
     CODUL_DE_PROCEDURA_FISCALA = "https://legislatie.just.ro/Public/DetaliiDocument/172697"
     CODUL_MUNCII = "https://legislatie.just.ro/Public/DetaliiDocument/128647"
+
+
+def pending_sources(manifest: Dict) -> Dict[str, str]:
+    """Time each document pending processing last changed, by document name"""
+    # Manifests written before documents stayed pending only list the changes of their own run
+    return manifest.get("pending", {name: manifest["collected_at"] for name in manifest["changed"]})
+
+
+def read_pending_sources(minio_client, bucket_name: str) -> Optional[Dict[str, str]]:
+    """
+    Reads the documents pending processing from the changed sources manifest.
+
+    :param minio_client: An instance of `core.minio_client.MinIOClient`.
+    :param bucket_name: Name of the MinIO bucket holding the manifest.
+    :return: The time each pending document last changed, by document name, or None if there is no manifest.
+    """
+    if minio_client.head_object(bucket_name, CHANGED_SOURCES_MANIFEST) is None:
+        return None
+    return pending_sources(json.loads(minio_client.get_object(bucket_name, CHANGED_SOURCES_MANIFEST)))
@@ -0,0 +1,247 @@
+import os
+import re
+import json
+import time
+import shutil
+import numpy as np
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from core.text import fold_diacritics
+from core.postgres_db import Session, Article, stream_articles, ARTICLE_STREAM_BATCH_SIZE
+
+
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", "lexical_index")
+
+TOKEN_RE = re.compile(r"\w+")
+# Common Romanian inflectional endings (after diacritic folding), longest first
+SUFFIXES = sorted([
+    "urilor", "ilor", "elor", "ului", "iile", "uri", "ile", "ele", "lor", "lui",
+    "ul", "le", "ii", "ei", "ea", "ia", "a", "e", "i", "u",
+], key=len, reverse=True)
+MIN_STEM_LENGTH = 3
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+INDEX_FILES = ["offsets", "postings_docs", "postings_tf", "doc_ids", "doc_len"]
+# File holding the name of the current version directory of a saved index
+CURRENT_FILE = "CURRENT"
+
+
+def stem(token: str) -> str:
+    """Strip one common inflectional ending, keeping stems of at least MIN_STEM_LENGTH characters"""
+    if token.isdigit():
+        return token
+    for suffix in SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM_LENGTH:
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, fold diacritics (ș/ş, ț/ţ, ă, â, î), split into words and stem them"""
+    return [stem(token) for token in TOKEN_RE.findall(fold_diacritics((text or "").lower()))]
+
+
+class LexicalIndex:
+    def __init__(self, vocab: Dict[str, int], offsets: np.ndarray, postings_docs: np.ndarray, postings_tf: np.ndarray,
+                 doc_ids: np.ndarray, doc_len: np.ndarray):
+        """
+        BM25 index over article titles and bodies, stored as CSR posting lists.
+
+        :param vocab: Mapping of term to term ID.
+        :param offsets: Start of the posting list of every term in `postings_docs`/`postings_tf` (n_terms + 1 entries).
+        :param postings_docs: Document indexes of all posting lists, sorted by term then document.
+        :param postings_tf: Term frequencies matching `postings_docs`.
+        :param doc_ids: Article ID of every document index.
+        :param doc_len: Length in tokens of every document.
+        """
+        self.vocab = vocab
+        self.offsets = offsets
+        self.postings_docs = postings_docs
+        self.postings_tf = postings_tf
+        self.doc_ids = doc_ids
+        self.doc_len = doc_len
+        self.avgdl = float(doc_len.mean()) if len(doc_len) else 0.0
+
+    @staticmethod
+    def _document_terms(title: str, body: str) -> Counter:
+        return Counter(tokenize(title) + tokenize(body))
+
+    @classmethod
+    def build(cls, articles: Iterable[Tuple[int, str, str]]) -> "LexicalIndex":
+        """
+        Builds an index from (article ID, article title, article body) tuples.
+        """
+        return cls.empty().update(articles)
+
+    @classmethod
+    def build_from_db(cls, yield_per=ARTICLE_STREAM_BATCH_SIZE) -> "LexicalIndex":
+        """
+        Builds an index over every article in PostgreSQL.
+        """
+        return cls.build(stream_articles((Article.id, Article.article_title, Article.article_body), yield_per=yield_per))
+
+    @classmethod
+    def empty(cls) -> "LexicalIndex":
+        return cls(
+            {}, np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.uint16),
+            np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32)
+        )
+
+    def update(self, articles: Iterable[Tuple[int, str, str]]) -> "LexicalIndex":
+        """
+        Returns a new index where the given articles are added, or replace their previous version.
+
+        :param articles: (article ID, article title, article body) tuples.
+        """
+        vocab = dict(self.vocab)
+        doc_ids = list(self.doc_ids)
+        doc_len = list(self.doc_len)
+        doc_index = {int(article_id): idx for idx, article_id in enumerate(doc_ids)}
+
+        # The last version of an article wins if it is given more than once
+        latest = {article_id: (title, body) for article_id, title, body in articles}
+
+        new_terms, new_docs, new_tf = [], [], []
+        changed = []
+        for article_id, (title, body) in latest.items():
+            idx = doc_index.get(article_id)
+            if idx is None:
+                idx = len(doc_ids)
+                doc_index[article_id] = idx
+                doc_ids.append(article_id)
+                doc_len.append(0)
+            changed.append(idx)
+            terms = self._document_terms(title, body)
+            doc_len[idx] = sum(terms.values())
+            for term, tf in terms.items():
+                new_terms.append(vocab.setdefault(term, len(vocab)))
+                new_docs.append(idx)
+                new_tf.append(tf)
+
+        # Expand the CSR lists to (term, doc, tf) triples, drop the replaced documents and append the new postings
+        old_terms = np.repeat(np.arange(len(self.offsets) - 1, dtype=np.int64), np.diff(self.offsets))
+        keep = ~np.isin(self.postings_docs, np.asarray(changed, dtype=np.int32))
+        terms = np.concatenate([old_terms[keep], np.asarray(new_terms, dtype=np.int64)])
+        docs = np.concatenate([self.postings_docs[keep], np.asarray(new_docs, dtype=np.int32)])
+        tfs = np.concatenate([self.postings_tf[keep], np.minimum(np.asarray(new_tf, dtype=np.int64), 65535).astype(np.uint16)])
+
+        order = np.lexsort((docs, terms))
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(vocab)), out=offsets[1:])
+        return LexicalIndex(
+            vocab, offsets, docs[order], tfs[order],
+            np.asarray(doc_ids, dtype=np.int64), np.asarray(doc_len, dtype=np.int32)
+        )
+
+    def search(self, query: str, limit=10) -> List[Tuple[int, float]]:
+        """
+        Returns up to `limit` (article ID, BM25 score) pairs, best first.
+        """
+        n_docs = len(self.doc_ids)
+        if n_docs == 0:
+            return []
+        scores = np.zeros(n_docs, dtype=np.float32)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len / max(self.avgdl, 1e-9))
+        for term in set(tokenize(query)):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.postings_docs[start:end]
+            tf = self.postings_tf[start:end].astype(np.float32)
+            idf = np.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tf * (BM25_K1 + 1) / (tf + norm[docs])
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > limit:
+            matched = matched[np.argpartition(-scores[matched], limit - 1)[:limit]]
+        matched = matched[np.argsort(-scores[matched])]
+        return [(int(self.doc_ids[idx]), float(scores[idx])) for idx in matched]
+
+    def save(self, path=LEXICAL_INDEX_PATH):
+        """
+        Writes the index as .npy arrays plus a meta.json with the vocabulary, in a new version directory under
+        `path`, then atomically points the CURRENT file to it. A reader always loads one complete version, and
+        readers that memory-mapped the previous version keep working: it is only removed by the following save.
+        """
+        os.makedirs(path, exist_ok=True)
+        previous = _current_version(path)
+        version = f"v{time.time_ns()}"
+        version_path = os.path.join(path, version)
+        os.makedirs(version_path)
+        arrays = {
+            "offsets": self.offsets, "postings_docs": self.postings_docs, "postings_tf": self.postings_tf,
+            "doc_ids": self.doc_ids, "doc_len": self.doc_len,
+        }
+        for name in INDEX_FILES:
+            np.save(os.path.join(version_path, f"{name}.npy"), np.ascontiguousarray(arrays[name]))
+
+        terms = [None] * len(self.vocab)
+        for term, term_id in self.vocab.items():
+            terms[term_id] = term
+        with open(os.path.join(version_path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"terms": terms, "n_docs": len(self.doc_ids)}, f, ensure_ascii=False)
+
+        tmp_path = os.path.join(path, f"{CURRENT_FILE}.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(path, CURRENT_FILE))
+
+        # Keep the new and the previous version, drop the older ones (and the files of the unversioned layout)
+        for name in os.listdir(path):
+            if name in (version, previous, CURRENT_FILE):
+                continue
+            entry = os.path.join(path, name)
+            if os.path.isdir(entry) and name.startswith("v"):
+                shutil.rmtree(entry, ignore_errors=True)
+            elif name == "meta.json" or name.endswith(".npy"):
+                os.remove(entry)
+        print(f"Saved lexical index with {len(self.doc_ids)} documents and {len(terms)} terms to {version_path}.")
+
+    @classmethod
+    def load(cls, path=LEXICAL_INDEX_PATH, mmap=True) -> "LexicalIndex":
+        """
+        Loads the current version of an index saved with `save`, memory-mapping the posting arrays.
+        """
+        version = _current_version(path)
+        # Indexes saved before versioning have their files directly in `path`
+        version_path = os.path.join(path, version) if version else path
+        with open(os.path.join(version_path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        mmap_mode = "r" if mmap else None
+        arrays = {name: np.load(os.path.join(version_path, f"{name}.npy"), mmap_mode=mmap_mode) for name in INDEX_FILES}
+        vocab = {term: term_id for term_id, term in enumerate(meta["terms"])}
+        return cls(vocab, **arrays)
+
+    @staticmethod
+    def exists(path=LEXICAL_INDEX_PATH) -> bool:
+        return _current_version(path) is not None or os.path.exists(os.path.join(path, "meta.json"))
+
+
+def _current_version(path: str) -> Optional[str]:
+    """Name of the version directory the CURRENT file of an index points to, or None"""
+    try:
+        with open(os.path.join(path, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def update_lexical_index(article_ids: Iterable[int], path=LEXICAL_INDEX_PATH):
+    """
+    Re-indexes the given articles in the index stored at `path`, building the full index if none exists yet.
+    """
+    if not LexicalIndex.exists(path):
+        print("No lexical index found, building it from all articles...")
+        LexicalIndex.build_from_db().save(path)
+        return
+
+    article_ids = list(article_ids)
+    session = Session()
+    try:
+        rows = session.query(Article.id, Article.article_title, Article.article_body).filter(Article.id.in_(article_ids)).all()
+    finally:
+        session.close()
+    LexicalIndex.load(path, mmap=False).update(rows).save(path)
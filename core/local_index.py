@@ -0,0 +1,396 @@
+import os
+import json
+import atexit
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Sequence
+from qdrant_client.http import models
+
+
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", "local_index")
+# "none" searches the float32 matrix, "int8" searches a per-row scaled int8 copy of it
+LOCAL_INDEX_QUANTIZATION = os.getenv("LOCAL_INDEX_QUANTIZATION", "none")
+# With int8 quantization, re-score LOCAL_INDEX_RERANK * limit candidates with the float32 vectors (0 disables it)
+LOCAL_INDEX_RERANK = int(os.getenv("LOCAL_INDEX_RERANK", "4"))
+
+SEARCH_BLOCK_ROWS = 8192
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return (vectors / norms).astype(np.float32)
+
+
+def _quantize(vectors: np.ndarray):
+    """Per-row symmetric int8 quantization: vector ~= q8 * scale / 127"""
+    scales = np.abs(vectors).max(axis=1) if len(vectors) else np.zeros(0, dtype=np.float32)
+    scales[scales == 0] = 1
+    q8 = np.round(vectors / scales[:, None] * 127).astype(np.int8)
+    return q8, scales.astype(np.float32)
+
+
+def _payload_matches(payload: Dict, query_filter: Optional[models.Filter]) -> bool:
+    """Evaluate the subset of Qdrant filters used here: must/must_not/should with MatchValue/MatchAny conditions"""
+    if query_filter is None:
+        return True
+
+    def condition_matches(condition) -> bool:
+        value = payload.get(condition.key)
+        if isinstance(condition.match, models.MatchValue):
+            return value == condition.match.value
+        if isinstance(condition.match, models.MatchAny):
+            return value in condition.match.any
+        raise ValueError(f"Unsupported filter condition: {condition}")
+
+    must = query_filter.must or []
+    must_not = query_filter.must_not or []
+    should = query_filter.should or []
+    must = must if isinstance(must, list) else [must]
+    must_not = must_not if isinstance(must_not, list) else [must_not]
+    should = should if isinstance(should, list) else [should]
+    return (
+        all(condition_matches(c) for c in must)
+        and not any(condition_matches(c) for c in must_not)
+        and (not should or any(condition_matches(c) for c in should))
+    )
+
+
+class _Collection:
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.ids: List = []
+        self.payloads: List[Optional[Dict]] = []
+        self.rows: Dict = {}
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.size = 0
+        self.q8 = None
+        self.scales = None
+        self._field_values: Dict[str, np.ndarray] = {}
+
+    def _changed(self):
+        self.q8 = None
+        self._field_values.clear()
+
+    def alive(self) -> np.ndarray:
+        return self.field_values("__alive__")
+
+    def field_values(self, key: str) -> np.ndarray:
+        """Payload values of one field for every row, cached until the collection changes"""
+        values = self._field_values.get(key)
+        if values is None or len(values) != self.size:
+            if key == "__alive__":
+                values = np.fromiter((payload is not None for payload in self.payloads), dtype=bool, count=self.size)
+            else:
+                values = np.empty(self.size, dtype=object)
+                values[:] = [payload.get(key) if payload is not None else None for payload in self.payloads]
+            self._field_values[key] = values
+        return values
+
+    def filter_mask(self, query_filter: Optional[models.Filter]) -> np.ndarray:
+        """Rows that are alive and match the filter, vectorized for must-only MatchValue/MatchAny filters"""
+        mask = self.alive().copy()
+        if query_filter is None:
+            return mask
+        must = query_filter.must if isinstance(query_filter.must, list) else [query_filter.must] if query_filter.must else []
+        simple = (
+            not query_filter.must_not and not query_filter.should
+            and all(isinstance(getattr(c, "match", None), (models.MatchValue, models.MatchAny)) for c in must)
+        )
+        if not simple:
+            return mask & np.fromiter(
+                (payload is not None and _payload_matches(payload, query_filter) for payload in self.payloads),
+                dtype=bool, count=self.size
+            )
+        for condition in must:
+            values = self.field_values(condition.key)
+            if isinstance(condition.match, models.MatchValue):
+                mask &= values == condition.match.value
+            else:
+                mask &= np.isin(values, list(condition.match.any))
+        return mask
+
+    def _reserve(self, extra: int):
+        needed = self.size + extra
+        if needed <= len(self.vectors) and isinstance(self.vectors, np.ndarray) and self.vectors.flags.writeable:
+            return
+        capacity = max(needed, 2 * len(self.vectors), 1024)
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        vectors[:self.size] = self.vectors[:self.size]
+        self.vectors = vectors
+
+    def upsert(self, ids: Sequence, vectors: np.ndarray, payloads: Sequence[Optional[Dict]]):
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim))
+        self._reserve(len(ids))
+        for point_id, vector, payload in zip(ids, vectors, payloads):
+            row = self.rows.get(point_id)
+            if row is None:
+                row = self.size
+                self.size += 1
+                self.rows[point_id] = row
+                self.ids.append(point_id)
+                self.payloads.append(payload)
+            else:
+                self.payloads[row] = payload
+            self.vectors[row] = vector
+        self._changed()
+
+    def delete(self, ids: Sequence):
+        for point_id in ids:
+            row = self.rows.pop(point_id, None)
+            if row is not None:
+                # Tombstone the row, it is masked out of searches and dropped when the collection is compacted
+                # on save. Its vector is left as is: a loaded collection is a read-only memory map
+                self.payloads[row] = None
+        self._changed()
+
+    def compact(self):
+        alive = [row for row in range(self.size) if self.payloads[row] is not None]
+        self.vectors = np.ascontiguousarray(self.vectors[alive])
+        self.ids = [self.ids[row] for row in alive]
+        self.payloads = [self.payloads[row] for row in alive]
+        self.rows = {point_id: row for row, point_id in enumerate(self.ids)}
+        self.size = len(alive)
+        self._changed()
+
+    def quantized(self):
+        if self.q8 is None or len(self.q8) != self.size:
+            self.q8, self.scales = _quantize(np.asarray(self.vectors[:self.size]))
+        return self.q8, self.scales
+
+    def scores(self, query: np.ndarray, quantization: str) -> np.ndarray:
+        scores = np.empty(self.size, dtype=np.float32)
+        if quantization == "int8":
+            q8, scales = self.quantized()
+            for start in range(0, self.size, SEARCH_BLOCK_ROWS):
+                end = min(start + SEARCH_BLOCK_ROWS, self.size)
+                scores[start:end] = q8[start:end].astype(np.float32) @ query
+            scores *= scales / 127
+        else:
+            for start in range(0, self.size, SEARCH_BLOCK_ROWS):
+                end = min(start + SEARCH_BLOCK_ROWS, self.size)
+                scores[start:end] = self.vectors[start:end] @ query
+        return scores
+
+
+class LocalVectorIndex:
+    def __init__(self, path: str = LOCAL_INDEX_PATH, quantization: str = LOCAL_INDEX_QUANTIZATION, rerank: int = LOCAL_INDEX_RERANK):
+        """
+        Embedded vector store exposing the subset of the QdrantClient API used by `core.qdrant_db`.
+
+        Every collection is a float32 matrix of normalized vectors (memory-mapped when loaded from disk)
+        with a JSON payload sidecar. Search is an exact, vectorized cosine top-k, optionally on an int8
+        quantized copy of the matrix with float32 re-ranking of the best candidates.
+
+        :param path: Directory holding one sub-directory per collection.
+        :param quantization: "none" or "int8".
+        :param rerank: Candidate multiplier for float32 re-ranking of int8 results (0 disables it).
+        """
+        self.path = path
+        self.quantization = quantization
+        self.rerank = rerank
+        self._collections: Dict[str, _Collection] = {}
+        self._dirty = set()
+        self._lock = threading.RLock()
+        # Writers (e.g. embeddings_generation) do not know about the local index, persist their changes on exit
+        atexit.register(self.flush)
+
+    def _collection_path(self, collection_name: str) -> str:
+        return os.path.join(self.path, collection_name)
+
+    def _get(self, collection_name: str) -> _Collection:
+        with self._lock:
+            collection = self._collections.get(collection_name)
+            if collection is None:
+                collection = self._load(collection_name)
+                self._collections[collection_name] = collection
+            return collection
+
+    def _load(self, collection_name: str) -> _Collection:
+        path = self._collection_path(collection_name)
+        meta_path = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_path):
+            raise ValueError(f"Collection {collection_name} not found")
+        with open(meta_path) as f:
+            meta = json.load(f)
+        collection = _Collection(meta["dim"])
+        if meta["size"]:
+            collection.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+            if self.quantization == "int8" and os.path.exists(os.path.join(path, "vectors_q8.npy")):
+                collection.q8 = np.load(os.path.join(path, "vectors_q8.npy"), mmap_mode="r")
+                collection.scales = np.load(os.path.join(path, "scales.npy"))
+        with open(os.path.join(path, "payloads.jsonl"), encoding="utf-8") as f:
+            for line in f:
+                point_id, payload = json.loads(line)
+                collection.rows[point_id] = len(collection.ids)
+                collection.ids.append(point_id)
+                collection.payloads.append(payload)
+        collection.size = len(collection.ids)
+        return collection
+
+    def reload(self):
+        """
+        Drops the loaded collections without unsaved changes, so the next access reads the version saved on
+        disk, e.g. after another process re-embedded the articles or imported a snapshot.
+        """
+        with self._lock:
+            for collection_name in list(self._collections):
+                if collection_name not in self._dirty:
+                    del self._collections[collection_name]
+
+    def flush(self):
+        """
+        Writes every modified collection to disk.
+        """
+        with self._lock:
+            for collection_name in list(self._dirty):
+                self._save(collection_name, self._collections[collection_name])
+            self._dirty.clear()
+
+    def _save(self, collection_name: str, collection: _Collection):
+        path = self._collection_path(collection_name)
+        os.makedirs(path, exist_ok=True)
+        collection.compact()
+        np.save(os.path.join(path, "vectors.tmp.npy"), collection.vectors)
+        os.replace(os.path.join(path, "vectors.tmp.npy"), os.path.join(path, "vectors.npy"))
+        q8, scales = collection.quantized()
+        np.save(os.path.join(path, "vectors_q8.tmp.npy"), q8)
+        os.replace(os.path.join(path, "vectors_q8.tmp.npy"), os.path.join(path, "vectors_q8.npy"))
+        np.save(os.path.join(path, "scales.tmp.npy"), scales)
+        os.replace(os.path.join(path, "scales.tmp.npy"), os.path.join(path, "scales.npy"))
+        with open(os.path.join(path, "payloads.jsonl.tmp"), "w", encoding="utf-8") as f:
+            for point_id, payload in zip(collection.ids, collection.payloads):
+                f.write(json.dumps([point_id, payload], ensure_ascii=False) + "\n")
+        os.replace(os.path.join(path, "payloads.jsonl.tmp"), os.path.join(path, "payloads.jsonl"))
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"dim": collection.dim, "size": collection.size}, f)
+        print(f"Saved {collection.size} points of collection {collection_name} to {path}.")
+
+    def close(self):
+        self.flush()
+
+    # --- QdrantClient-compatible methods ---
+
+    def get_collection(self, collection_name: str):
+        collection = self._get(collection_name)
+        return {"points_count": len(collection.rows), "dim": collection.dim}
+
+    def collection_exists(self, collection_name: str) -> bool:
+        try:
+            self._get(collection_name)
+            return True
+        except ValueError:
+            return False
+
+    def create_collection(self, collection_name: str, vectors_config: models.VectorParams, **kwargs):
+        if vectors_config.distance != models.Distance.COSINE:
+            raise ValueError("The local index only supports cosine distance")
+        with self._lock:
+            self._collections[collection_name] = _Collection(vectors_config.size)
+            self._save(collection_name, self._collections[collection_name])
+        return True
+
+    def delete_collection(self, collection_name: str, **kwargs):
+        with self._lock:
+            self._collections.pop(collection_name, None)
+            self._dirty.discard(collection_name)
+            path = self._collection_path(collection_name)
+            if os.path.exists(path):
+                for name in os.listdir(path):
+                    os.remove(os.path.join(path, name))
+                os.rmdir(path)
+        return True
+
+    def create_payload_index(self, collection_name: str, field_name: str, **kwargs):
+        # Filters are evaluated on the in-memory payloads, no index is needed
+        return True
+
+    def upsert(self, collection_name: str, points: List[models.PointStruct], **kwargs):
+        with self._lock:
+            collection = self._get(collection_name)
+            collection.upsert(
+                [str(point.id) for point in points],
+                np.asarray([point.vector for point in points], dtype=np.float32),
+                [point.payload for point in points]
+            )
+            self._dirty.add(collection_name)
+
+    def delete(self, collection_name: str, points_selector: models.PointIdsList, **kwargs):
+        with self._lock:
+            self._get(collection_name).delete([str(point_id) for point_id in points_selector.points])
+            self._dirty.add(collection_name)
+
+    @staticmethod
+    def _select_payload(payload: Dict, with_payload):
+        if with_payload is True:
+            return payload
+        if not with_payload:
+            return None
+        return {key: payload[key] for key in with_payload if key in payload}
+
+    def retrieve(self, collection_name: str, ids: Sequence, with_payload=True, with_vectors=False, **kwargs) -> List[models.Record]:
+        collection = self._get(collection_name)
+        records = []
+        for point_id in ids:
+            row = collection.rows.get(str(point_id))
+            if row is not None:
+                records.append(models.Record(
+                    id=collection.ids[row],
+                    payload=self._select_payload(collection.payloads[row], with_payload),
+                    vector=collection.vectors[row].tolist() if with_vectors else None
+                ))
+        return records
+
+    def scroll(self, collection_name: str, limit: int = 10, offset=None, with_payload=True, with_vectors=False,
+               scroll_filter: Optional[models.Filter] = None, **kwargs):
+        collection = self._get(collection_name)
+        start = offset or 0
+        records = []
+        row = start
+        while row < collection.size and len(records) < limit:
+            payload = collection.payloads[row]
+            if payload is not None and _payload_matches(payload, scroll_filter):
+                records.append(models.Record(
+                    id=collection.ids[row],
+                    payload=self._select_payload(payload, with_payload),
+                    vector=collection.vectors[row].tolist() if with_vectors else None
+                ))
+            row += 1
+        return records, (row if row < collection.size else None)
+
+    def query_points(self, collection_name: str, query: List[float], limit: int = 10, with_payload=True,
+                     query_filter: Optional[models.Filter] = None, **kwargs) -> models.QueryResponse:
+        collection = self._get(collection_name)
+        if collection.size == 0:
+            return models.QueryResponse(points=[])
+        query_vector = _normalize(np.asarray(query, dtype=np.float32))
+        scores = collection.scores(query_vector, self.quantization)
+        # Tombstoned and filtered-out rows can never be returned
+        scores[~collection.filter_mask(query_filter)] = -np.inf
+
+        rerank = self.quantization == "int8" and self.rerank > 0
+        candidates = min(limit * self.rerank if rerank else limit, collection.size)
+        top = np.argpartition(-scores, candidates - 1)[:candidates]
+        top = top[np.isfinite(scores[top])]
+        if rerank and len(top):
+            rows = np.sort(top)
+            scores[rows] = np.asarray(collection.vectors[rows]) @ query_vector
+        top = top[np.argsort(-scores[top])][:limit]
+
+        return models.QueryResponse(points=[
+            models.ScoredPoint(
+                id=collection.ids[row],
+                version=0,
+                score=float(scores[row]),
+                payload=self._select_payload(collection.payloads[row], with_payload)
+            )
+            for row in top
+        ])
+
+    def query_batch_points(self, collection_name: str, requests: Sequence[models.QueryRequest], **kwargs) -> List[models.QueryResponse]:
+        return [
+            self.query_points(collection_name, request.query, limit=request.limit or 10,
+                              with_payload=True if request.with_payload is None else request.with_payload,
+                              query_filter=request.filter)
+            for request in requests
+        ]
@@ -0,0 +1,123 @@
+import io
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from types import SimpleNamespace
+from typing import BinaryIO, Dict
+from botocore.exceptions import ClientError
+
+
+# Directory of the objects stored by the local backend of core.minio_client
+LOCAL_STORAGE_PATH = os.getenv("LOCAL_STORAGE_PATH", "local_storage")
+
+
+def _not_found(operation: str, key: str) -> ClientError:
+    return ClientError({"Error": {"Code": "404", "Message": f"Not Found: {key}"}}, operation)
+
+
+class LocalObjectStore:
+    def __init__(self, path: str = LOCAL_STORAGE_PATH):
+        """
+        Directory-backed stand-in for the boto3 S3 client, implementing the calls made by `MinIOClient`.
+        Every object is a file under <path>/<bucket>/<key>, with its headers (content type, encoding, user
+        metadata and an MD5 ETag like MinIO's) in a JSON sidecar under <path>/.meta/<bucket>/<key>.json.
+
+        :param path: Root directory of the buckets.
+        """
+        self.path = path
+        self.exceptions = SimpleNamespace(ClientError=ClientError)
+
+    def _object_path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.path, bucket, key)
+
+    def _meta_path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.path, ".meta", bucket, f"{key}.json")
+
+    def head_bucket(self, Bucket: str):
+        if not os.path.isdir(os.path.join(self.path, Bucket)):
+            raise _not_found("HeadBucket", Bucket)
+        return {}
+
+    def create_bucket(self, Bucket: str):
+        os.makedirs(os.path.join(self.path, Bucket), exist_ok=True)
+        return {}
+
+    def _write(self, bucket: str, key: str, fileobj: BinaryIO, extra_args: Dict):
+        if not os.path.isdir(os.path.join(self.path, bucket)):
+            raise ClientError({"Error": {"Code": "NoSuchBucket", "Message": bucket}}, "PutObject")
+        path = self._object_path(bucket, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        digest = hashlib.md5()
+        # Write next to the final path and rename, so readers never see a partial object
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as file:
+            while True:
+                chunk = fileobj.read(2**20)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                file.write(chunk)
+        os.replace(tmp_path, path)
+
+        meta = {
+            "ETag": f'"{digest.hexdigest()}"',
+            "ContentType": extra_args.get("ContentType"),
+            "ContentEncoding": extra_args.get("ContentEncoding"),
+            "Metadata": extra_args.get("Metadata") or {},
+        }
+        meta_path = self._meta_path(bucket, key)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        with open(meta_path, "w") as file:
+            json.dump(meta, file)
+        return {"ETag": meta["ETag"]}
+
+    def put_object(self, Bucket: str, Key: str, Body, ContentType=None, Metadata=None, ContentEncoding=None, **kwargs):
+        if isinstance(Body, (bytes, bytearray)):
+            Body = io.BytesIO(Body)
+        return self._write(Bucket, Key, Body, {"ContentType": ContentType, "ContentEncoding": ContentEncoding, "Metadata": Metadata})
+
+    def upload_fileobj(self, Fileobj: BinaryIO, Bucket: str, Key: str, ExtraArgs=None, Config=None, **kwargs):
+        self._write(Bucket, Key, Fileobj, ExtraArgs or {})
+
+    def copy_object(self, Bucket: str, Key: str, CopySource: Dict, MetadataDirective="COPY", Metadata=None,
+                    ContentType=None, ContentEncoding=None, **kwargs):
+        source = self.head_object(CopySource["Bucket"], CopySource["Key"])
+        extra_args = {
+            "ContentType": source["ContentType"],
+            "ContentEncoding": source.get("ContentEncoding"),
+            "Metadata": source["Metadata"],
+        }
+        if MetadataDirective == "REPLACE":
+            extra_args = {"ContentType": ContentType, "ContentEncoding": ContentEncoding, "Metadata": Metadata}
+        with open(self._object_path(CopySource["Bucket"], CopySource["Key"]), "rb") as file:
+            response = self._write(Bucket, Key, file, extra_args)
+        return {"CopyObjectResult": response}
+
+    def head_object(self, Bucket: str, Key: str) -> Dict:
+        try:
+            with open(self._meta_path(Bucket, Key)) as file:
+                meta = json.load(file)
+        except FileNotFoundError:
+            raise _not_found("HeadObject", Key)
+        response = {
+            "ETag": meta["ETag"],
+            "ContentLength": os.path.getsize(self._object_path(Bucket, Key)),
+            "ContentType": meta["ContentType"],
+            "Metadata": meta["Metadata"],
+        }
+        if meta["ContentEncoding"]:
+            response["ContentEncoding"] = meta["ContentEncoding"]
+        return response
+
+    def get_object(self, Bucket: str, Key: str) -> Dict:
+        response = self.head_object(Bucket, Key)
+        response["Body"] = open(self._object_path(Bucket, Key), "rb")
+        return response
+
+    def download_fileobj(self, Bucket: str, Key: str, Fileobj: BinaryIO, Config=None, **kwargs):
+        self.head_object(Bucket, Key)
+        with open(self._object_path(Bucket, Key), "rb") as file:
+            shutil.copyfileobj(file, Fileobj, 2**20)
+
@@ -1,30 +1,93 @@
+import io
 import os
+import gzip
+import shutil
+import tempfile
+from typing import BinaryIO, Iterator, Optional
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.client import Config
 from dotenv import load_dotenv
+from core.local_storage import LocalObjectStore
+
+try:
+    import zstandard
+except ImportError:  # zstd compression is optional
+    zstandard = None
 
 
 # Load environment variables from .env file
 load_dotenv()
- 
+
 # Set the endpoint URL based on the environment
 if os.getenv("ENVIRONMENT") == "local":
     ENDPOINT_URL = 'http://localhost:9000'
 else:
     ENDPOINT_URL = 'http://minio:9000'
 
+# "minio" uses the MinIO server, "local" stores objects in a directory (see core.local_storage, no server needed)
+MINIO_BACKEND = os.getenv("MINIO_BACKEND", "minio")
+
+# Compression applied to uploaded objects: "none", "gzip" or "zstd" (needs the zstandard package)
+MINIO_COMPRESSION = os.getenv("MINIO_COMPRESSION", "none")
+# Directory where downloaded objects are kept, keyed by ETag, so unchanged objects are not downloaded again.
+# Empty to disable the cache.
+MINIO_CACHE_DIR = os.getenv("MINIO_CACHE_DIR", "")
+# Uploads larger than this are split into parts uploaded in parallel
+MINIO_MULTIPART_THRESHOLD = int(os.getenv("MINIO_MULTIPART_THRESHOLD", str(16 * 2**20)))
+MINIO_MULTIPART_CHUNK_SIZE = int(os.getenv("MINIO_MULTIPART_CHUNK_SIZE", str(8 * 2**20)))
+# Size of the chunks read from streamed objects
+MINIO_READ_CHUNK_SIZE = 2**20
+
+# Content-Encoding of compressed objects
+COMPRESSION_ENCODINGS = {"gzip": "gzip", "zstd": "zstd"}
+
+
+def _compressing_writer(fileobj: BinaryIO, compression: str):
+    """File-like writer compressing everything written to it into `fileobj`"""
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=fileobj, mode="wb")
+    if compression == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compression needs the zstandard package")
+        return zstandard.ZstdCompressor().stream_writer(fileobj, closefd=False)
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+def _decompressing_reader(fileobj: BinaryIO, encoding: Optional[str]) -> BinaryIO:
+    """File-like reader decompressing `fileobj` according to the Content-Encoding of the object"""
+    if encoding == "gzip":
+        return gzip.GzipFile(fileobj=fileobj, mode="rb")
+    if encoding == "zstd":
+        if zstandard is None:
+            raise ValueError("Reading zstd compressed objects needs the zstandard package")
+        return zstandard.ZstdDecompressor().stream_reader(fileobj)
+    return fileobj
+
 
 class MinIOClient:
-    def __init__(self):
+    def __init__(self, compression=MINIO_COMPRESSION, cache_dir=MINIO_CACHE_DIR):
         """
         Initializes the MinIO client.
+
+        :param compression: Compression applied to uploaded objects: "none", "gzip" or "zstd".
+        :param cache_dir: Directory of the on-disk read cache, or empty to disable it.
         """
-        self.client = boto3.client(
-            's3',
-            endpoint_url=ENDPOINT_URL,
-            aws_access_key_id=os.getenv("MINIO_ROOT_USER"),
-            aws_secret_access_key=os.getenv("MINIO_ROOT_PASSWORD"),
-            config=Config(signature_version="s3v4")
+        if MINIO_BACKEND == "local":
+            self.client = LocalObjectStore()
+        else:
+            self.client = boto3.client(
+                's3',
+                endpoint_url=ENDPOINT_URL,
+                aws_access_key_id=os.getenv("MINIO_ROOT_USER"),
+                aws_secret_access_key=os.getenv("MINIO_ROOT_PASSWORD"),
+                config=Config(signature_version="s3v4")
+            )
+        self.compression = compression
+        self.cache_dir = cache_dir
+        self.transfer_config = TransferConfig(
+            multipart_threshold=MINIO_MULTIPART_THRESHOLD,
+            multipart_chunksize=MINIO_MULTIPART_CHUNK_SIZE
         )
 
     def create_bucket_if_not_exists(self, bucket_name):
@@ -36,40 +99,182 @@ class MinIOClient:
         except self.client.exceptions.ClientError:
             self.client.create_bucket(Bucket=bucket_name)
             print(f"Bucket '{bucket_name}' created.")
-    
-    def put_object(self, bucket_name, object_name, data, length, content_type):
+
+    def put_object(self, bucket_name, object_name, data, length, content_type, metadata=None, compression=None):
         """
-        Uploads an object to a bucket.
+        Uploads an object to a bucket. Data larger than the multipart threshold is uploaded in parts.
 
         :param bucket_name: Name of the bucket.
         :param object_name: Name of the object (key) in the bucket.
         :param data: Data to upload (bytes or file-like object).
         :param length: Length of the data in bytes.
         :param content_type: Content type of the object (e.g., "text/plain").
+        :param metadata: Optional user metadata stored with the object (string keys and values).
+        :param compression: Compression of the stored object, defaults to the one of the client.
+        :return: True if the object was uploaded.
+        """
+        compression = compression or self.compression
+        if compression == "none" and length <= MINIO_MULTIPART_THRESHOLD:
+            try:
+                self.client.put_object(
+                    Bucket=bucket_name,
+                    Key=object_name,
+                    Body=data,
+                    ContentLength=length,
+                    ContentType=content_type,
+                    Metadata=metadata or {},
+                )
+                print(f"Object '{object_name}' uploaded to bucket '{bucket_name}'.")
+                return True
+            except Exception as e:
+                print(f"Error uploading object: {e}")
+                return False
+
+        fileobj = io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+        return self.upload_fileobj(bucket_name, object_name, fileobj, content_type, metadata, compression)
+
+    def upload_fileobj(self, bucket_name, object_name, fileobj: BinaryIO, content_type, metadata=None, compression=None):
+        """
+        Streams a file-like object to a bucket, with a multipart upload when it is larger than the multipart
+        threshold. Compressed data is spooled to a temporary file first, so it is never fully held in memory.
+
+        :param bucket_name: Name of the bucket.
+        :param object_name: Name of the object (key) in the bucket.
+        :param fileobj: Binary file-like object to upload.
+        :param content_type: Content type of the object (e.g., "text/plain").
+        :param metadata: Optional user metadata stored with the object (string keys and values).
+        :param compression: Compression of the stored object, defaults to the one of the client.
+        :return: True if the object was uploaded.
+        """
+        compression = compression or self.compression
+        extra_args = {"ContentType": content_type, "Metadata": metadata or {}}
+        try:
+            if compression != "none":
+                extra_args["ContentEncoding"] = COMPRESSION_ENCODINGS[compression]
+                with tempfile.SpooledTemporaryFile(max_size=MINIO_MULTIPART_THRESHOLD) as spooled:
+                    with _compressing_writer(spooled, compression) as writer:
+                        shutil.copyfileobj(fileobj, writer, MINIO_READ_CHUNK_SIZE)
+                    spooled.seek(0)
+                    self.client.upload_fileobj(spooled, bucket_name, object_name, ExtraArgs=extra_args, Config=self.transfer_config)
+            else:
+                self.client.upload_fileobj(fileobj, bucket_name, object_name, ExtraArgs=extra_args, Config=self.transfer_config)
+            print(f"Object '{object_name}' uploaded to bucket '{bucket_name}'.")
+            return True
+        except Exception as e:
+            print(f"Error uploading object: {e}")
+            return False
+
+    def head_object(self, bucket_name, object_name):
+        """
+        Retrieves the user metadata of an object without downloading it.
+
+        :param bucket_name: Name of the bucket.
+        :param object_name: Name of the object (key) in the bucket.
+        :return: The metadata of the object as a dict, or None if the object does not exist.
         """
         try:
-            self.client.put_object(
+            response = self.client.head_object(Bucket=bucket_name, Key=object_name)
+            return response.get('Metadata', {})
+        except self.client.exceptions.ClientError:
+            return None
+
+    def update_metadata(self, bucket_name, object_name, metadata):
+        """
+        Replaces the user metadata of an object with a server-side copy of the object onto itself, so its
+        content is not uploaded again.
+
+        :param bucket_name: Name of the bucket.
+        :param object_name: Name of the object (key) in the bucket.
+        :param metadata: New user metadata of the object (string keys and values).
+        :return: True if the metadata was updated.
+        """
+        try:
+            response = self.client.head_object(Bucket=bucket_name, Key=object_name)
+            # Replacing the metadata also replaces the content headers, they have to be sent again
+            extra_args = {"ContentType": response.get("ContentType") or "application/octet-stream"}
+            if response.get("ContentEncoding"):
+                extra_args["ContentEncoding"] = response["ContentEncoding"]
+            self.client.copy_object(
                 Bucket=bucket_name,
                 Key=object_name,
-                Body=data,
-                ContentLength=length,
-                ContentType=content_type,
+                CopySource={"Bucket": bucket_name, "Key": object_name},
+                Metadata=metadata,
+                MetadataDirective="REPLACE",
+                **extra_args
             )
-            print(f"Object '{object_name}' uploaded to bucket '{bucket_name}'.")
+            return True
         except Exception as e:
-            print(f"Error uploading object: {e}")
-    
+            print(f"Error updating the metadata of object '{object_name}': {e}")
+            return False
+
+    def _cache_path(self, bucket_name, object_name, etag: str, encoding: Optional[str]) -> str:
+        name = f"{object_name.replace('/', '__')}.{etag.strip(chr(34))}.{encoding or 'raw'}"
+        return os.path.join(self.cache_dir, bucket_name, name)
+
+    def _download_to_cache(self, bucket_name, object_name) -> Optional[str]:
+        """Path of the cached copy of the current version of an object, downloading it if needed"""
+        response = self.client.head_object(Bucket=bucket_name, Key=object_name)
+        path = self._cache_path(bucket_name, object_name, response["ETag"], response.get("ContentEncoding"))
+        if os.path.exists(path):
+            return path
+
+        # Drop the copies of older versions of the object
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        prefix = f"{object_name.replace('/', '__')}."
+        for name in os.listdir(os.path.dirname(path)):
+            if name.startswith(prefix) and name[len(prefix):].count(".") == 1:
+                os.remove(os.path.join(os.path.dirname(path), name))
+
+        # Download next to the final path and rename, so an interrupted download never looks cached
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as file:
+            self.client.download_fileobj(bucket_name, object_name, file, Config=self.transfer_config)
+        os.replace(tmp_path, path)
+        return path
+
+    def open_object(self, bucket_name, object_name) -> BinaryIO:
+        """
+        Opens an object for streaming reads, decompressing it on the fly. With the on-disk cache enabled the object
+        is only downloaded when its ETag changed, and is read from the cached copy.
+
+        :param bucket_name: Name of the bucket.
+        :param object_name: Name of the object (key) in the bucket.
+        :return: A binary file-like object, to be closed by the caller (usable as a context manager).
+        """
+        if self.cache_dir:
+            path = self._download_to_cache(bucket_name, object_name)
+            encoding = path.rsplit(".", 1)[-1]
+            return _decompressing_reader(open(path, "rb"), None if encoding == "raw" else encoding)
+
+        response = self.client.get_object(Bucket=bucket_name, Key=object_name)
+        return _decompressing_reader(response['Body'], response.get('ContentEncoding'))
+
+    def iter_object(self, bucket_name, object_name, chunk_size=MINIO_READ_CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Streams the (decompressed) content of an object in chunks of at most `chunk_size` bytes.
+
+        :param bucket_name: Name of the bucket.
+        :param object_name: Name of the object (key) in the bucket.
+        :param chunk_size: Maximum size of the yielded chunks.
+        """
+        with self.open_object(bucket_name, object_name) as reader:
+            while True:
+                chunk = reader.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
     def get_object(self, bucket_name, object_name):
         """
         Retrieves an object from a bucket.
 
         :param bucket_name: Name of the bucket.
         :param object_name: Name of the object (key) in the bucket.
-        :return: The content of the object as bytes.
+        :return: The (decompressed) content of the object as bytes.
         """
         try:
-            response = self.client.get_object(Bucket=bucket_name, Key=object_name)
-            return response['Body'].read()
+            with self.open_object(bucket_name, object_name) as reader:
+                return reader.read()
         except Exception as e:
             print(f"Error retrieving object '{object_name}' from bucket '{bucket_name}': {e}")
             return None
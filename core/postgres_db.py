@@ -1,6 +1,13 @@
 import os
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, Column, String, Text, Integer, UniqueConstraint
+from sqlalchemy import create_engine, Column, String, Text, Integer, DateTime, UniqueConstraint, or_, literal_column, func, select, text, inspect
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -14,13 +21,72 @@ HOST = 'localhost' if os.getenv("ENVIRONMENT") == "local" else 'postgres'
 USERNAME = os.getenv("POSTGRES_USER", "default_username")
 PASSWORD = os.getenv("POSTGRES_PASSWORD", "default_password")
 DATABASE = os.getenv("POSTGRES_DB", "default_database")
-DATABASE_URL = f"postgresql+psycopg2://{USERNAME}:{PASSWORD}@{HOST}:5432/{DATABASE}"
+# Overridable, e.g. with "sqlite:///articles.db" to run without a PostgreSQL server
+DATABASE_URL = os.getenv("DATABASE_URL") or f"postgresql+psycopg2://{USERNAME}:{PASSWORD}@{HOST}:5432/{DATABASE}"
+ARTICLE_UPSERT_BATCH_SIZE = int(os.getenv("ARTICLE_UPSERT_BATCH_SIZE", "500"))
+# Rows fetched per round-trip when streaming articles with a server-side cursor
+ARTICLE_STREAM_BATCH_SIZE = int(os.getenv("ARTICLE_STREAM_BATCH_SIZE", "1000"))
+
+# Connection pool of the engine
+POSTGRES_POOL_SIZE = int(os.getenv("POSTGRES_POOL_SIZE", "5"))
+POSTGRES_MAX_OVERFLOW = int(os.getenv("POSTGRES_MAX_OVERFLOW", "10"))
+POSTGRES_POOL_PRE_PING = os.getenv("POSTGRES_POOL_PRE_PING", "true") == "true"
+POSTGRES_POOL_RECYCLE = int(os.getenv("POSTGRES_POOL_RECYCLE", "1800"))
+POSTGRES_CONNECT_TIMEOUT = int(os.getenv("POSTGRES_CONNECT_TIMEOUT", "10"))
+
+# The engine is created on first use (or by init_engine), so importing this module never connects
+_engine = None
+_engine_lock = threading.RLock()
+
+
+def init_engine(url=DATABASE_URL, **engine_kwargs):
+    """
+    Create the database engine used by every session, replacing the current one.
+
+    :param url: Database URL.
+    :param engine_kwargs: Arguments for `create_engine`, overriding the pool settings from the environment.
+        The pool settings only apply to PostgreSQL.
+    :return: The new engine.
+    """
+    global _engine
+    kwargs = {}
+    if url.startswith("postgresql"):
+        kwargs = {
+            "pool_size": POSTGRES_POOL_SIZE,
+            "max_overflow": POSTGRES_MAX_OVERFLOW,
+            "pool_pre_ping": POSTGRES_POOL_PRE_PING,
+            "pool_recycle": POSTGRES_POOL_RECYCLE,
+            "connect_args": {"connect_timeout": POSTGRES_CONNECT_TIMEOUT},
+        }
+    kwargs.update(engine_kwargs)
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+        _engine = create_engine(url, **kwargs)
+        Session.configure(bind=_engine)
+        return _engine
+
+
+def get_engine():
+    """Return the database engine, creating it on first use"""
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                return init_engine()
+    return _engine
+
+
+class LazySessionmaker(sessionmaker):
+    """Session factory that binds to the engine when the first session is created"""
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            get_engine()
+        return super().__call__(**local_kw)
 
-# Create the database engine
-engine = create_engine(DATABASE_URL)
 
 # Create a configured "Session" class
-Session = sessionmaker(bind=engine)
+Session = LazySessionmaker()
 
 # Create a base class for declarative models
 Base = declarative_base()
@@ -38,8 +104,186 @@ class Article(Base):
     chapter = Column(String)
     section = Column(String)
     link = Column(String)
+    # Set when the article is inserted and every time its content changes
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
 
     __table_args__ = (UniqueConstraint('source', 'article_id', name='_source_article_id_uc'),)
 
-# Create all tables in the database (if they don't already exist)
-Base.metadata.create_all(engine)
+
+# Columns rewritten when an already stored article is parsed again
+ARTICLE_UPSERT_COLUMNS = ['article_title', 'article_body', 'part', 'title', 'chapter', 'section', 'link']
+
+
+def _upsert_article_batch(session, batch: List[Dict]) -> List:
+    """
+    Insert or update one batch of articles with INSERT ... ON CONFLICT (source, article_id) DO UPDATE.
+    Rows whose columns are all unchanged are not updated and not returned. Works on PostgreSQL and SQLite.
+
+    :return: (id, inserted) rows of the inserted and updated articles.
+    """
+    table = Article.__table__
+    if session.get_bind().dialect.name == "sqlite":
+        # SQLite has no xmax, but new rows get IDs above the largest one before the statement
+        max_id = session.execute(select(func.coalesce(func.max(table.c.id), 0))).scalar()
+        statement = sqlite_insert(table).values(batch)
+        inserted = (table.c.id > max_id).label("inserted")
+    else:
+        statement = pg_insert(table).values(batch)
+        inserted = literal_column("(xmax = 0)").label("inserted")
+    statement = statement.on_conflict_do_update(
+        index_elements=['source', 'article_id'],
+        set_={**{column: statement.excluded[column] for column in ARTICLE_UPSERT_COLUMNS}, 'updated_at': func.now()},
+        where=or_(*[table.c[column].is_distinct_from(statement.excluded[column]) for column in ARTICLE_UPSERT_COLUMNS])
+    ).returning(table.c.id, inserted)
+    return session.execute(statement).all()
+
+
+def bulk_upsert_articles(articles: Iterable[Dict], batch_size=ARTICLE_UPSERT_BATCH_SIZE) -> Dict:
+    """
+    Write parsed articles in batches, inserting new ones and updating the ones whose content changed.
+
+    :param articles: Dicts with the Article columns (except the primary key).
+    :param batch_size: Number of articles sent in one statement.
+    :return: Dict with the number of "inserted", "updated" and "unchanged" articles, and the
+        "touched_ids" of the inserted and updated ones.
+    """
+    result = {"inserted": 0, "updated": 0, "unchanged": 0, "touched_ids": []}
+    session = Session()
+    try:
+        batch = {}
+        for article in articles:
+            # A statement cannot touch the same row twice, the last version of an article wins
+            batch[(article['source'], article['article_id'])] = article
+            if len(batch) >= batch_size:
+                rows = _upsert_article_batch(session, list(batch.values()))
+                _count_upserted(result, rows, len(batch))
+                batch = {}
+        if batch:
+            rows = _upsert_article_batch(session, list(batch.values()))
+            _count_upserted(result, rows, len(batch))
+        session.commit()
+        return result
+    finally:
+        session.close()
+
+
+def _count_upserted(result: Dict, rows: List, batch_size: int):
+    inserted = sum(1 for row in rows if row.inserted)
+    result["inserted"] += inserted
+    result["updated"] += len(rows) - inserted
+    result["unchanged"] += batch_size - len(rows)
+    result["touched_ids"].extend(row.id for row in rows)
+
+
+# Columns returned by stream_articles by default: everything but the bookkeeping timestamp
+ARTICLE_ROW_COLUMNS = (
+    Article.id, Article.source, Article.article_id, Article.article_title, Article.article_body,
+    Article.part, Article.title, Article.chapter, Article.section, Article.link
+)
+
+
+def stream_articles(columns=ARTICLE_ROW_COLUMNS, source: Optional[str] = None, changed_since: Optional[datetime] = None,
+                    yield_per=ARTICLE_STREAM_BATCH_SIZE) -> Iterator[Row]:
+    """
+    Iterate over articles with a server-side cursor, fetching `yield_per` rows at a time, so memory does not grow
+    with the number of articles. Rows are plain tuples with attribute access (e.g. `row.article_body`), not ORM
+    instances, and come in primary key order.
+
+    :param columns: Article columns to fetch.
+    :param source: Only return the articles of this source (e.g. "CODUL_CIVIL").
+    :param changed_since: Only return the articles inserted or changed after this time.
+    :param yield_per: Number of rows fetched per round-trip.
+    """
+    statement = select(*columns).order_by(Article.id)
+    if source:
+        statement = statement.where(Article.source == source)
+    if changed_since is not None:
+        statement = statement.where(Article.updated_at > changed_since)
+
+    session = Session()
+    try:
+        result = session.execute(statement.execution_options(stream_results=True, yield_per=yield_per))
+        for row in result:
+            yield row
+    finally:
+        session.close()
+
+
+def get_articles_by_ids(ids: Iterable[int]) -> Dict[int, Dict]:
+    """
+    Fetch the display fields of many articles with a single query.
+
+    :param ids: Primary keys of the articles.
+    :return: Mapping of article ID to a dict with source, article_title, article_body and link.
+    """
+    ids = list(set(ids))
+    if not ids:
+        return {}
+    session = Session()
+    try:
+        rows = session.query(
+            Article.id, Article.source, Article.article_title, Article.article_body, Article.link
+        ).filter(Article.id.in_(ids)).all()
+        return {row.id: row._asdict() for row in rows}
+    finally:
+        session.close()
+
+
+# Version counters that let long-running services detect that a dataset was rewritten
+class DataVersion(Base):
+    __tablename__ = 'data_versions'
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+def get_data_version(name: str) -> int:
+    """
+    Return the current version of a dataset (e.g. "articles"), or 0 if it was never bumped, including when
+    the schema was not created yet (readers such as the search API may start before data processing).
+    """
+    session = Session()
+    try:
+        data_version = session.get(DataVersion, name)
+        return data_version.version if data_version else 0
+    except (ProgrammingError, OperationalError):
+        if inspect(get_engine()).has_table(DataVersion.__tablename__):
+            raise
+        return 0
+    finally:
+        session.close()
+
+
+def bump_data_version(name: str) -> int:
+    """
+    Increment the version of a dataset after it was modified and return the new version.
+    """
+    session = Session()
+    try:
+        data_version = session.get(DataVersion, name, with_for_update=True)
+        if data_version is None:
+            data_version = DataVersion(name=name, version=0)
+            session.add(data_version)
+        data_version.version += 1
+        session.commit()
+        return data_version.version
+    finally:
+        session.close()
+
+
+def create_schema():
+    """Create all tables in the database (if they don't already exist) and add the columns of newer versions"""
+    engine = get_engine()
+    Base.metadata.create_all(engine)
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as connection:
+            connection.execute(text(
+                "ALTER TABLE articles ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()"
+            ))
+            connection.execute(text("CREATE INDEX IF NOT EXISTS ix_articles_updated_at ON articles (updated_at)"))
+
+
+def __getattr__(name):
+    # Keep `from core.postgres_db import engine` working without creating the engine at import time
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,25 +1,161 @@
 import os
+import threading
 from uuid import uuid5, NAMESPACE_DNS
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
-from typing import List, Dict
-from core.postgres_db import Session, Article
+from typing import List, Dict, Iterable, Optional, Tuple, Union
+from core.postgres_db import Article, get_articles_by_ids
+from core.local_index import LocalVectorIndex
+from core.timing import span
 
 
-# Initialize Qdrant client
+# "qdrant" uses the Qdrant server, "local" the embedded index from core.local_index (no server needed)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant")
+
+# Qdrant client settings
 QDRANT_HOST = "localhost" if os.getenv("ENVIRONMENT") == "local" else "qdrant"
-qdrant_client = QdrantClient(host=QDRANT_HOST, port=6333)
+QDRANT_PORT = int(os.getenv("QDRANT_PORT", "6333"))
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+# gRPC has lower overhead than HTTP for searches and large upserts
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "false") == "true"
+QDRANT_TIMEOUT = int(os.getenv("QDRANT_TIMEOUT", "10"))
 
 # Create collection (run once)
 COLLECTION_NAME = "romanian_laws"
-EMBEDDING_DIM = 768  # Verify your model's output dimension
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "768"))  # Verify your model's output dimension
+# Data version bumped after every embeddings run, so the search API can drop cached results
+EMBEDDINGS_DATA_VERSION = "embeddings"
+QDRANT_UPSERT_BATCH_SIZE = int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", "512"))
+
+# Collection tuning, applied when the collection is created
+QDRANT_HNSW_M = int(os.getenv("QDRANT_HNSW_M", "16"))
+QDRANT_HNSW_EF_CONSTRUCT = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", "100"))
+# "int8" keeps a scalar-quantized copy of the vectors in RAM for search, "none" searches the float32 vectors
+QDRANT_QUANTIZATION = os.getenv("QDRANT_QUANTIZATION", "none")
+# Keep the original vectors (and the HNSW graph) on disk instead of in RAM
+QDRANT_ON_DISK = os.getenv("QDRANT_ON_DISK", "false") == "true"
+# Search-time settings: HNSW beam size (0 for Qdrant's default) and re-scoring of quantized candidates
+QDRANT_SEARCH_EF = int(os.getenv("QDRANT_SEARCH_EF", "0"))
+QDRANT_RESCORE = os.getenv("QDRANT_RESCORE", "true") == "true"
+QDRANT_OVERSAMPLING = float(os.getenv("QDRANT_OVERSAMPLING", "2.0"))
+# Store the chunk text in the payload. Without it, hits show the chunk sliced from the article body by its char span.
+QDRANT_STORE_CHUNK_TEXT = os.getenv("QDRANT_STORE_CHUNK_TEXT", "true") == "true"
+# Payload fields with a keyword index, usable in filters without scanning every point
+PAYLOAD_INDEX_FIELDS = ["source", "chapter", "section"]
+
+# Hybrid search: each ranking contributes top_k * HYBRID_CANDIDATES_FACTOR candidates to reciprocal rank fusion
+HYBRID_CANDIDATES_FACTOR = int(os.getenv("HYBRID_CANDIDATES_FACTOR", "4"))
+RRF_K = 60
+# (query embedding, top_k, query text or None, source or None) of one query of `search_laws_by_vectors`
+VectorQuery = Tuple[List[float], int, Optional[str], Optional[str]]
+# (article ID, score, cosine similarity or None, text) of one hit. The text is the chunk text, its (char start, char end)
+# span in the article body when the text is not stored, or None for hits found only by the lexical index.
+HitEntry = Tuple[int, float, Optional[float], Union[str, Tuple[int, int], None]]
+# Characters of the article body shown for hits found only by the lexical index
+LEXICAL_SNIPPET_CHARS = 2000
+
+
+# The client is created on first use (or by init_qdrant_client), so importing this module never connects
+_qdrant_client = None
+_qdrant_client_lock = threading.Lock()
+
+
+def init_qdrant_client(client=None):
+    """
+    Set the client used by every function of this module.
+
+    :param client: A QdrantClient (or LocalVectorIndex). If None, one is created for VECTOR_BACKEND.
+    :return: The client.
+    """
+    global _qdrant_client
+    if client is None:
+        if VECTOR_BACKEND == "local":
+            client = LocalVectorIndex()
+        else:
+            client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT, grpc_port=QDRANT_GRPC_PORT,
+                                  prefer_grpc=QDRANT_PREFER_GRPC, timeout=QDRANT_TIMEOUT)
+    _qdrant_client = client
+    return client
+
+
+def get_qdrant_client():
+    """Return the Qdrant client, creating it on first use"""
+    if _qdrant_client is None:
+        with _qdrant_client_lock:
+            if _qdrant_client is None:
+                return init_qdrant_client()
+    return _qdrant_client
+
+
+def reload_vector_index():
+    """
+    Make the next searches read the current vectors after another process rewrote them. Only the local index
+    needs it, it keeps its collections loaded; a Qdrant server serves the changes itself.
+    """
+    client = get_qdrant_client()
+    if hasattr(client, "reload"):
+        client.reload()
+
+
+def __getattr__(name):
+    # Keep `from core.qdrant_db import qdrant_client` working without creating the client at import time
+    if name == "qdrant_client":
+        return get_qdrant_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def collection_params(m=QDRANT_HNSW_M, ef_construct=QDRANT_HNSW_EF_CONSTRUCT, quantization=QDRANT_QUANTIZATION,
+                      on_disk=QDRANT_ON_DISK) -> Dict:
+    """Arguments of `create_collection` for the given HNSW, quantization and storage settings"""
+    params = {
+        "vectors_config": models.VectorParams(
+            size=EMBEDDING_DIM,
+            distance=models.Distance.COSINE,
+            on_disk=on_disk
+        ),
+        "hnsw_config": models.HnswConfigDiff(m=m, ef_construct=ef_construct, on_disk=on_disk),
+    }
+    if quantization == "int8":
+        params["quantization_config"] = models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    return params
+
+
+def search_params(ef=QDRANT_SEARCH_EF, quantization=QDRANT_QUANTIZATION, rescore=QDRANT_RESCORE,
+                  oversampling=QDRANT_OVERSAMPLING) -> Optional[models.SearchParams]:
+    """Search-time parameters matching the collection settings, or None for Qdrant's defaults"""
+    if not ef and quantization == "none":
+        return None
+    return models.SearchParams(
+        hnsw_ef=ef or None,
+        quantization=models.QuantizationSearchParams(rescore=rescore, oversampling=oversampling) if quantization != "none" else None
+    )
+
+
+def create_payload_indexes(collection_name=COLLECTION_NAME):
+    """Create the keyword indexes of PAYLOAD_INDEX_FIELDS (existing indexes are left as they are)"""
+    for field_name in PAYLOAD_INDEX_FIELDS:
+        get_qdrant_client().create_payload_index(
+            collection_name=collection_name,
+            field_name=field_name,
+            field_schema=models.PayloadSchemaType.KEYWORD
+        )
+
 
+def setup_qdrant_collection(reset: Optional[bool] = None):
+    """
+    Create the collection if it does not exist yet.
 
-def setup_qdrant_collection():
+    :param reset: Delete and recreate an existing collection. Defaults to the RESET_EMBEDDINGS environment variable.
+    """
+    if reset is None:
+        reset = os.getenv("RESET_EMBEDDINGS") == "true"
+    qdrant_client = get_qdrant_client()
     try:
         qdrant_client.get_collection(COLLECTION_NAME)
         # Only reaches here if collection exists
-        if os.getenv("RESET_EMBEDDINGS") == "true":
+        if reset:
             print("Collection exists, starting deletion...")
             qdrant_client.delete_collection(COLLECTION_NAME)
             raise ValueError("Forcing recreation")
@@ -27,55 +163,94 @@ def setup_qdrant_collection():
             print("Collection already exists, skipping creation.")
     except (ValueError, Exception):  # Explicitly catch Qdrant's not found error
         print("Collection does not exist, creating...")
-        qdrant_client.create_collection(
-            collection_name=COLLECTION_NAME,
-            vectors_config=models.VectorParams(
-                size=EMBEDDING_DIM,
-                distance=models.Distance.COSINE
-            )
-        )
+        qdrant_client.create_collection(collection_name=COLLECTION_NAME, **collection_params())
+    create_payload_indexes()
+
+
+def chunk_point_id(article_id: int, idx: int) -> str:
+    """Deterministic UUID of a chunk point, derived from the article ID and chunk index"""
+    return str(uuid5(NAMESPACE_DNS, f"{article_id}_{idx}"))
+
+
+def _article_point(article: Article, idx: int, embedding, chunk: str, extra_payload: Optional[Dict] = None,
+                   span: Optional[Tuple[int, int]] = None) -> models.PointStruct:
+    """Build the Qdrant point for one chunk of an article, with the chunk's character span in the article body if known"""
+    payload = {
+        "article_id": article.id,
+        "source": article.source,
+        "law_id": article.article_id,
+        "chunk_index": idx,
+        "title": article.article_title,
+        "section": article.section,
+        "chapter": article.chapter
+    }
+    if QDRANT_STORE_CHUNK_TEXT or span is None:
+        payload["chunk_text"] = chunk
+    if span is not None:
+        payload["char_start"], payload["char_end"] = span
+    if extra_payload:
+        payload.update(extra_payload)
+
+    return models.PointStruct(
+        id=chunk_point_id(article.id, idx),
+        vector=embedding.tolist(),
+        payload=payload
+    )
 
 
 def store_embeddings_qdrant(article: Article, embeddings: List, chunks: List[str]):
     """ Store embeddings in Qdrant with article metadata. If the article already exists, it will be overwritten. """
-    points = []
-    
-    for idx, (embedding, chunk) in enumerate(zip(embeddings, chunks)):
-        # Generate deterministic UUID from article ID and chunk index
-        point_id = str(uuid5(NAMESPACE_DNS, f"{article.id}_{idx}"))
-
-        points.append(
-            models.PointStruct(
-                id=point_id,
-                vector=embedding.tolist(),
-                payload={
-                    "article_id": article.id,
-                    "source": article.source,
-                    "law_id": article.article_id,
-                    "chunk_index": idx,
-                    "chunk_text": chunk,
-                    "title": article.article_title,
-                    "section": article.section,
-                    "chapter": article.chapter
-                }
-            )
-        )
+    points = [
+        _article_point(article, idx, embedding, chunk)
+        for idx, (embedding, chunk) in enumerate(zip(embeddings, chunks))
+    ]
     
-    qdrant_client.upsert(
+    get_qdrant_client().upsert(
         collection_name=COLLECTION_NAME,
         points=points
     )
     print(f"Stored {len(embeddings)} chunks for article {article.source} / {article.article_title}")
 
 
+def store_embeddings_bulk_qdrant(records: Iterable[Tuple[Article, List, List[str]]], batch_size=QDRANT_UPSERT_BATCH_SIZE,
+                                 extra_payloads: Optional[Dict[int, Dict]] = None,
+                                 chunk_spans: Optional[Dict[int, List[Tuple[int, int]]]] = None) -> int:
+    """
+    Store the embeddings of many articles at once, upserting them in batches of points.
+
+    :param records: (article, embeddings, chunks) tuples.
+    :param batch_size: Maximum number of points sent in one upsert call.
+    :param extra_payloads: Optional additional payload fields for every chunk, keyed by article ID.
+    :param chunk_spans: Optional (char start, char end) of every chunk in the article body, keyed by article ID.
+    :return: The number of stored points.
+    """
+    extra_payloads = extra_payloads or {}
+    chunk_spans = chunk_spans or {}
+    points = []
+    stored = 0
+    for article, embeddings, chunks in records:
+        extra_payload = extra_payloads.get(article.id)
+        spans = chunk_spans.get(article.id)
+        for idx, (embedding, chunk) in enumerate(zip(embeddings, chunks)):
+            points.append(_article_point(article, idx, embedding, chunk, extra_payload, spans[idx] if spans else None))
+            if len(points) >= batch_size:
+                get_qdrant_client().upsert(collection_name=COLLECTION_NAME, points=points)
+                stored += len(points)
+                points = []
+    if points:
+        get_qdrant_client().upsert(collection_name=COLLECTION_NAME, points=points)
+        stored += len(points)
+    return stored
+
+
 def check_existence_and_store_embeddings_qdrant(article: Article, embeddings: List, chunks: List[str]):
     """Store embeddings only if not already present in Qdrant"""
     points = []
     for idx, (embedding, chunk) in enumerate(zip(embeddings, chunks)):
-        point_id = str(uuid5(NAMESPACE_DNS, f"{article.id}_{idx}"))
+        point_id = chunk_point_id(article.id, idx)
         
         # Skip if already exists
-        existing = qdrant_client.retrieve(
+        existing = get_qdrant_client().retrieve(
             collection_name=COLLECTION_NAME,
             ids=[point_id]
         )
@@ -85,58 +260,234 @@ def check_existence_and_store_embeddings_qdrant(article: Article, embeddings: Li
         else:
             # If not, store it
             print(f"Point {point_id} does not exist, storing...")
-            points.append(
-                models.PointStruct(
-                    id=point_id,
-                    vector=embedding.tolist(),
-                    payload={
-                        "article_id": article.id,
-                        "source": article.source,
-                        "law_id": article.article_id,
-                        "chunk_index": idx,
-                        "chunk_text": chunk,
-                        "title": article.article_title,
-                        "section": article.section,
-                        "chapter": article.chapter
-                    }
-                )
-            )
+            points.append(_article_point(article, idx, embedding, chunk))
     if len(points) > 0:
-        qdrant_client.upsert(
+        get_qdrant_client().upsert(
             collection_name=COLLECTION_NAME,
             points=points
         )
         print(f"Stored {len(embeddings)} chunks for article {article.source} / {article.article_title}")
 
 
-def search_laws(query: str, model, top_k=5) -> List[Dict]:
-    """Search laws using semantic similarity"""
-    # Generate query embedding
-    query_embedding = model.encode(query).tolist()
-    
-    # Search Qdrant
-    results = qdrant_client.query_points(
+def get_stored_content_hashes(batch_size=QDRANT_UPSERT_BATCH_SIZE) -> Dict[int, Tuple[Optional[str], int]]:
+    """
+    Scan the collection and return, for every embedded article, its stored content hash and number of chunks.
+
+    :param batch_size: Number of points fetched per scroll request.
+    :return: Mapping of article ID to (content hash, chunk count). The hash is None for points stored without one.
+    """
+    state = {}
+    offset = None
+    while True:
+        points, offset = get_qdrant_client().scroll(
+            collection_name=COLLECTION_NAME,
+            limit=batch_size,
+            offset=offset,
+            with_payload=["article_id", "content_hash"],
+            with_vectors=False
+        )
+        for point in points:
+            article_id = point.payload["article_id"]
+            content_hash, count = state.get(article_id, (None, 0))
+            state[article_id] = (point.payload.get("content_hash", content_hash), count + 1)
+        if offset is None:
+            break
+    return state
+
+
+def delete_article_chunks(article_id: int, start: int, stop: int):
+    """Delete the chunk points [start, stop) of an article"""
+    if stop <= start:
+        return
+    get_qdrant_client().delete(
         collection_name=COLLECTION_NAME,
-        query=query_embedding,
-        limit=top_k,
-        with_payload=True
+        points_selector=models.PointIdsList(
+            points=[chunk_point_id(article_id, idx) for idx in range(start, stop)]
+        )
     )
-    
-    # Get full article details from PostgreSQL
+
+
+def _hit_text(payload: Dict):
+    """Chunk text of a hit, or its (char start, char end) span in the article body when the text is not stored"""
+    if "chunk_text" in payload:
+        return payload["chunk_text"]
+    return payload["char_start"], payload["char_end"]
+
+
+def _fetch_articles(article_ids: List[int], article_cache=None) -> Dict[int, Dict]:
+    if article_cache is not None:
+        return article_cache.get_many(article_ids)
+    return get_articles_by_ids(article_ids)
+
+
+def _hydrate(entries: List[HitEntry], article_cache=None) -> List[Dict]:
+    """
+    Attach the full article details from PostgreSQL to (article ID, score, similarity, chunk text) entries, with
+    one bulk fetch (or none at all when every article is in the cache). The chunk text can also be a (char start,
+    char end) span of the article body. Entries without chunk text show the article body.
+    """
+    articles = _fetch_articles([entry[0] for entry in entries], article_cache)
+    return _format_hits(entries, articles)
+
+
+def _format_hits(entries: List[HitEntry], articles: Dict[int, Dict]) -> List[Dict]:
+    """Build the search results of `HitEntry` tuples from already fetched articles"""
     output = []
-    session = Session()
-    try:
-        for hit in results.points:
-            article = session.get(Article, hit.payload["article_id"])
-            output.append({
-                "score": hit.score,
-                "text": hit.payload["chunk_text"],
-                "article_title": article.article_title,
-                "full_text": article.article_body,
-                "link": article.link,
-                "reference": f"{article.article_title} din {article.source}",
-            })
-    finally:
-        session.close()
-    
+    for article_id, score, similarity, text in entries:
+        article = articles.get(article_id)
+        if article is None:
+            # The article was removed from PostgreSQL after it was indexed
+            continue
+        if text is None:
+            text = article["article_body"][:LEXICAL_SNIPPET_CHARS]
+        elif isinstance(text, tuple):
+            text = article["article_body"][text[0]:text[1]]
+        output.append({
+            "score": score,
+            "similarity": similarity,
+            "text": text,
+            "article_title": article["article_title"],
+            "full_text": article["article_body"],
+            "link": article["link"],
+            "reference": f"{article['article_title']} din {article['source']}",
+        })
     return output
+
+
+def _dense_entries(points) -> List[HitEntry]:
+    """Entries of Qdrant hits, whose score is their cosine similarity"""
+    return [(hit.payload["article_id"], hit.score, hit.score, _hit_text(hit.payload)) for hit in points]
+
+
+def hydrate_hits(points, article_cache=None) -> List[Dict]:
+    """Attach the full article details from PostgreSQL to Qdrant hits"""
+    return _hydrate(_dense_entries(points), article_cache)
+
+
+def fuse_hits(points, lexical_hits: List[Tuple[int, float]], top_k: int, rrf_k=RRF_K) -> List[HitEntry]:
+    """
+    Combine dense and lexical rankings with reciprocal rank fusion, at article level.
+    Each article keeps the text and cosine similarity of its best dense chunk, if it has one.
+
+    :return: Up to `top_k` (article ID, fused score, similarity or None, text) entries, best first.
+    """
+    scores = {}
+    texts = {}
+    similarities = {}
+    dense_rank = 0
+    for hit in points:
+        article_id = hit.payload["article_id"]
+        if article_id in texts:
+            continue
+        texts[article_id] = _hit_text(hit.payload)
+        similarities[article_id] = hit.score
+        scores[article_id] = 1 / (rrf_k + dense_rank + 1)
+        dense_rank += 1
+    for rank, (article_id, _) in enumerate(lexical_hits):
+        scores[article_id] = scores.get(article_id, 0.0) + 1 / (rrf_k + rank + 1)
+
+    best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    return [(article_id, score, similarities.get(article_id), texts.get(article_id)) for article_id, score in best]
+
+
+def source_filter(source: Optional[str]) -> Optional[models.Filter]:
+    """Qdrant filter restricting hits to one legal document (e.g. "CODUL_FISCAL"), or None for no restriction"""
+    if not source:
+        return None
+    return models.Filter(must=[models.FieldCondition(key="source", match=models.MatchValue(value=source))])
+
+
+def search_laws_by_vector(query_embedding: List[float], top_k=5, article_cache=None, query_text: Optional[str] = None,
+                          lexical_index=None, source: Optional[str] = None) -> List[Dict]:
+    """
+    Search laws with an already computed query embedding. When a lexical index and the query text are given,
+    BM25 hits are fused with the Qdrant hits in the same call. With a source, only articles of that legal
+    document are returned.
+    """
+    hybrid = lexical_index is not None and query_text is not None
+    limit = top_k * HYBRID_CANDIDATES_FACTOR if hybrid else top_k
+
+    # Search Qdrant
+    with span("qdrant"):
+        results = get_qdrant_client().query_points(
+            collection_name=COLLECTION_NAME,
+            query=query_embedding,
+            limit=limit,
+            query_filter=source_filter(source),
+            search_params=search_params(),
+            with_payload=True
+        )
+    
+    # Get full article details from PostgreSQL
+    if not hybrid:
+        with span("hydrate"):
+            return hydrate_hits(results.points, article_cache)
+    with span("lexical"):
+        lexical_hits = lexical_index.search(query_text, limit)
+        if source:
+            # The lexical index covers every source, keep the hits of the requested one
+            articles = _fetch_articles([article_id for article_id, _ in lexical_hits], article_cache)
+            lexical_hits = [(article_id, score) for article_id, score in lexical_hits
+                            if article_id in articles and articles[article_id]["source"] == source]
+    with span("hydrate"):
+        return _hydrate(fuse_hits(results.points, lexical_hits, top_k), article_cache)
+
+
+def search_laws(query: str, model, top_k=5, article_cache=None, lexical_index=None, source: Optional[str] = None) -> List[Dict]:
+    """Search laws using semantic similarity"""
+    # Generate query embedding
+    query_embedding = model.encode(query).tolist()
+    return search_laws_by_vector(query_embedding, top_k, article_cache, query, lexical_index, source)
+
+
+def search_laws_by_vectors(queries: List[VectorQuery], article_cache=None, lexical_index=None) -> List[List[Dict]]:
+    """
+    Batch variant of `search_laws_by_vector`: every query is searched in one Qdrant batch request, and the
+    articles of all hits (dense and lexical) are fetched at once.
+
+    :param queries: (query embedding, top_k, query text, source) of every query. Queries with a text are fused
+        with the lexical index when one is given.
+    :return: The results of every query, in order.
+    """
+    if not queries:
+        return []
+    hybrid = [lexical_index is not None and query_text is not None for _, _, query_text, _ in queries]
+
+    with span("qdrant"):
+        responses = get_qdrant_client().query_batch_points(
+            collection_name=COLLECTION_NAME,
+            requests=[
+                models.QueryRequest(
+                    query=query_embedding,
+                    limit=top_k * HYBRID_CANDIDATES_FACTOR if is_hybrid else top_k,
+                    filter=source_filter(source),
+                    params=search_params(),
+                    with_payload=True
+                )
+                for (query_embedding, top_k, _, source), is_hybrid in zip(queries, hybrid)
+            ]
+        )
+
+    with span("lexical"):
+        lexical_hits = [
+            lexical_index.search(query_text, top_k * HYBRID_CANDIDATES_FACTOR) if is_hybrid else None
+            for (_, top_k, query_text, _), is_hybrid in zip(queries, hybrid)
+        ]
+
+    with span("hydrate"):
+        article_ids = {hit.payload["article_id"] for response in responses for hit in response.points}
+        article_ids.update(article_id for hits in lexical_hits if hits for article_id, _ in hits)
+        articles = _fetch_articles(list(article_ids), article_cache)
+
+        results = []
+        for (_, top_k, _, source), response, hits in zip(queries, responses, lexical_hits):
+            if hits is None:
+                entries = _dense_entries(response.points)
+            else:
+                if source:
+                    # The lexical index covers every source, keep the hits of the requested one
+                    hits = [(article_id, score) for article_id, score in hits
+                            if article_id in articles and articles[article_id]["source"] == source]
+                entries = fuse_hits(response.points, hits, top_k)
+            results.append(_format_hits(entries, articles))
+        return results
@@ -0,0 +1,21 @@
+import re
+import unicodedata
+
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def fold_diacritics(text: str) -> str:
+    """
+    Removes diacritics, so that both the comma-below (ș, ț) and the legacy cedilla (ş, ţ) forms,
+    as well as ă, â and î, map to their base ASCII letters.
+    """
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def normalize_question(text: str) -> str:
+    """
+    Lowercases a question, folds its diacritics and collapses whitespace.
+    """
+    return WHITESPACE_RE.sub(" ", fold_diacritics(text.lower())).strip()
@@ -0,0 +1,65 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, List, Optional, Tuple
+
+
+class Timings:
+    def __init__(self, endpoint: str):
+        """
+        Durations of the stages of one request, collected by `span`.
+
+        :param endpoint: Name of the request's endpoint, passed to the span observer.
+        """
+        self.endpoint = endpoint
+        self.spans: List[Tuple[str, float]] = []
+
+    def add(self, stage: str, seconds: float):
+        self.spans.append((stage, seconds))
+        if _observer is not None:
+            _observer(self.endpoint, stage, seconds)
+
+    def server_timing(self, total: Optional[float] = None) -> str:
+        """Value of a Server-Timing header listing every span (and the total) in milliseconds"""
+        entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.spans]
+        if total is not None:
+            entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_current: ContextVar[Optional[Timings]] = ContextVar("timings", default=None)
+# Called with (endpoint, stage, seconds) for every finished span, e.g. to feed a metrics histogram
+_observer: Optional[Callable[[str, str, float], None]] = None
+
+
+def set_span_observer(observer: Optional[Callable[[str, str, float], None]]):
+    global _observer
+    _observer = observer
+
+
+def start_timings(endpoint: str):
+    """Start collecting spans for the current context. Returns the timings and a token for `stop_timings`."""
+    timings = Timings(endpoint)
+    return timings, _current.set(timings)
+
+
+def stop_timings(token):
+    _current.reset(token)
+
+
+@contextmanager
+def span(stage: str):
+    """
+    Time a stage of the current request. Does nothing outside of a request, so library code can be
+    instrumented unconditionally. Code running in executor threads needs the context to be copied
+    (`contextvars.copy_context().run`) for its spans to be recorded.
+    """
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(stage, time.perf_counter() - start)
@@ -1,12 +1,62 @@
+import os
+import json
+import time
+import hashlib
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from core.minio_client import MinIOClient
-from core.legal_docs import LegalDocsEnum
+from core.legal_docs import LegalDocsEnum, CHANGED_SOURCES_MANIFEST, read_pending_sources
+
+
+# Number of documents downloaded at the same time
+COLLECTION_WORKERS = int(os.getenv("COLLECTION_WORKERS", "4"))
+# Seconds to wait for the server to connect and to send data
+COLLECTION_CONNECT_TIMEOUT = float(os.getenv("COLLECTION_CONNECT_TIMEOUT", "10"))
+COLLECTION_READ_TIMEOUT = float(os.getenv("COLLECTION_READ_TIMEOUT", "120"))
+COLLECTION_RETRIES = int(os.getenv("COLLECTION_RETRIES", "3"))
+# Replaces the scheme and host of the document links, e.g. to collect from a local stub (see src.stub_server)
+LEGAL_DOCS_BASE_URL = os.getenv("LEGAL_DOCS_BASE_URL")
+
+# MinIO metadata keys of the stored documents
+ETAG_KEY = "source-etag"
+LAST_MODIFIED_KEY = "source-last-modified"
+CONTENT_HASH_KEY = "content-sha256"
+
+
+def create_session(pool_size=COLLECTION_WORKERS, retries=COLLECTION_RETRIES) -> requests.Session:
+    """
+    Creates a session whose connection pool is shared by all download threads, retrying
+    connection errors and server errors with backoff.
+    """
+    retry = Retry(total=retries, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=["GET"])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def resolve_link(link: str, base_url: Optional[str] = LEGAL_DOCS_BASE_URL) -> str:
+    """Rewrites the scheme and host of a document link to `base_url`, if one is given"""
+    if not base_url:
+        return link
+    path = link.split("://", 1)[-1].split("/", 1)[-1]
+    return f"{base_url.rstrip('/')}/{path}"
 
 
 class SavingUtilities:
-    def __init__(self):
+    def __init__(self, session: Optional[requests.Session] = None, base_url: Optional[str] = LEGAL_DOCS_BASE_URL,
+                 workers=COLLECTION_WORKERS):
         """
         Initializes the SavingUtilities class.
+
+        :param session: HTTP session used for every download. A pooled session is created if not given.
+        :param base_url: Optional scheme and host replacing the one of the document links.
+        :param workers: Number of documents downloaded at the same time.
         """
         self.links = [
             LegalDocsEnum.CODUL_PENAL,
@@ -19,29 +69,105 @@ class SavingUtilities:
         ]
         self.minio_client = MinIOClient()
         self.bucket_name = "legal-docs-minio-bucket"
-    
-    def save_page_content(self, link, filename):
+        self.session = session or create_session(workers)
+        self.base_url = base_url
+        self.workers = workers
+
+    def save_page_content(self, link, filename) -> str:
         """
-        Saves the content of a page to MinIO.
+        Saves the content of a page to MinIO, unless it did not change since the last download.
+
+        The ETag and Last-Modified headers of the previous download are sent back as a conditional request,
+        and the SHA-256 of the content is compared with the one stored in the object metadata, so a page is
+        only uploaded again when its content actually changed. When only the headers changed, the stored ones
+        are refreshed.
+
+        :param link: URL of the page.
+        :param filename: Name of the object in MinIO.
+        :return: "changed" if the page was uploaded, "unchanged" if it was skipped.
         """
-        page = requests.get(link)
+        stored = self.minio_client.head_object(self.bucket_name, filename) or {}
+        headers = {}
+        if stored.get(ETAG_KEY):
+            headers["If-None-Match"] = stored[ETAG_KEY]
+        if stored.get(LAST_MODIFIED_KEY):
+            headers["If-Modified-Since"] = stored[LAST_MODIFIED_KEY]
 
+        page = self.session.get(resolve_link(link, self.base_url), headers=headers,
+                                timeout=(COLLECTION_CONNECT_TIMEOUT, COLLECTION_READ_TIMEOUT))
+        if page.status_code == 304:
+            return "unchanged"
+        page.raise_for_status()
+
+        content_hash = hashlib.sha256(page.content).hexdigest()
+        metadata = {CONTENT_HASH_KEY: content_hash}
+        if page.headers.get("ETag"):
+            metadata[ETAG_KEY] = page.headers["ETag"]
+        if page.headers.get("Last-Modified"):
+            metadata[LAST_MODIFIED_KEY] = page.headers["Last-Modified"]
+
+        if stored.get(CONTENT_HASH_KEY) == content_hash:
+            # Same content under new validators (rotated ETags, or stored before they were recorded): keep the
+            # new ones, or the next conditional request would never get a 304
+            if stored != metadata:
+                self.minio_client.update_metadata(self.bucket_name, filename, metadata)
+            return "unchanged"
+
+        if not self.minio_client.put_object(
+            self.bucket_name, filename, page.content, len(page.content), content_type="text/html", metadata=metadata
+        ):
+            raise RuntimeError(f"Could not upload {filename} to MinIO")
+        return "changed"
+
+    def _collect_one(self, document: LegalDocsEnum) -> Dict:
+        start = time.perf_counter()
+        try:
+            status = self.save_page_content(document.value, f"{document.name}.html")
+        except Exception as e:
+            print(f"{document.name} - Failed to collect: {e}")
+            status = "failed"
+        elapsed = time.perf_counter() - start
+        print(f"{document.name} - {status} in {elapsed:.2f}s")
+        return {"document": document, "status": status}
+
+    def collect(self) -> Dict:
+        """
+        Downloads every document concurrently and writes the manifest of changed sources to MinIO.
+
+        Changed documents stay "pending" in the manifest until data processing has processed them, so a document
+        that changed in a run is not forgotten when the following runs find it unchanged (or fail to download it).
+
+        :return: The manifest, with the names of the changed, unchanged and failed documents of this run, and the
+            "pending" documents with the time they last changed.
+        """
         self.minio_client.create_bucket_if_not_exists(self.bucket_name)
-        self.minio_client.put_object(
-            self.bucket_name, filename, page.content, len(page.content), content_type="text/html"
-        )
+        pending = read_pending_sources(self.minio_client, self.bucket_name) or {}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(self._collect_one, self.links))
+
+        manifest = {"collected_at": datetime.now(timezone.utc).isoformat()}
+        for status in ("changed", "unchanged", "failed"):
+            manifest[status] = [result["document"].name for result in results if result["status"] == status]
+        pending.update({name: manifest["collected_at"] for name in manifest["changed"]})
+        manifest["pending"] = pending
+
+        data = json.dumps(manifest, indent=2).encode("utf-8")
+        self.minio_client.put_object(self.bucket_name, CHANGED_SOURCES_MANIFEST, data, len(data), content_type="application/json")
+        return manifest
 
 
 def main():
     """
     Main function that collects data.
     """
+    start = time.perf_counter()
     doc_saver = SavingUtilities()
-    for link in doc_saver.links:
-        doc_saver.save_page_content(link.value, f"{link.name}.html")
-    doc_saver.minio_client.client.list_buckets()
+    manifest = doc_saver.collect()
 
-    print("Data collection completed.")
+    print(f"Data collection completed in {time.perf_counter() - start:.2f}s: {len(manifest['changed'])} changed, "
+          f"{len(manifest['unchanged'])} unchanged, {len(manifest['failed'])} failed, "
+          f"{len(manifest['pending'])} pending processing.")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,55 @@
+import os
+import hashlib
+from email.utils import formatdate
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+# Directory with one "<document id>.html" file per document, e.g. "109855.html" for CODUL_PENAL
+STUB_DOCS_DIR = os.getenv("STUB_DOCS_DIR", "stub_docs")
+STUB_PORT = int(os.getenv("STUB_PORT", "8002"))
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Serves the files of STUB_DOCS_DIR at any path ending with their document id, with ETag and
+    Last-Modified headers and 304 answers to conditional requests, like the legislation portal.
+    Run it and collect with LEGAL_DOCS_BASE_URL=http://localhost:8002.
+    """
+    requests_served = 0
+
+    def do_GET(self):
+        StubHandler.requests_served += 1
+        document_id = self.path.rstrip("/").rsplit("/", 1)[-1]
+        path = os.path.join(STUB_DOCS_DIR, f"{document_id}.html")
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+
+        with open(path, "rb") as file:
+            content = file.read()
+        etag = f'"{hashlib.md5(content).hexdigest()}"'
+        last_modified = formatdate(os.path.getmtime(path), usegmt=True)
+
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", last_modified)
+        self.end_headers()
+        self.wfile.write(content)
+
+
+def main():
+    server = ThreadingHTTPServer(("0.0.0.0", STUB_PORT), StubHandler)
+    print(f"Serving {STUB_DOCS_DIR} on port {STUB_PORT}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
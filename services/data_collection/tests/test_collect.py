@@ -0,0 +1,112 @@
+import threading
+from http.server import ThreadingHTTPServer
+import pytest
+from core import minio_client
+from core.legal_docs import LegalDocsEnum
+
+pytest.importorskip("requests")
+
+from src import stub_server
+from src.main import SavingUtilities, CONTENT_HASH_KEY
+
+
+class RecordingStubHandler(stub_server.StubHandler):
+    """Stub handler remembering the status of every response, without logging the requests"""
+    statuses = []
+
+    def send_response(self, code, message=None):
+        RecordingStubHandler.statuses.append(code)
+        super().send_response(code, message)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def docs_dir(tmp_path, monkeypatch):
+    """One small page per document, served by the stub"""
+    path = tmp_path / "stub_docs"
+    path.mkdir()
+    for document in LegalDocsEnum:
+        write_document(path, document, f"<html><body>{document.name}</body></html>")
+    monkeypatch.setattr(stub_server, "STUB_DOCS_DIR", str(path))
+    return path
+
+
+@pytest.fixture
+def base_url(docs_dir, tmp_path, monkeypatch):
+    """Stub of the legislation portal, with the collected objects stored under tmp_path"""
+    # The local object store writes to ./local_storage
+    monkeypatch.setattr(minio_client, "MINIO_BACKEND", "local")
+    monkeypatch.chdir(tmp_path)
+    RecordingStubHandler.statuses = []
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RecordingStubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def document_path(docs_dir, document: LegalDocsEnum):
+    return docs_dir / f"{document.value.rsplit('/', 1)[-1]}.html"
+
+
+def write_document(docs_dir, document: LegalDocsEnum, content: str):
+    document_path(docs_dir, document).write_text(content, encoding="utf-8")
+
+
+def collect(base_url: str):
+    RecordingStubHandler.statuses = []
+    return SavingUtilities(base_url=base_url, workers=2).collect()
+
+
+def test_unchanged_documents_are_answered_with_304(base_url):
+    first = collect(base_url)
+    assert len(first["changed"]) == len(LegalDocsEnum)
+    assert RecordingStubHandler.statuses == [200] * len(LegalDocsEnum)
+
+    second = collect(base_url)
+    assert second["changed"] == []
+    assert len(second["unchanged"]) == len(LegalDocsEnum)
+    assert RecordingStubHandler.statuses == [304] * len(LegalDocsEnum)
+
+
+def test_same_content_without_validators_is_unchanged_and_refreshes_them(base_url):
+    collect(base_url)
+    saver = SavingUtilities(base_url=base_url)
+    filename = f"{LegalDocsEnum.CODUL_PENAL.name}.html"
+    stored = saver.minio_client.head_object(saver.bucket_name, filename)
+    # As stored before the validators were recorded: the next request is not conditional
+    assert saver.minio_client.update_metadata(saver.bucket_name, filename, {CONTENT_HASH_KEY: stored[CONTENT_HASH_KEY]})
+
+    manifest = collect(base_url)
+    assert manifest["changed"] == []
+    assert sorted(RecordingStubHandler.statuses) == [200] + [304] * (len(LegalDocsEnum) - 1)
+    # The SHA-256 matched, so only the metadata was rewritten
+    assert saver.minio_client.head_object(saver.bucket_name, filename) == stored
+
+    collect(base_url)
+    assert RecordingStubHandler.statuses == [304] * len(LegalDocsEnum)
+
+
+def test_changed_documents_stay_pending(docs_dir, base_url):
+    first = collect(base_url)
+    assert set(first["pending"]) == {document.name for document in LegalDocsEnum}
+
+    write_document(docs_dir, LegalDocsEnum.CODUL_MUNCII, "<html><body>CODUL_MUNCII modificat</body></html>")
+    second = collect(base_url)
+    assert second["changed"] == [LegalDocsEnum.CODUL_MUNCII.name]
+    # Documents changed in the first run are still pending processing
+    assert set(second["pending"]) == set(first["pending"])
+    assert second["pending"][LegalDocsEnum.CODUL_MUNCII.name] == second["collected_at"]
+    assert second["pending"][LegalDocsEnum.CODUL_PENAL.name] == first["collected_at"]
+
+
+def test_failed_downloads_keep_pending_documents(docs_dir, base_url):
+    first = collect(base_url)
+    # The stub answers 404 without its page
+    document_path(docs_dir, LegalDocsEnum.CODUL_CIVIL).unlink()
+    second = collect(base_url)
+    assert second["failed"] == [LegalDocsEnum.CODUL_CIVIL.name]
+    assert second["pending"] == first["pending"]
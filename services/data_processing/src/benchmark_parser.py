@@ -0,0 +1,42 @@
+import time
+import tracemalloc
+from core.minio_client import MinIOClient
+from core.legal_docs import LegalDocsEnum
+from src.main import parse_articles_bs4
+from src.parser import iter_articles
+
+
+def measure(parser, content, document):
+    """Run a parser to completion and return its articles, the elapsed seconds and the peak traced memory"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    articles = list(parser(content, document))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return articles, elapsed, peak
+
+
+def main():
+    """
+    Compares the BeautifulSoup parser with the single-pass streaming parser on every legal document in MinIO,
+    and checks that both produce the same articles.
+    """
+    minio_client = MinIOClient()
+    bucket_name = "legal-docs-minio-bucket"
+
+    print(f"{'document':<28} {'articles':>8} {'bs4 (s)':>8} {'stream (s)':>10} {'bs4 peak (MiB)':>15} {'stream peak (MiB)':>18} {'same':>5}")
+    for document in LegalDocsEnum:
+        content = minio_client.get_object(bucket_name, f"{document.name}.html")
+        if not content:
+            print(f"Failed to retrieve {document.name}.html from MinIO.")
+            continue
+
+        bs4_articles, bs4_time, bs4_peak = measure(parse_articles_bs4, content, document)
+        stream_articles, stream_time, stream_peak = measure(iter_articles, content, document)
+        print(f"{document.name:<28} {len(stream_articles):>8} {bs4_time:>8.2f} {stream_time:>10.2f} "
+              f"{bs4_peak / 2**20:>15.1f} {stream_peak / 2**20:>18.1f} {str(bs4_articles == stream_articles):>5}")
+
+
+if __name__ == '__main__':
+    main()
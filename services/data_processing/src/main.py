@@ -1,25 +1,33 @@
+import os
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator
 from bs4 import BeautifulSoup
 from core.minio_client import MinIOClient
-from core.legal_docs import LegalDocsEnum
-from core.postgres_db import Session, Article
+from core.legal_docs import LegalDocsEnum, CHANGED_SOURCES_MANIFEST, pending_sources, read_pending_sources
+from core.postgres_db import bulk_upsert_articles, bump_data_version, create_schema
+from core.article_cache import ARTICLES_DATA_VERSION
+from core.lexical_index import update_lexical_index
+from src.parser import iter_articles, HEADING_CLASSES
 
 
-def save_legal_doc_to_postgres(document: LegalDocsEnum, minio_client: MinIOClient, bucket_name: str):
+# "streaming" parses every document in a single lxml pass, "bs4" uses the original BeautifulSoup parser
+PARSER = os.getenv("PARSER", "streaming")
+# Documents are parsed in parallel worker processes
+PROCESSING_WORKERS = int(os.getenv("PROCESSING_WORKERS", str(os.cpu_count() or 1)))
+# Only process the documents listed as changed in the manifest of the last data collection run
+PROCESS_ONLY_CHANGED = os.getenv("PROCESS_ONLY_CHANGED", "false") == "true"
+
+
+def parse_articles_bs4(content: bytes, document: LegalDocsEnum) -> Iterator[Dict]:
     """
-    Fetches the legal document from MinIO, parses it, and saves the articles to PostgreSQL.
+    Parses a legal document with BeautifulSoup and yields its articles, with the part, title, chapter and
+    section found by walking the parents of every article and their previous siblings.
 
+    :param content: HTML content of the document.
     :param document: Document enum representing the legal document.
-    :param minio_client: An instance of the MinIOClient class.
-    :param bucket_name: Name of the MinIO bucket where the document is stored.
     """
-    # Fetch the HTML content from MinIO
-    object_name = f"{document.name}.html"
-    content = minio_client.get_object(bucket_name, object_name)
-
-    if not content:
-        print(f"Failed to retrieve {object_name} from MinIO.")
-        return
-
     # Parse the HTML content
     soup = BeautifulSoup(content, 'lxml')
 
@@ -27,80 +35,163 @@ def save_legal_doc_to_postgres(document: LegalDocsEnum, minio_client: MinIOClien
     articles = soup.find_all('span', attrs={'class': 'S_ART'})
 
     # Iterate over each article and get ('Part', 'Title', 'Chapter', 'Section')
-    look_for = ['S_PRT_TTL', 'S_PRT_DEN', 'S_TTL_TTL', 'S_TTL_DEN', 'S_CAP_TTL', 'S_CAP_DEN', 'S_SEC_TTL', 'S_SEC_DEN']
-    session = Session()
-    try:
-        for article in articles:
-            source = document.name
-            article_id = article.attrs['id']
-            article_title = article.contents[1].text
-            article_body = article.contents[3].text
-            part = None
-            title = None
-            chapter = None
-            section = None
-            link = document.value + '#' + article_id
-
-            # Traverse parents to find chapter and section
-            for parent in article.parents:
-                # Check parent and siblings of the parent
-                for sibling in parent.self_and_previous_siblings:
-                    if sibling.name == 'span' and 'class' in sibling.attrs and sibling.attrs['class'][0] in look_for:
-                        if 'S_PRT_TTL' in sibling.attrs['class']:
-                            part = sibling.text.strip()
-                        if 'S_TTL_TTL' in sibling.attrs['class']:
-                            title = sibling.text.strip()
-                        if 'S_CAP_TTL' in sibling.attrs['class']:
-                            chapter = sibling.text.strip()
-                        elif 'S_SEC_TTL' in sibling.attrs['class']:
-                            section = sibling.text.strip()
-                    if part and title and chapter and section:
-                        break
-
-            # Check if the article already exists for the given source
-            existing_article = session.query(Article).filter_by(source=source, article_id=article_id).first()
-
-            if existing_article:
-                print(f"Article with ID {article_id} from source {source} already exists. Updating the article...")
-                # Update the existing article
-                existing_article.article_title = article_title
-                existing_article.article_body = article_body
-                existing_article.part = part
-                existing_article.title = title
-                existing_article.chapter = chapter
-                existing_article.section = section
-                existing_article.link = link
-            else:
-                # Create a new Article object
-                new_article = Article(
-                    source=source,
-                    article_id=article_id,
-                    article_title=article_title,
-                    article_body=article_body,
-                    part=part,
-                    title=title,
-                    chapter=chapter,
-                    section=section,
-                    link=link
-                )
-                # Add the new article to the session
-                session.add(new_article)
-
-        # Commit the session to save the articles to the database
-        session.commit()
-        print(f"{document.name} - Scraping and saving to database terminated successfully.")
-    finally:
-        session.close()
+    for article in articles:
+        article_id = article.attrs['id']
+        part = None
+        title = None
+        chapter = None
+        section = None
+
+        # Traverse parents to find chapter and section
+        for parent in article.parents:
+            # Check parent and siblings of the parent
+            for sibling in parent.self_and_previous_siblings:
+                if sibling.name == 'span' and 'class' in sibling.attrs and sibling.attrs['class'][0] in HEADING_CLASSES:
+                    if 'S_PRT_TTL' in sibling.attrs['class']:
+                        part = sibling.text.strip()
+                    if 'S_TTL_TTL' in sibling.attrs['class']:
+                        title = sibling.text.strip()
+                    if 'S_CAP_TTL' in sibling.attrs['class']:
+                        chapter = sibling.text.strip()
+                    elif 'S_SEC_TTL' in sibling.attrs['class']:
+                        section = sibling.text.strip()
+                if part and title and chapter and section:
+                    break
+
+        yield {
+            "source": document.name,
+            "article_id": article_id,
+            "article_title": article.contents[1].text,
+            "article_body": article.contents[3].text,
+            "part": part,
+            "title": title,
+            "chapter": chapter,
+            "section": section,
+            "link": document.value + '#' + article_id,
+        }
+
+
+_worker_minio_client = None
+
+
+def _get_worker_minio_client() -> MinIOClient:
+    """MinIO client of the current process, created on first use since clients cannot be shared across processes"""
+    global _worker_minio_client
+    if _worker_minio_client is None:
+        _worker_minio_client = MinIOClient()
+    return _worker_minio_client
+
+
+def parse_legal_doc(document: LegalDocsEnum, bucket_name: str, parser_name: str = PARSER) -> Dict:
+    """
+    Fetches a legal document from MinIO and parses it. Runs in a worker process.
+
+    :param document: Document enum representing the legal document.
+    :param bucket_name: Name of the MinIO bucket where the document is stored.
+    :param parser_name: "streaming" or "bs4".
+    :return: Dict with the document, its parsed articles (None if it could not be fetched) and the fetch and parse times.
+    """
+    start = time.perf_counter()
+    content = _get_worker_minio_client().get_object(bucket_name, f"{document.name}.html")
+    fetch_time = time.perf_counter() - start
+    if not content:
+        return {"document": document, "articles": None, "fetch_time": fetch_time, "parse_time": 0.0}
+
+    parser = parse_articles_bs4 if parser_name == "bs4" else iter_articles
+    start = time.perf_counter()
+    articles = list(parser(content, document))
+    return {"document": document, "articles": articles, "fetch_time": fetch_time, "parse_time": time.perf_counter() - start}
+
+
+def process_legal_docs(documents: Iterable[LegalDocsEnum], bucket_name: str, workers=PROCESSING_WORKERS, parser_name: str = PARSER) -> Dict:
+    """
+    Parses every document in its own worker process and writes the articles with the bulk writer
+    as soon as each document is done.
+
+    :param documents: Documents to process.
+    :param bucket_name: Name of the MinIO bucket where the documents are stored.
+    :param workers: Number of worker processes. With 1 the documents are parsed in the current process.
+    :param parser_name: "streaming" or "bs4".
+    :return: Dict with the "touched_ids" of the articles that were added or updated, and the names of the
+        "processed" documents (those that could be fetched).
+    """
+    documents = list(documents)
+    touched_ids = []
+    processed = []
+    start = time.perf_counter()
+
+    def write(parsed: Dict):
+        document = parsed["document"]
+        if parsed["articles"] is None:
+            print(f"Failed to retrieve {document.name}.html from MinIO.")
+            return
+        write_start = time.perf_counter()
+        result = bulk_upsert_articles(parsed["articles"])
+        touched_ids.extend(result["touched_ids"])
+        processed.append(document.name)
+        print(f"{document.name} - {len(parsed['articles'])} articles: fetch {parsed['fetch_time']:.2f}s, "
+              f"parse {parsed['parse_time']:.2f}s, write {time.perf_counter() - write_start:.2f}s "
+              f"({result['inserted']} inserted, {result['updated']} updated, {result['unchanged']} unchanged)")
+
+    if workers <= 1:
+        for document in documents:
+            write(parse_legal_doc(document, bucket_name, parser_name))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(documents))) as executor:
+            futures = [executor.submit(parse_legal_doc, document, bucket_name, parser_name) for document in documents]
+            for future in as_completed(futures):
+                write(future.result())
+
+    print(f"Processed {len(documents)} documents in {time.perf_counter() - start:.2f}s with {workers} worker(s).")
+    return {"touched_ids": touched_ids, "processed": processed}
+
+
+def clear_pending_sources(minio_client: MinIOClient, bucket_name: str, processed: Dict[str, str]):
+    """
+    Removes processed documents from the pending documents of the changed sources manifest. A document that
+    changed again since it was read as pending (a collection ran in the meantime) is kept.
+
+    :param minio_client: An instance of the MinIOClient class.
+    :param bucket_name: Name of the MinIO bucket holding the manifest.
+    :param processed: Time each processed document last changed when it was read as pending, by document name.
+    """
+    content = minio_client.get_object(bucket_name, CHANGED_SOURCES_MANIFEST)
+    if not content or not processed:
+        return
+    manifest = json.loads(content)
+    manifest["pending"] = {
+        name: changed_at for name, changed_at in pending_sources(manifest).items() if processed.get(name) != changed_at
+    }
+    data = json.dumps(manifest, indent=2).encode("utf-8")
+    minio_client.put_object(bucket_name, CHANGED_SOURCES_MANIFEST, data, len(data), content_type="application/json")
 
 
 def main():
-    # Initialize MinIO client
-    minio_client = MinIOClient()
     bucket_name = "legal-docs-minio-bucket"
+    create_schema()
+
+    minio_client = MinIOClient()
+    pending = read_pending_sources(minio_client, bucket_name)
+
+    documents = list(LegalDocsEnum)
+    if PROCESS_ONLY_CHANGED and pending is not None:
+        documents = [document for document in LegalDocsEnum if document.name in pending]
+        print(f"Processing the {len(documents)} changed document(s): {', '.join(document.name for document in documents)}")
+        if not documents:
+            return
 
     # Process each legal document
-    for doc in LegalDocsEnum:
-        save_legal_doc_to_postgres(doc, minio_client, bucket_name)
+    result = process_legal_docs(documents, bucket_name)
+
+    # Re-index the new and changed articles for lexical search
+    update_lexical_index(result["touched_ids"])
+
+    # Let running services (e.g. the article cache of the search API) know the articles changed
+    bump_data_version(ARTICLES_DATA_VERSION)
+
+    # The processed documents are no longer pending for the next run
+    if pending is not None:
+        clear_pending_sources(minio_client, bucket_name, {name: pending[name] for name in result["processed"] if name in pending})
 
 
 if __name__ == '__main__':
@@ -0,0 +1,144 @@
+import io
+from typing import Dict, Iterator, List, Optional, Tuple
+from lxml import etree
+from core.legal_docs import LegalDocsEnum
+
+
+# Heading spans that give an article its ('Part', 'Title', 'Chapter', 'Section')
+HEADING_CLASSES = ['S_PRT_TTL', 'S_PRT_DEN', 'S_TTL_TTL', 'S_TTL_DEN', 'S_CAP_TTL', 'S_CAP_DEN', 'S_SEC_TTL', 'S_SEC_DEN']
+
+
+def _classes(element) -> List[str]:
+    return (element.get('class') or '').split()
+
+
+def _is_heading(element) -> bool:
+    if element.tag != 'span':
+        return False
+    classes = _classes(element)
+    return bool(classes) and classes[0] in HEADING_CLASSES
+
+
+def _is_article(element) -> bool:
+    return element.tag == 'span' and 'S_ART' in _classes(element)
+
+
+def _text(element) -> str:
+    """Text of an element including its descendants, without comments (like BeautifulSoup's `.text`)"""
+    return "".join(element.itertext())
+
+
+def _contents(element) -> list:
+    """Child nodes of an element in BeautifulSoup's `.contents` order: strings, elements and comments"""
+    contents = []
+    if element.text:
+        contents.append(element.text)
+    for child in element:
+        contents.append(child)
+        if child.tail:
+            contents.append(child.tail)
+    return contents
+
+
+def _node_text(node) -> str:
+    if isinstance(node, str):
+        return node
+    if not isinstance(node.tag, str):
+        # Comments and processing instructions have no text in BeautifulSoup's `.text`
+        return ''
+    return _text(node)
+
+
+def _resolve_headings(stack: List[Tuple[object, List]]) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]:
+    """
+    Find the part, title, chapter and section of the article on top of the stack, visiting every ancestor and
+    then its previous heading siblings, nearest first, exactly like the BeautifulSoup parent/sibling walk.
+    """
+    part = title = chapter = section = None
+    # stack[-1] is the article itself, stack[-2] its parent
+    for depth in range(len(stack) - 2, -1, -1):
+        ancestor = stack[depth][0]
+        candidates = [(_classes(ancestor), _text(ancestor).strip())] if _is_heading(ancestor) else [None]
+        if depth > 0:
+            # Headings already closed inside the grandparent are exactly the previous siblings of this ancestor
+            candidates.extend(reversed(stack[depth - 1][1]))
+        for candidate in candidates:
+            if candidate is not None:
+                classes, text = candidate
+                if 'S_PRT_TTL' in classes:
+                    part = text
+                if 'S_TTL_TTL' in classes:
+                    title = text
+                if 'S_CAP_TTL' in classes:
+                    chapter = text
+                elif 'S_SEC_TTL' in classes:
+                    section = text
+            if part and title and chapter and section:
+                break
+    return part, title, chapter, section
+
+
+def _encoding(content: bytes) -> Optional[str]:
+    try:
+        content.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        # Let libxml2 use the encoding declared by the document
+        return None
+
+
+def iter_articles(content, document: LegalDocsEnum) -> Iterator[Dict]:
+    """
+    Parses a legal document in a single pass and yields its articles as soon as they are read.
+
+    The current heading state is kept on a stack of open elements: every closed heading span is recorded on
+    its parent, so the headings of an article are read from the stack instead of walking the tree. Elements
+    are freed once they are no longer needed, so memory stays bounded by the depth of the document.
+
+    :param content: HTML content of the document, as bytes or a binary file-like object.
+    :param document: Document enum representing the legal document.
+    """
+    if isinstance(content, (bytes, bytearray)):
+        encoding = _encoding(content)
+        source = io.BytesIO(content)
+    else:
+        encoding = None
+        source = content
+
+    # (element, headings closed among its children as (classes, text)) for every open element
+    stack: List[Tuple[object, List]] = []
+    # Number of open articles and heading spans, whose children are still needed to read their text
+    open_protected = 0
+    for event, element in etree.iterparse(source, events=('start', 'end'), html=True, encoding=encoding, remove_comments=False):
+        if event == 'start':
+            stack.append((element, []))
+            if _is_article(element) or _is_heading(element):
+                open_protected += 1
+            continue
+
+        if _is_article(element):
+            article_id = element.attrib['id']
+            part, title, chapter, section = _resolve_headings(stack)
+            contents = _contents(element)
+            yield {
+                "source": document.name,
+                "article_id": article_id,
+                "article_title": _node_text(contents[1]),
+                "article_body": _node_text(contents[3]),
+                "part": part,
+                "title": title,
+                "chapter": chapter,
+                "section": section,
+                "link": document.value + '#' + article_id,
+            }
+            open_protected -= 1
+        elif _is_heading(element):
+            if len(stack) > 1:
+                stack[-2][1].append((_classes(element), _text(element).strip()))
+            open_protected -= 1
+
+        stack.pop()
+        if open_protected == 0 and stack:
+            element.clear(keep_tail=True)
+            while element.getprevious() is not None:
+                del element.getparent()[0]
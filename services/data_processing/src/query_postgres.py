@@ -1,4 +1,4 @@
-from core.postgres_db import Session, Article
+from core.postgres_db import Session, Article, stream_articles
 
 
 def get_article_by_id(source, article_id):
@@ -21,22 +21,15 @@ def get_article_by_id(source, article_id):
 
 def get_all_articles(source=None):
     """
-    Retrieve all articles from the database, optionally filtered by source.
+    Stream all articles from the database, optionally filtered by source.
     
     Args:
         source (str, optional): The source to filter by. If None, returns all articles.
     
     Returns:
-        List[Article]: A list of Article objects.
+        Iterator[Row]: The article rows, read lazily with a server-side cursor.
     """
-    session = Session()
-    try:
-        if source:
-            return session.query(Article).filter_by(source=source).all()
-        else:
-            return session.query(Article).all()
-    finally:
-        session.close()
+    return stream_articles(source=source)
 
 
 def print_article_details(article):
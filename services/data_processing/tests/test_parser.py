@@ -0,0 +1,47 @@
+import io
+import pytest
+from core.legal_docs import LegalDocsEnum
+from benchmarks.synthetic import generate_document
+from src.main import parse_articles_bs4
+from src.parser import iter_articles
+
+
+# Article title and body are the 2nd and 4th child nodes of S_ART, as on legislatie.just.ro
+HAND_WRITTEN = """<html><head><meta charset="utf-8"></head><body>
+<span class="S_PRT"><span class="S_PRT_TTL">Partea I</span><span class="S_PRT_DEN">Dispoziții generale</span>
+<span class="S_PRT_BDY">
+  <span class="S_CAP"><span class="S_CAP_TTL">Capitolul I</span><span class="S_CAP_BDY">
+    <span class="S_ART" id="id_art1"> <span class="S_ART_TTL">Articolul 1</span> <span class="S_ART_BDY">Legea <b>penală</b> se aplică.</span></span>
+    <span class="S_SEC"><span class="S_SEC_TTL">Secțiunea 1</span><span class="S_SEC_BDY">
+      <span class="S_ART" id="id_art2"> <span class="S_ART_TTL">Articolul 2</span> <span class="S_ART_BDY">Țara și școala.</span></span>
+    </span></span>
+  </span></span>
+  <span class="S_TTL"><span class="S_TTL_TTL">Titlul II</span><span class="S_TTL_BDY">
+    <span class="S_ART" id="id_art3"> <span class="S_ART_TTL">Articolul 3</span> <span class="S_ART_BDY">Alt text.</span></span>
+  </span></span>
+</span></span>
+</body></html>""".encode("utf-8")
+
+
+@pytest.mark.parametrize("document", [LegalDocsEnum.CODUL_PENAL, LegalDocsEnum.CODUL_MUNCII])
+def test_streaming_parser_matches_bs4(document):
+    content = generate_document(document, n_articles=120, words_per_article=40)
+    expected = list(parse_articles_bs4(content, document))
+    assert len(expected) == 120
+    assert list(iter_articles(content, document)) == expected
+
+
+def test_streaming_parser_matches_bs4_on_hand_written_markup():
+    document = LegalDocsEnum.CODUL_PENAL
+    expected = list(parse_articles_bs4(HAND_WRITTEN, document))
+    articles = list(iter_articles(HAND_WRITTEN, document))
+    assert articles == expected
+    assert [article["article_id"] for article in articles] == ["id_art1", "id_art2", "id_art3"]
+    assert articles[1]["section"] == "Secțiunea 1"
+    assert articles[1]["article_body"] == "Țara și școala."
+
+
+def test_streaming_parser_reads_file_objects():
+    document = LegalDocsEnum.CODUL_CIVIL
+    content = generate_document(document, n_articles=30, words_per_article=20)
+    assert list(iter_articles(io.BytesIO(content), document)) == list(iter_articles(content, document))
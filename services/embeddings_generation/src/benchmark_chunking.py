@@ -0,0 +1,55 @@
+import time
+from typing import Optional, Tuple
+from core.encoder import load_encoder
+from core.postgres_db import stream_articles, Article
+from src.chunking import get_token_chunks
+from src.pipeline import chunk_articles, CHUNKING_BATCH_ARTICLES
+
+
+def in_source(body: str, chunk: str, span: Optional[Tuple[int, int]]) -> bool:
+    """Whether a chunk is exactly the slice of the body at its span, or a substring of it when it has no span"""
+    if span is None:
+        # The offset chunker falls back to decoding when the tokenizer has no offsets
+        return chunk in body
+    return body[span[0]:span[1]] == chunk
+
+
+def main():
+    """
+    Compares the decode-based chunker with the offset-based batch chunker on every article in PostgreSQL:
+    total time, number of chunks, and how many chunks are not exactly their source text: a substring of the
+    article body for decoded chunks (decoded text drifts, e.g. in spacing around punctuation), the slice of the
+    body at their span for offset chunks.
+    """
+    model = load_encoder()
+    articles = list(stream_articles((Article.id, Article.article_body)))
+    print(f"{len(articles)} articles, batches of {CHUNKING_BATCH_ARTICLES} articles for the offset chunker")
+
+    start = time.perf_counter()
+    decoded = [get_token_chunks(model, article.article_body) for article in articles]
+    decode_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sliced = []
+    for i in range(0, len(articles), CHUNKING_BATCH_ARTICLES):
+        sliced.extend(chunk_articles(model, articles[i:i + CHUNKING_BATCH_ARTICLES], "offsets"))
+    offsets_time = time.perf_counter() - start
+
+    decoded_chunks = sum(len(chunks) for chunks in decoded)
+    sliced_chunks = sum(len(chunks) for chunks, _, _ in sliced)
+    drifted = sum(
+        not in_source(article.article_body, chunk, None) for article, chunks in zip(articles, decoded) for chunk, _ in chunks
+    )
+    sliced_drifted = sum(
+        not in_source(article.article_body, chunk, span)
+        for article, (chunks, _, spans) in zip(articles, sliced)
+        for chunk, span in zip(chunks, spans or [None] * len(chunks))
+    )
+    print(f"{'chunker':<8} {'time (s)':>9} {'chunks':>8} {'not in source':>14}")
+    print(f"{'decode':<8} {decode_time:>9.2f} {decoded_chunks:>8} {drifted:>14}")
+    print(f"{'offsets':<8} {offsets_time:>9.2f} {sliced_chunks:>8} {sliced_drifted:>14}")
+    print(f"Speedup: {decode_time / offsets_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
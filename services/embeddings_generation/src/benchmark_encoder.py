@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+import statistics
+import numpy as np
+from core.encoder import load_encoder, ENCODER_BACKENDS
+from core.postgres_db import Session, Article
+from src.chunking import get_chunks
+
+
+BENCHMARK_ARTICLES = int(os.getenv("BENCHMARK_ARTICLES", "200"))
+QUESTIONS = [
+    "ce se poate intampla daca fac evaziune fiscala",
+    "care este durata perioadei de proba la angajare",
+    "cand se prescrie dreptul la actiune in justitie",
+    "ce pedeapsa primesc pentru furt calificat",
+]
+TOP_K = 10
+REPEATS = 20
+
+
+def sample_articles(limit=BENCHMARK_ARTICLES):
+    session = Session()
+    try:
+        return session.query(Article).order_by(Article.id).limit(limit).all()
+    finally:
+        session.close()
+
+
+def encode(model, texts, batch_size=64) -> np.ndarray:
+    return model.encode(texts, batch_size=batch_size, normalize_embeddings=True, convert_to_numpy=True)
+
+
+def query_latency_ms(model):
+    """p50 and p95 latency of encoding one question at a time, like the search API does"""
+    for question in QUESTIONS:
+        model.encode(question)  # warm up
+    timings = []
+    for _ in range(REPEATS):
+        for question in QUESTIONS:
+            start = time.perf_counter()
+            model.encode(question)
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def main():
+    """
+    Compares the encoder backends with the reference torch model on a sample of articles:
+    cosine agreement of the chunk embeddings, overlap of the top-10 chunks retrieved for the article titles,
+    single-query latency and batch throughput.
+
+    Usage: python -m src.benchmark_encoder [backend ...]
+    """
+    backends = sys.argv[1:] or ENCODER_BACKENDS
+    articles = sample_articles()
+
+    reference = load_encoder("torch")
+    chunks = [chunk for article in articles for chunk in get_chunks(reference, article.article_body)]
+    queries = [article.article_title for article in articles]
+    print(f"{len(articles)} articles, {len(chunks)} chunks")
+
+    reference_chunks = encode(reference, chunks)
+    reference_top = np.argsort(-(encode(reference, queries) @ reference_chunks.T), axis=1)[:, :TOP_K]
+    del reference
+
+    print(f"{'backend':<12} {'mean cos':>9} {'min cos':>8} {'top-10 overlap':>15} {'p50 (ms)':>9} {'p95 (ms)':>9} {'chunks/s':>9}")
+    for backend in backends:
+        try:
+            model = load_encoder(backend)
+        except Exception as e:
+            print(f"{backend:<12} could not be loaded: {e}")
+            continue
+
+        start = time.perf_counter()
+        embeddings = encode(model, chunks)
+        throughput = len(chunks) / (time.perf_counter() - start)
+
+        cosines = np.sum(embeddings * reference_chunks, axis=1)
+        top = np.argsort(-(encode(model, queries) @ embeddings.T), axis=1)[:, :TOP_K]
+        overlap = np.mean([len(set(a) & set(b)) / TOP_K for a, b in zip(top, reference_top)])
+        p50, p95 = query_latency_ms(model)
+        print(f"{backend:<12} {cosines.mean():>9.4f} {cosines.min():>8.4f} {overlap:>15.3f} {p50:>9.1f} {p95:>9.1f} {throughput:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
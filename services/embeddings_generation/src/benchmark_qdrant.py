@@ -0,0 +1,107 @@
+import time
+import statistics
+import numpy as np
+from qdrant_client.http import models
+from core.qdrant_db import get_qdrant_client, collection_params, search_params, source_filter, create_payload_indexes, COLLECTION_NAME
+
+
+BENCHMARK_COLLECTION = f"{COLLECTION_NAME}_benchmark"
+QUERY_SAMPLE = 200
+TOP_K = 10
+SEARCH_EFS = [32, 64, 128, 256]
+# Collection settings compared in the report
+CONFIGS = [
+    {"m": 16, "ef_construct": 100, "quantization": "none", "on_disk": False},
+    {"m": 16, "ef_construct": 100, "quantization": "int8", "on_disk": False},
+    {"m": 16, "ef_construct": 100, "quantization": "int8", "on_disk": True},
+    {"m": 32, "ef_construct": 200, "quantization": "none", "on_disk": False},
+    {"m": 32, "ef_construct": 200, "quantization": "int8", "on_disk": False},
+]
+
+
+def load_points(batch_size=1024):
+    """All point IDs, normalized vectors and sources of the main collection"""
+    client = get_qdrant_client()
+    ids, vectors, sources = [], [], []
+    offset = None
+    while True:
+        points, offset = client.scroll(COLLECTION_NAME, limit=batch_size, offset=offset, with_payload=["source"], with_vectors=True)
+        for point in points:
+            ids.append(point.id)
+            vectors.append(point.vector)
+            sources.append(point.payload["source"])
+        if offset is None:
+            break
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return ids, vectors, np.asarray(sources)
+
+
+def build_collection(config, ids, vectors, sources, batch_size=512):
+    client = get_qdrant_client()
+    if client.collection_exists(BENCHMARK_COLLECTION):
+        client.delete_collection(BENCHMARK_COLLECTION)
+    client.create_collection(collection_name=BENCHMARK_COLLECTION, **collection_params(**config))
+    create_payload_indexes(BENCHMARK_COLLECTION)
+    for start in range(0, len(ids), batch_size):
+        client.upsert(BENCHMARK_COLLECTION, points=[
+            models.PointStruct(id=ids[i], vector=vectors[i].tolist(), payload={"source": str(sources[i])})
+            for i in range(start, min(start + batch_size, len(ids)))
+        ])
+    # Wait until the optimizer has built the HNSW index
+    while client.get_collection(BENCHMARK_COLLECTION).status != models.CollectionStatus.GREEN:
+        time.sleep(1)
+
+
+def measure(config, ef, queries, truths, query_sources):
+    """Mean recall@TOP_K against exact search, and p50/p95 latency in ms"""
+    client = get_qdrant_client()
+    params = search_params(ef=ef, quantization=config["quantization"])
+    recalls, timings = [], []
+    for query, truth, source in zip(queries, truths, query_sources):
+        start = time.perf_counter()
+        hits = client.query_points(BENCHMARK_COLLECTION, query=query.tolist(), limit=TOP_K, search_params=params,
+                                   query_filter=source_filter(source)).points
+        timings.append((time.perf_counter() - start) * 1000)
+        recalls.append(len({hit.id for hit in hits} & truth) / len(truth))
+    timings.sort()
+    return statistics.mean(recalls), statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def main():
+    """
+    Recall vs latency of the collection settings (HNSW m / ef_construct, int8 scalar quantization, on-disk vectors)
+    and of the search-time ef, without and with a source filter. The vectors of the main collection are copied to a
+    temporary collection for every setting, and a sample of them is used as queries, with exact search as reference.
+    """
+    ids, vectors, sources = load_points()
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(ids), size=min(QUERY_SAMPLE, len(ids)), replace=False)
+    queries = vectors[sample]
+    scores = queries @ vectors.T
+
+    def exact(mask=None):
+        masked = scores if mask is None else np.where(mask, scores, -np.inf)
+        return [{ids[i] for i in np.argsort(-row)[:TOP_K]} for row in masked]
+
+    truths = exact()
+    query_sources = sources[sample]
+    filtered_truths = exact(sources[None, :] == query_sources[:, None])
+    print(f"{len(ids)} points, {len(queries)} queries, recall@{TOP_K}")
+
+    print(f"{'m':>3} {'ef_c':>5} {'quant':>5} {'disk':>5} {'ef':>4} {'recall':>7} {'p50 ms':>7} {'p95 ms':>7} "
+          f"{'filtered recall':>16} {'p50 ms':>7} {'p95 ms':>7}")
+    try:
+        for config in CONFIGS:
+            build_collection(config, ids, vectors, sources)
+            for ef in SEARCH_EFS:
+                recall, p50, p95 = measure(config, ef, queries, truths, [None] * len(queries))
+                f_recall, f_p50, f_p95 = measure(config, ef, queries, filtered_truths, query_sources)
+                print(f"{config['m']:>3} {config['ef_construct']:>5} {config['quantization']:>5} {str(config['on_disk']):>5} "
+                      f"{ef:>4} {recall:>7.3f} {p50:>7.2f} {p95:>7.2f} {f_recall:>16.3f} {f_p50:>7.2f} {f_p95:>7.2f}")
+    finally:
+        get_qdrant_client().delete_collection(BENCHMARK_COLLECTION)
+
+
+if __name__ == '__main__':
+    main()
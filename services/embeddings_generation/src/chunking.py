@@ -0,0 +1,63 @@
+from typing import List, Sequence, Tuple
+
+
+CHUNK_OVERLAP_RATIO = 0.25
+
+
+def _windows(n_tokens: int, effective_window: int, overlap: int) -> List[Tuple[int, int]]:
+    """[start, end) token windows of a text, each overlapping the previous one by `overlap` tokens"""
+    step = effective_window - overlap
+    windows = []
+    for start in range(0, n_tokens, step):
+        end = min(start + effective_window, n_tokens)
+        # if the chunk is too small and it is contained in the previous chunk, break
+        if start != 0 and end - start < overlap:
+            break
+        windows.append((start, end))
+    return windows
+
+
+def get_token_chunks(model, text: str, overlap_ratio=CHUNK_OVERLAP_RATIO) -> List[Tuple[str, int]]:
+    """Return text chunks for embedding together with their length in tokens"""
+    tokenizer = model.tokenizer
+    tokens = tokenizer.encode(text, add_special_tokens=False)
+    context_size = model.max_seq_length
+    effective_window = context_size - tokenizer.num_special_tokens_to_add()
+    overlap = int(effective_window * overlap_ratio)
+
+    return [
+        (tokenizer.decode(tokens[start:end], clean_up_tokenization_spaces=True), end - start)
+        for start, end in _windows(len(tokens), effective_window, overlap)
+    ]
+
+
+def get_offset_chunks(model, texts: Sequence[str], overlap_ratio=CHUNK_OVERLAP_RATIO) -> List[List[Tuple[str, int, int, int]]]:
+    """
+    Chunk many texts at once with the same token windows as `get_token_chunks`, but without decoding tokens:
+    the texts are tokenized in one batch call of the fast tokenizer, and every chunk is sliced from the original
+    text with the character offsets of its first and last token.
+
+    :param model: SentenceTransformer model with a fast tokenizer.
+    :param texts: Texts to chunk.
+    :param overlap_ratio: Fraction of the window shared by consecutive chunks.
+    :return: For every text, its chunks as (text, token count, char start, char end).
+    """
+    tokenizer = model.tokenizer
+    effective_window = model.max_seq_length - tokenizer.num_special_tokens_to_add()
+    overlap = int(effective_window * overlap_ratio)
+    encoded = tokenizer(list(texts), add_special_tokens=False, return_offsets_mapping=True,
+                        return_attention_mask=False, return_token_type_ids=False, verbose=False)
+
+    all_chunks = []
+    for text, offsets in zip(texts, encoded["offset_mapping"]):
+        chunks = []
+        for start, end in _windows(len(offsets), effective_window, overlap):
+            char_start, char_end = offsets[start][0], offsets[end - 1][1]
+            chunks.append((text[char_start:char_end], end - start, char_start, char_end))
+        all_chunks.append(chunks)
+    return all_chunks
+
+
+def get_chunks(model, text: str, overlap_ratio=CHUNK_OVERLAP_RATIO) -> List[str]:
+    """Return text chunks for embedding"""
+    return [chunk for chunk, _ in get_token_chunks(model, text, overlap_ratio)]
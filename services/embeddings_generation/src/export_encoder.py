@@ -0,0 +1,27 @@
+import os
+from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+from core.encoder import EMBEDDING_MODEL
+
+
+# Directory the ONNX model is written to, to be used as ENCODER_MODEL_PATH
+ENCODER_EXPORT_PATH = os.getenv("ENCODER_MODEL_PATH") or "encoder_onnx"
+# Target CPU of the int8 model: "arm64", "avx2", "avx512" or "avx512_vnni"
+ENCODER_QUANTIZATION_CONFIG = os.getenv("ENCODER_QUANTIZATION_CONFIG", "avx2")
+
+
+def main():
+    """
+    Exports the embedding model to ONNX, plus a dynamically int8-quantized copy, so the "onnx" and
+    "onnx-int8" encoder backends can load it from a local path.
+    """
+    print(f"Exporting {EMBEDDING_MODEL} to ONNX...")
+    model = SentenceTransformer(EMBEDDING_MODEL, backend="onnx")
+    model.save_pretrained(ENCODER_EXPORT_PATH)
+
+    print(f"Quantizing to int8 for {ENCODER_QUANTIZATION_CONFIG}...")
+    export_dynamic_quantized_onnx_model(model, ENCODER_QUANTIZATION_CONFIG, ENCODER_EXPORT_PATH)
+    print(f"Saved to {ENCODER_EXPORT_PATH}: onnx/model.onnx and onnx/model_qint8_{ENCODER_QUANTIZATION_CONFIG}.onnx")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,59 +1,22 @@
-from sentence_transformers import SentenceTransformer
-from typing import List
-from core.postgres_db import Session, Article
-from core.qdrant_db import setup_qdrant_collection, store_embeddings_qdrant
-
-
-def get_all_articles(source=None):
-    """
-    Retrieve all articles from the database, optionally filtered by source.
-    
-    Args:
-        source (str, optional): The source to filter by. If None, returns all articles.
-    
-    Returns:
-        List[Article]: A list of Article objects.
-    """
-    session = Session()
-    try:
-        if source:
-            return session.query(Article).filter_by(source=source).all()
-        else:
-            return session.query(Article).all()
-    finally:
-        session.close()
-
-
-def get_chunks(model, text: str, overlap_ratio=0.25) -> List[str]:
-    """Return text chunks for embedding"""
-    tokenizer = model.tokenizer
-    tokens = tokenizer.encode(text, add_special_tokens=False)
-    context_size = model.max_seq_length
-    effective_window = context_size - tokenizer.num_special_tokens_to_add()
-    overlap = int(effective_window * overlap_ratio)
-    step = effective_window - overlap
-    
-    chunks = []
-    for start in range(0, len(tokens), step):
-        end = start + effective_window
-        chunk_tokens = tokens[start:end]
-        # if the chunk is too small and it is contained in the previous chunk, break
-        if start != 0 and len(chunk_tokens) < overlap:
-            break
-        chunks.append(tokenizer.decode(chunk_tokens, clean_up_tokenization_spaces=True))
-    
-    return chunks
+import os
+import time
+from core.encoder import load_encoder, encoder_id, ENCODER_BACKEND
+from core.postgres_db import stream_articles, bump_data_version, create_schema
+from core.qdrant_db import get_qdrant_client, setup_qdrant_collection, store_embeddings_qdrant, EMBEDDINGS_DATA_VERSION
+from src.chunking import get_chunks
+from src.pipeline import run_batched_pipeline
 
 
-def main():
-    print("Fetching all articles...")
-    all_articles = get_all_articles()
+# "batched" embeds chunks from many articles together, "per_article" keeps the original one-article-at-a-time loop
+EMBEDDING_PIPELINE = os.getenv("EMBEDDING_PIPELINE", "batched")
+# "incremental" only re-embeds articles whose content hash changed since the last run (batched pipeline only)
+EMBEDDING_MODE = os.getenv("EMBEDDING_MODE", "full")
 
-    print("Loading embedding model...")
-    model = SentenceTransformer('BlackKakapo/stsb-xlm-r-multilingual-ro')
 
-    setup_qdrant_collection()
-    
+def run_per_article(model, all_articles):
+    """Original loop: chunk, encode and store one article at a time"""
+    total_chunks = 0
+    start = time.perf_counter()
     for article in all_articles:
         # Generate chunks and embeddings
         chunks = get_chunks(model, article.article_body)  # Modified from get_embeddings
@@ -61,6 +24,39 @@ def main():
         
         # Store in Qdrant
         store_embeddings_qdrant(article, embeddings, chunks)
+        total_chunks += len(chunks)
+
+    elapsed = time.perf_counter() - start
+    print(f"Embedded {total_chunks} chunks in {elapsed:.1f}s ({total_chunks / elapsed if elapsed else 0:.1f} chunks/sec)")
+
+
+def main():
+    if EMBEDDING_MODE == "incremental" and EMBEDDING_PIPELINE != "batched":
+        # The per-article loop has no content hashes, it would silently re-embed every article
+        raise ValueError("EMBEDDING_MODE=incremental needs EMBEDDING_PIPELINE=batched")
+
+    create_schema()
+
+    print(f"Loading embedding model ({ENCODER_BACKEND} backend)...")
+    model = load_encoder()
+
+    setup_qdrant_collection()
+
+    # Articles are read from PostgreSQL lazily, while embedding
+    all_articles = stream_articles()
+
+    if EMBEDDING_PIPELINE == "batched":
+        run_batched_pipeline(model, all_articles, encoder_id(), incremental=EMBEDDING_MODE == "incremental")
+    else:
+        run_per_article(model, all_articles)
+
+    client = get_qdrant_client()
+    if hasattr(client, "flush"):
+        # The local index keeps upserts in memory until flushed, save them before the search API reloads it
+        client.flush()
+
+    # Let the search API know that cached search results are stale
+    bump_data_version(EMBEDDINGS_DATA_VERSION)
 
 
 if __name__ == '__main__':
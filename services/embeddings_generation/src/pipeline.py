@@ -0,0 +1,223 @@
+import os
+import time
+import hashlib
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from core.postgres_db import Article
+from core.qdrant_db import store_embeddings_bulk_qdrant, get_stored_content_hashes, delete_article_chunks
+from src.chunking import get_token_chunks, get_offset_chunks, CHUNK_OVERLAP_RATIO
+
+
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "1"))
+EMBEDDING_BUFFER_CHUNKS = int(os.getenv("EMBEDDING_BUFFER_CHUNKS", "4096"))
+# "offsets" slices chunks from the article text with the tokenizer's character offsets, "decode" decodes token windows
+CHUNKER = os.getenv("CHUNKER", "offsets")
+# Number of articles tokenized in one call of the tokenizer
+CHUNKING_BATCH_ARTICLES = int(os.getenv("CHUNKING_BATCH_ARTICLES", "64"))
+
+# (article, chunks, token lengths, (char start, char end) of every chunk or None)
+BufferEntry = Tuple[Article, List[str], List[int], Optional[List[Tuple[int, int]]]]
+
+
+def article_content_hash(article: Article, model_name: str, model) -> str:
+    """
+    Hash everything that determines the stored points of an article: the text and metadata that end up
+    in the payload, plus the model and chunking parameters used to embed it.
+    """
+    digest = hashlib.sha256()
+    for part in (
+        model_name,
+        CHUNKER,
+        str(model.max_seq_length),
+        str(CHUNK_OVERLAP_RATIO),
+        article.source,
+        article.article_id,
+        article.article_title,
+        article.section,
+        article.chapter,
+        article.article_body,
+    ):
+        digest.update((part or "").encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def with_content_hashes(articles: Iterable[Article], model_name: str, model, seen_ids: Optional[Set[int]] = None) -> Iterator[Tuple[Article, str]]:
+    """Hash articles as they are read, optionally recording the ID of every article seen"""
+    for article in articles:
+        if seen_ids is not None:
+            seen_ids.add(article.id)
+        yield article, article_content_hash(article, model_name, model)
+
+
+def select_changed_articles(hashed_articles: Iterable[Tuple[Article, str]],
+                            stored: Dict[int, Tuple[Optional[str], int]]) -> Iterator[Tuple[Article, str]]:
+    """Yield only the articles whose content hash differs from the one stored in Qdrant"""
+    skipped = 0
+    for article, content_hash in hashed_articles:
+        stored_hash, _ = stored.get(article.id, (None, 0))
+        if stored_hash is not None and stored_hash == content_hash:
+            skipped += 1
+            continue
+        yield article, content_hash
+    print(f"Skipped {skipped} unchanged articles.")
+
+
+def chunk_articles(model, articles: List[Article], chunker=CHUNKER) -> List[Tuple[List[str], List[int], Optional[List[Tuple[int, int]]]]]:
+    """
+    Chunk the bodies of a group of articles.
+
+    :return: For every article, its chunks, their token lengths and their character spans (None with the "decode" chunker).
+    """
+    if chunker == "offsets" and model.tokenizer.is_fast:
+        return [
+            ([chunk for chunk, _, _, _ in chunks], [length for _, length, _, _ in chunks], [(start, end) for _, _, start, end in chunks])
+            for chunks in get_offset_chunks(model, [article.article_body for article in articles])
+        ]
+
+    chunked = []
+    for article in articles:
+        token_chunks = get_token_chunks(model, article.article_body)
+        chunked.append(([chunk for chunk, _ in token_chunks], [length for _, length in token_chunks], None))
+    return chunked
+
+
+def iter_chunk_buffers(model, articles: Iterable[Article], buffer_chunks=EMBEDDING_BUFFER_CHUNKS, chunker=CHUNKER,
+                       chunking_batch=CHUNKING_BATCH_ARTICLES) -> Iterator[List[BufferEntry]]:
+    """
+    Chunk articles lazily, `chunking_batch` at a time, and group them into buffers holding at least `buffer_chunks`
+    chunks. An article is never split across buffers, so every buffer can be stored on its own. Articles without
+    chunks are kept in the buffers too, so the pipeline can drop the points of their previous version.
+
+    :param model: SentenceTransformer model whose tokenizer is used for chunking.
+    :param articles: Articles to chunk.
+    :param buffer_chunks: Number of chunks after which a buffer is emitted.
+    :param chunker: "offsets" or "decode".
+    :param chunking_batch: Number of articles tokenized together.
+    :return: Buffers of (article, chunks, token lengths, character spans) tuples.
+    """
+    articles = iter(articles)
+    buffer = []
+    buffered_chunks = 0
+    while True:
+        group = list(islice(articles, chunking_batch))
+        if not group:
+            break
+        for article, (chunks, lengths, spans) in zip(group, chunk_articles(model, group, chunker)):
+            buffer.append((article, chunks, lengths, spans))
+            buffered_chunks += len(chunks)
+            if buffered_chunks >= buffer_chunks:
+                yield buffer
+                buffer = []
+                buffered_chunks = 0
+    if buffer:
+        yield buffer
+
+
+def encode_buffer(model, buffer: List[BufferEntry], batch_size=EMBEDDING_BATCH_SIZE, pool=None) -> List[Tuple[Article, List, List[str]]]:
+    """
+    Encode all chunks of a buffer, sorted by token length so each batch carries as little padding as possible.
+
+    :param model: SentenceTransformer model.
+    :param buffer: Buffer produced by `iter_chunk_buffers`.
+    :param batch_size: Number of chunks per forward pass.
+    :param pool: Optional multi-process pool from `model.start_multi_process_pool`.
+    :return: (article, embeddings, chunks) tuples ready for `store_embeddings_bulk_qdrant`.
+    """
+    flat = [
+        (length, article_idx, chunk_idx, chunk)
+        for article_idx, (_, chunks, lengths, _) in enumerate(buffer)
+        for chunk_idx, (chunk, length) in enumerate(zip(chunks, lengths))
+    ]
+    flat.sort(key=lambda item: item[0])
+    texts = [chunk for _, _, _, chunk in flat]
+
+    if not texts:
+        # Only articles without chunks
+        embeddings = []
+    elif pool is not None:
+        embeddings = model.encode_multi_process(texts, pool, batch_size=batch_size)
+    else:
+        embeddings = model.encode(texts, batch_size=batch_size)
+
+    # Put every embedding back next to its article, in chunk order
+    per_article = [[None] * len(chunks) for _, chunks, _, _ in buffer]
+    for (_, article_idx, chunk_idx, _), embedding in zip(flat, embeddings):
+        per_article[article_idx][chunk_idx] = embedding
+
+    return [
+        (article, embeddings, chunks)
+        for (article, chunks, _, _), embeddings in zip(buffer, per_article)
+    ]
+
+
+def run_batched_pipeline(model, articles: Iterable[Article], model_name: str, batch_size=EMBEDDING_BATCH_SIZE,
+                         workers=EMBEDDING_WORKERS, buffer_chunks=EMBEDDING_BUFFER_CHUNKS, incremental=False):
+    """
+    Embed the whole corpus in large, length-sorted batches and store the results in bulk.
+
+    :param model: SentenceTransformer model.
+    :param articles: Articles to embed, e.g. rows from `stream_articles`. They are consumed lazily, one buffer at a time.
+    :param model_name: Name of the model, part of the content hash stored with every chunk.
+    :param batch_size: Number of chunks per forward pass.
+    :param workers: Number of encoding processes. With 1 the model runs in the current process.
+    :param buffer_chunks: Number of chunks gathered from consecutive articles before encoding.
+    :param incremental: Only embed articles whose content hash changed, and drop chunk points
+        of articles that shrank or were removed from the database.
+    :return: Total number of stored chunks.
+    """
+    seen_ids = set()
+    hashed_articles = with_content_hashes(articles, model_name, model, seen_ids)
+
+    stored_state = {}
+    if incremental:
+        print("Loading stored content hashes...")
+        stored_state = get_stored_content_hashes()
+        hashed_articles = select_changed_articles(hashed_articles, stored_state)
+
+    # Content hashes of the buffered articles, stored as payload with their chunks
+    extra_payloads = {}
+
+    def articles_to_embed():
+        for article, content_hash in hashed_articles:
+            extra_payloads[article.id] = {"content_hash": content_hash}
+            yield article
+
+    pool = model.start_multi_process_pool(["cpu"] * workers) if workers > 1 else None
+    total_chunks = 0
+    start = time.perf_counter()
+    try:
+        for buffer in iter_chunk_buffers(model, articles_to_embed(), buffer_chunks):
+            buffer_start = time.perf_counter()
+            records = encode_buffer(model, buffer, batch_size, pool)
+            chunk_spans = {article.id: spans for article, _, _, spans in buffer if spans is not None}
+            stored = store_embeddings_bulk_qdrant(records, extra_payloads=extra_payloads, chunk_spans=chunk_spans)
+            total_chunks += stored
+            for article, _, _ in records:
+                extra_payloads.pop(article.id, None)
+
+            if incremental:
+                # Remove chunk points left over from a longer previous version of the article,
+                # or all of them if the article no longer produces any chunk
+                for article, _, chunks in records:
+                    _, previous_count = stored_state.get(article.id, (None, 0))
+                    delete_article_chunks(article.id, len(chunks), previous_count)
+
+            buffer_elapsed = time.perf_counter() - buffer_start
+            print(f"Stored {stored} chunks from {len(buffer)} articles "
+                  f"({stored / buffer_elapsed:.1f} chunks/sec, {total_chunks} total)")
+    finally:
+        if pool is not None:
+            model.stop_multi_process_pool(pool)
+
+    if incremental:
+        removed = set(stored_state) - seen_ids
+        for article_id in removed:
+            delete_article_chunks(article_id, 0, stored_state[article_id][1])
+        print(f"Removed chunks of {len(removed)} articles no longer in the database.")
+
+    elapsed = time.perf_counter() - start
+    print(f"Embedded {total_chunks} chunks in {elapsed:.1f}s "
+          f"({total_chunks / elapsed if elapsed else 0:.1f} chunks/sec, batch size {batch_size}, {workers} worker(s))")
+    return total_chunks
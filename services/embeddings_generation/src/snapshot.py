@@ -0,0 +1,187 @@
+import os
+import io
+import sys
+import json
+import time
+import tempfile
+import numpy as np
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+from qdrant_client.http import models
+from core.encoder import encoder_id, ENCODER_BACKEND
+from core.minio_client import MinIOClient
+from core.postgres_db import bump_data_version, create_schema
+from core.qdrant_db import get_qdrant_client, setup_qdrant_collection, COLLECTION_NAME, EMBEDDING_DIM, EMBEDDINGS_DATA_VERSION
+from src.chunking import CHUNK_OVERLAP_RATIO
+from src.pipeline import CHUNKER
+
+
+SNAPSHOT_BUCKET = "legal-docs-minio-bucket"
+# Snapshots are stored under snapshots/<name>/ in the bucket
+SNAPSHOT_NAME = os.getenv("SNAPSHOT_NAME", "latest")
+# "float32" keeps the vectors exactly, "float16" halves the snapshot size
+SNAPSHOT_DTYPE = os.getenv("SNAPSHOT_DTYPE", "float32")
+SNAPSHOT_BATCH_SIZE = int(os.getenv("SNAPSHOT_BATCH_SIZE", "1024"))
+SNAPSHOT_UPLOAD_WORKERS = int(os.getenv("SNAPSHOT_UPLOAD_WORKERS", "4"))
+# Import a snapshot even if it was made with another model, backend or chunking
+SNAPSHOT_FORCE = os.getenv("SNAPSHOT_FORCE", "false") == "true"
+
+
+def snapshot_key(name: str, file_name: str) -> str:
+    return f"snapshots/{name}/{file_name}"
+
+
+def snapshot_settings() -> Dict:
+    """Everything that must match for the vectors of a snapshot to be interchangeable with freshly embedded ones"""
+    return {
+        "model": encoder_id(),
+        "chunker": CHUNKER,
+        "chunk_overlap_ratio": CHUNK_OVERLAP_RATIO,
+        "embedding_dim": EMBEDDING_DIM,
+    }
+
+
+def export_snapshot(minio_client: MinIOClient, name=SNAPSHOT_NAME, dtype=SNAPSHOT_DTYPE, batch_size=SNAPSHOT_BATCH_SIZE) -> Dict:
+    """
+    Write every point of the collection to MinIO as a snapshot: the vectors as one npy matrix, the point IDs and
+    payloads as gzip-compressed JSON lines in the same order, and a manifest with the embedding settings.
+
+    :return: The manifest.
+    """
+    client = get_qdrant_client()
+    start = time.perf_counter()
+    vectors = []
+    count = 0
+    with tempfile.TemporaryFile() as payloads:
+        offset = None
+        while True:
+            points, offset = client.scroll(COLLECTION_NAME, limit=batch_size, offset=offset, with_payload=True, with_vectors=True)
+            if points:
+                vectors.append(np.asarray([point.vector for point in points], dtype=dtype))
+                for point in points:
+                    payloads.write((json.dumps([str(point.id), point.payload], ensure_ascii=False) + "\n").encode("utf-8"))
+                count += len(points)
+            if offset is None:
+                break
+
+        matrix = np.concatenate(vectors) if vectors else np.zeros((0, EMBEDDING_DIM), dtype=dtype)
+        buffer = io.BytesIO()
+        np.save(buffer, matrix)
+        buffer.seek(0)
+        minio_client.create_bucket_if_not_exists(SNAPSHOT_BUCKET)
+        if not minio_client.upload_fileobj(SNAPSHOT_BUCKET, snapshot_key(name, "vectors.npy"), buffer,
+                                           "application/octet-stream", compression="none"):
+            raise RuntimeError("Could not upload the snapshot vectors")
+        payloads.seek(0)
+        if not minio_client.upload_fileobj(SNAPSHOT_BUCKET, snapshot_key(name, "payloads.jsonl"), payloads,
+                                           "application/x-ndjson", compression="gzip"):
+            raise RuntimeError("Could not upload the snapshot payloads")
+
+    manifest = {
+        **snapshot_settings(),
+        "collection": COLLECTION_NAME,
+        "count": count,
+        "dtype": dtype,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    # The manifest is written last, so a snapshot without one is incomplete
+    data = json.dumps(manifest, indent=2).encode("utf-8")
+    minio_client.put_object(SNAPSHOT_BUCKET, snapshot_key(name, "manifest.json"), data, len(data), "application/json")
+    print(f"Exported {count} points to snapshot '{name}' in {time.perf_counter() - start:.1f}s.")
+    return manifest
+
+
+def import_snapshot(minio_client: MinIOClient, name=SNAPSHOT_NAME, batch_size=SNAPSHOT_BATCH_SIZE,
+                    workers=SNAPSHOT_UPLOAD_WORKERS, force=SNAPSHOT_FORCE) -> int:
+    """
+    Replace the collection of the configured vector backend (Qdrant or the local index) with a snapshot,
+    upserting batches of points from several threads. No model is needed. The collection is recreated first,
+    so points that are not in the snapshot are gone afterwards, and searches find nothing until the import is done.
+
+    :return: The number of imported points.
+    """
+    content = minio_client.get_object(SNAPSHOT_BUCKET, snapshot_key(name, "manifest.json"))
+    if not content:
+        raise ValueError(f"Snapshot '{name}' not found")
+    manifest = json.loads(content)
+    mismatched = {key: (manifest.get(key), value) for key, value in snapshot_settings().items() if manifest.get(key) != value}
+    if mismatched:
+        message = ", ".join(f"{key}: snapshot {old!r}, current {new!r}" for key, (old, new) in mismatched.items())
+        if not force:
+            raise ValueError(f"Snapshot '{name}' was made with other settings ({message}). Set SNAPSHOT_FORCE=true to import it anyway.")
+        print(f"Importing despite different settings: {message}")
+
+    start = time.perf_counter()
+    # Upserting into the existing collection would keep the points of articles missing from the snapshot
+    setup_qdrant_collection(reset=True)
+    client = get_qdrant_client()
+
+    with tempfile.TemporaryFile() as file:
+        with minio_client.open_object(SNAPSHOT_BUCKET, snapshot_key(name, "vectors.npy")) as reader:
+            while True:
+                chunk = reader.read(2**20)
+                if not chunk:
+                    break
+                file.write(chunk)
+        file.seek(0)
+        vectors = np.load(file)
+
+    def upload(batch_start: int, batch):
+        client.upsert(
+            collection_name=COLLECTION_NAME,
+            points=[
+                models.PointStruct(id=point_id, vector=vector.tolist(), payload=payload)
+                for (point_id, payload), vector in zip(batch, vectors[batch_start:batch_start + len(batch)].astype(np.float32))
+            ]
+        )
+        return len(batch)
+
+    imported = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        batch = []
+        batch_start = 0
+        with io.TextIOWrapper(minio_client.open_object(SNAPSHOT_BUCKET, snapshot_key(name, "payloads.jsonl")), encoding="utf-8") as lines:
+            for line in lines:
+                batch.append(json.loads(line))
+                if len(batch) >= batch_size:
+                    futures.append(executor.submit(upload, batch_start, batch))
+                    batch_start += len(batch)
+                    batch = []
+        if batch:
+            futures.append(executor.submit(upload, batch_start, batch))
+        for future in futures:
+            imported += future.result()
+
+    if hasattr(client, "flush"):
+        # The local index keeps upserts in memory until flushed
+        client.flush()
+    if imported != manifest["count"]:
+        raise ValueError(f"Snapshot '{name}' is inconsistent: {imported} points imported, {manifest['count']} expected")
+    print(f"Imported {imported} points from snapshot '{name}' in {time.perf_counter() - start:.1f}s.")
+    return imported
+
+
+def main():
+    """
+    Usage: python -m src.snapshot export|import [name]
+    """
+    if len(sys.argv) < 2 or sys.argv[1] not in ("export", "import"):
+        print(main.__doc__.strip())
+        sys.exit(1)
+    name = sys.argv[2] if len(sys.argv) > 2 else SNAPSHOT_NAME
+    minio_client = MinIOClient()
+
+    if sys.argv[1] == "export":
+        export_snapshot(minio_client, name)
+    else:
+        print(f"Importing snapshot '{name}' ({ENCODER_BACKEND} backend settings)...")
+        import_snapshot(minio_client, name)
+        # Let the search API know that cached search results are stale
+        create_schema()
+        bump_data_version(EMBEDDINGS_DATA_VERSION)
+
+
+if __name__ == '__main__':
+    main()
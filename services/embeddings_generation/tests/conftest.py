@@ -0,0 +1,16 @@
+import atexit
+import pytest
+from core import qdrant_db
+from core.local_index import LocalVectorIndex
+from core.qdrant_db import setup_qdrant_collection
+
+
+@pytest.fixture
+def local_index(tmp_path, monkeypatch):
+    """Local vector index with an empty collection, used by every function of core.qdrant_db"""
+    index = LocalVectorIndex(str(tmp_path / "index"))
+    # Only what a test flushes explicitly is saved
+    atexit.unregister(index.flush)
+    monkeypatch.setattr(qdrant_db, "_qdrant_client", index)
+    setup_qdrant_collection(reset=False)
+    return index
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from core.postgres_db import Article
+from core.qdrant_db import get_stored_content_hashes, EMBEDDING_DIM
+from src import pipeline
+
+
+class FakeModel:
+    """Encodes every chunk to a fixed random vector, enough to exercise storing and deleting points"""
+    max_seq_length = 16
+
+    def encode(self, texts, batch_size=None):
+        return np.random.default_rng(0).normal(size=(len(texts), EMBEDDING_DIM)).astype(np.float32)
+
+
+def sentence_chunks(model, articles, chunker=None):
+    """One chunk per sentence of the body, in place of the tokenizer-based chunking"""
+    chunked = []
+    for article in articles:
+        chunks = [sentence.strip() for sentence in article.article_body.split(".") if sentence.strip()]
+        chunked.append((chunks, [len(chunk.split()) for chunk in chunks], None))
+    return chunked
+
+
+@pytest.fixture(autouse=True)
+def chunk_by_sentence(monkeypatch):
+    monkeypatch.setattr(pipeline, "chunk_articles", sentence_chunks)
+
+
+def stored_chunk_counts():
+    return {article_id: count for article_id, (_, count) in get_stored_content_hashes().items()}
+
+
+def article(article_id: int, body: str) -> Article:
+    return Article(id=article_id, source="CODUL_PENAL", article_id=f"id_art{article_id}",
+                   article_title=f"Articolul {article_id}", article_body=body)
+
+
+def test_incremental_run_drops_chunks_of_emptied_article(local_index):
+    model = FakeModel()
+    articles = [article(1, "Prima. A doua. A treia."), article(2, "Alt text.")]
+    assert pipeline.run_batched_pipeline(model, articles, "fake-model", workers=1) == 4
+    assert stored_chunk_counts() == {1: 3, 2: 1}
+
+    articles = [article(1, "  "), article(2, "Alt text.")]
+    assert pipeline.run_batched_pipeline(model, articles, "fake-model", workers=1, incremental=True) == 0
+    assert stored_chunk_counts() == {2: 1}
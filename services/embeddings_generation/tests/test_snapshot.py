@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from qdrant_client.http import models
+from core import minio_client
+from core.local_storage import LocalObjectStore
+from core.qdrant_db import COLLECTION_NAME, EMBEDDING_DIM
+
+# The snapshot settings name the encoder
+pytest.importorskip("sentence_transformers")
+
+from src.snapshot import export_snapshot, import_snapshot
+
+
+@pytest.fixture
+def local_storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(minio_client, "MINIO_BACKEND", "local")
+    client = minio_client.MinIOClient()
+    client.client = LocalObjectStore(str(tmp_path / "storage"))
+    return client
+
+
+def upsert_points(index, point_ids):
+    vectors = np.random.default_rng(0).normal(size=(len(point_ids), EMBEDDING_DIM)).astype(np.float32)
+    index.upsert(COLLECTION_NAME, [
+        models.PointStruct(id=point_id, vector=vector.tolist(), payload={"article_id": point_id})
+        for point_id, vector in zip(point_ids, vectors)
+    ])
+
+
+def test_import_replaces_the_collection(local_index, local_storage):
+    upsert_points(local_index, [1, 2, 3])
+    assert export_snapshot(local_storage, "test")["count"] == 3
+
+    # Points stored after the export are not in the snapshot
+    upsert_points(local_index, [4, 5])
+    assert import_snapshot(local_storage, "test", batch_size=2, workers=2) == 3
+    assert local_index.get_collection(COLLECTION_NAME)["points_count"] == 3
+    assert local_index.retrieve(COLLECTION_NAME, ["4", "5"]) == []
+    assert len(local_index.retrieve(COLLECTION_NAME, ["1", "2", "3"])) == 3
@@ -0,0 +1,149 @@
+import os
+import json
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+
+class AnswerCache:
+    def __init__(self, maxsize: int, threshold: float = 0.95, path: Optional[str] = None):
+        """
+        Initializes a semantic cache of LLM answers, keyed by the question embedding.
+
+        A question hits the cache when its embedding is within `threshold` cosine similarity of a cached
+        question and the retrieved articles are the same ones the cached answer was generated from.
+
+        :param maxsize: Maximum number of cached answers. The least recently used answer is evicted first.
+        :param threshold: Minimum cosine similarity between the new and the cached question.
+        :param path: Optional .npz file the cache is loaded from and saved to, so it survives restarts.
+        """
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.versions = None
+        self._vectors = None
+        self._article_keys: List[Optional[Tuple[str, ...]]] = [None] * maxsize
+        self._answers: List[Optional[str]] = [None] * maxsize
+        self._last_used = np.zeros(maxsize, dtype=np.int64)
+        self._clock = 0
+
+    @staticmethod
+    def article_key(laws: List[Dict]) -> Tuple[str, ...]:
+        """Identify a retrieved article set by the sorted article links"""
+        return tuple(sorted({law["link"] for law in laws}))
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def get(self, embedding, article_key: Tuple[str, ...]) -> Optional[str]:
+        """
+        Returns the cached answer of the most similar question with the same article set, if any.
+        """
+        if self.maxsize <= 0 or self._vectors is None:
+            self.misses += 1
+            return None
+        similarities = self._vectors @ self._normalize(embedding)
+        for slot in np.argsort(-similarities):
+            if similarities[slot] < self.threshold:
+                break
+            if self._article_keys[slot] == article_key:
+                self._last_used[slot] = self._tick()
+                self.hits += 1
+                return self._answers[slot]
+        self.misses += 1
+        return None
+
+    def put(self, embedding, article_key: Tuple[str, ...], answer: str):
+        """
+        Stores an answer, replacing the least recently used entry when the cache is full.
+        """
+        if self.maxsize <= 0:
+            return
+        vector = self._normalize(embedding)
+        if self._vectors is None:
+            self._vectors = np.zeros((self.maxsize, vector.shape[0]), dtype=np.float32)
+        # Empty slots have a zero vector and never match, and last_used 0 makes them evicted first
+        slot = int(np.argmin(self._last_used))
+        self._vectors[slot] = vector
+        self._article_keys[slot] = article_key
+        self._answers[slot] = answer
+        self._last_used[slot] = self._tick()
+
+    def clear(self):
+        self._vectors = None
+        self._article_keys = [None] * self.maxsize
+        self._answers = [None] * self.maxsize
+        self._last_used[:] = 0
+
+    def check_versions(self, versions: Dict[str, int]):
+        """
+        Clears the cache when the article or embedding data versions changed.
+        """
+        if self.versions is not None and versions != self.versions:
+            print(f"Data versions changed to {versions}, clearing answer cache...")
+            self.clear()
+        self.versions = versions
+
+    def save(self):
+        """
+        Writes the cache to `path`, if configured.
+        """
+        if not self.path or self._vectors is None:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        used = np.flatnonzero(self._last_used)
+        metadata = {
+            "versions": self.versions,
+            "article_keys": [list(self._article_keys[slot]) for slot in used],
+            "answers": [self._answers[slot] for slot in used],
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, vectors=self._vectors[used], last_used=self._last_used[used],
+                     metadata=np.array(json.dumps(metadata, ensure_ascii=False)))
+        os.replace(tmp_path, self.path)
+        print(f"Saved {len(used)} cached answers to {self.path}.")
+
+    def load(self):
+        """
+        Reads the cache from `path`, if the file exists and was written for the current data versions.
+        """
+        if not self.path or not os.path.exists(self.path) or self.maxsize <= 0:
+            return
+        try:
+            with np.load(self.path) as data:
+                vectors = data["vectors"]
+                last_used = data["last_used"]
+                metadata = json.loads(str(data["metadata"]))
+        except Exception as e:
+            print(f"Error loading answer cache from {self.path}: {e}")
+            return
+        if self.versions is not None and metadata["versions"] != self.versions:
+            print("Answer cache on disk was built for other data versions, ignoring it.")
+            return
+
+        # Keep the most recently used entries if the cache got smaller
+        keep = np.argsort(-last_used)[:self.maxsize]
+        self.clear()
+        for idx in reversed(keep):
+            self.put(vectors[idx], tuple(metadata["article_keys"][idx]), metadata["answers"][idx])
+        print(f"Loaded {len(keep)} cached answers from {self.path}.")
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": int(np.count_nonzero(self._last_used)),
+            "maxsize": self.maxsize,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
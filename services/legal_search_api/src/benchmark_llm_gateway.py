@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+import asyncio
+import statistics
+import subprocess
+import httpx
+from openai import APIError
+from src.llm_gateway import LLMGateway
+
+
+FAKE_LLM_PORT = int(os.getenv("FAKE_LLM_PORT", "8011"))
+CALLERS = 64
+DISTINCT_PROMPTS = 8
+MAX_CONCURRENCY = 4
+
+
+def prompt(idx: int):
+    return [{"role": "user", "content": f"Intrebarea {idx}\nLink: https://legislatie.just.ro/{idx}"}]
+
+
+async def burst(gateway: LLMGateway, prompts) -> list:
+    """Send every prompt at the same time, returning the latency of each caller in seconds (None if it failed)"""
+    async def call(messages):
+        start = time.perf_counter()
+        try:
+            await gateway.complete(messages)
+        except APIError:
+            return None
+        return time.perf_counter() - start
+    return await asyncio.gather(*(call(messages) for messages in prompts))
+
+
+async def run(callers: int, distinct: int, max_concurrency: int):
+    base_url = f"http://127.0.0.1:{FAKE_LLM_PORT}"
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        for scenario, prompts in (
+            ("identical", [prompt(0)] * callers),
+            (f"{distinct} distinct", [prompt(idx % distinct) for idx in range(callers)]),
+            ("all distinct", [prompt(idx) for idx in range(callers)]),
+        ):
+            await client.post("/stats/reset")
+            gateway = LLMGateway(f"{base_url}/v1", "x", "fake-model", max_concurrency=max_concurrency)
+            start = time.perf_counter()
+            latencies = await burst(gateway, prompts)
+            failed = latencies.count(None)
+            latencies = [latency for latency in latencies if latency is not None] or [0.0]
+            elapsed = time.perf_counter() - start
+            await gateway.close()
+            upstream = (await client.get("/stats")).json()
+            stats = gateway.stats()
+            print(
+                f"{scenario:>12}: {callers} callers ({failed} failed) in {elapsed:.2f}s "
+                f"(median {statistics.median(latencies):.2f}s, max {max(latencies):.2f}s), "
+                f"upstream calls {stats['calls']} (coalesced {stats['coalesced']}, retries {stats['retries']}), "
+                f"fake LLM requests {upstream['requests']}, peak concurrency {upstream['max_in_flight']}/{max_concurrency}"
+            )
+
+
+def main():
+    """
+    Fires bursts of concurrent prompts through the LLM gateway at a local fake LLM, and compares the number of
+    callers with the upstream requests it received (singleflight) and their peak concurrency (the semaphore).
+    Set FAKE_LLM_ERROR_RATE to also exercise the retries.
+
+    Usage: python -m src.benchmark_llm_gateway [callers] [distinct prompts] [max concurrency]
+    """
+    callers = int(sys.argv[1]) if len(sys.argv) > 1 else CALLERS
+    distinct = int(sys.argv[2]) if len(sys.argv) > 2 else DISTINCT_PROMPTS
+    max_concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else MAX_CONCURRENCY
+
+    env = {**os.environ, "FAKE_LLM_PORT": str(FAKE_LLM_PORT)}
+    server = subprocess.Popen([sys.executable, "-m", "src.fake_llm"], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(100):
+            try:
+                httpx.get(f"http://127.0.0.1:{FAKE_LLM_PORT}/stats")
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        asyncio.run(run(callers, distinct, max_concurrency))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
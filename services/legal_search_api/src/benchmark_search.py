@@ -0,0 +1,76 @@
+import time
+import statistics
+from typing import Dict, List
+from core.postgres_db import Session, Article
+from core.qdrant_db import get_qdrant_client, COLLECTION_NAME, hydrate_hits
+from core.article_cache import ArticleCache
+from core.encoder import load_encoder
+
+
+QUESTION = "ce se poate intampla daca fac evaziune fiscala"
+TOP_K_VALUES = [1, 2, 5, 10, 20, 50]
+REPEATS = 20
+
+
+def hydrate_hits_per_hit(points) -> List[Dict]:
+    """Previous hydration path: one `session.get` round-trip per hit"""
+    output = []
+    session = Session()
+    try:
+        for hit in points:
+            article = session.get(Article, hit.payload["article_id"])
+            # Without QDRANT_STORE_CHUNK_TEXT the payload only has the span of the chunk in the article body
+            text = hit.payload.get("chunk_text")
+            if text is None:
+                text = article.article_body[hit.payload["char_start"]:hit.payload["char_end"]]
+            output.append({
+                "score": hit.score,
+                "similarity": hit.score,
+                "text": text,
+                "article_title": article.article_title,
+                "full_text": article.article_body,
+                "link": article.link,
+                "reference": f"{article.article_title} din {article.source}",
+            })
+    finally:
+        session.close()
+    return output
+
+
+def median_ms(func, repeats=REPEATS) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    """
+    Compares the latency of hydrating Qdrant hits with per-hit lookups, one bulk query and the article cache.
+    The Qdrant search itself is done once per top_k, so only the PostgreSQL side is measured.
+    """
+    model = load_encoder()
+    query_embedding = model.encode(QUESTION).tolist()
+
+    article_cache = ArticleCache(maxsize=100000)
+    article_cache.load()
+
+    print(f"{'top_k':>5} {'per-hit (ms)':>14} {'bulk (ms)':>10} {'cached (ms)':>12} {'speedup':>8}")
+    for top_k in TOP_K_VALUES:
+        points = get_qdrant_client().query_points(
+            collection_name=COLLECTION_NAME,
+            query=query_embedding,
+            limit=top_k,
+            with_payload=True
+        ).points
+
+        per_hit = median_ms(lambda: hydrate_hits_per_hit(points))
+        bulk = median_ms(lambda: hydrate_hits(points))
+        cached = median_ms(lambda: hydrate_hits(points, article_cache))
+        print(f"{top_k:>5} {per_hit:>14.2f} {bulk:>10.2f} {cached:>12.3f} {per_hit / bulk:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+import sys
+import json
+import statistics
+import subprocess
+
+
+RUNS = 5
+
+# Runs in a fresh interpreter, so nothing is cached between runs
+STARTUP_SCRIPT = """
+import asyncio, json, time
+start = time.perf_counter()
+import src.main
+imported = time.perf_counter()
+
+async def startup():
+    async with src.main.app.router.lifespan_context(src.main.app):
+        return time.perf_counter()
+
+ready = asyncio.run(startup())
+print(json.dumps({"import": imported - start, "ready": ready - start}))
+"""
+
+
+def main():
+    """
+    Measures the cold start of the API in fresh interpreters: the time to import the app module and the time
+    until the startup hooks (model loading, caches, clients) have completed.
+
+    Usage: python -m src.benchmark_startup [runs]
+    """
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else RUNS
+    imports, readies = [], []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], capture_output=True, text=True, check=True).stdout
+        timings = json.loads(output.strip().splitlines()[-1])
+        imports.append(timings["import"])
+        readies.append(timings["ready"])
+
+    print(f"import src.main: median {statistics.median(imports):.2f}s, min {min(imports):.2f}s")
+    print(f"startup complete: median {statistics.median(readies):.2f}s, min {min(readies):.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+from typing import Callable, Dict, List, Optional, Tuple
+from core.text import WHITESPACE_RE
+
+
+# Packed segments shorter than this are not worth truncating into the remaining budget, their article is only linked
+MIN_TRUNCATED_TOKENS = 48
+
+
+def _locate(law: Dict) -> Optional[Tuple[int, int]]:
+    """Character span of a hit's text in its article body, or None if the text is not a verbatim slice of it"""
+    start = law["full_text"].find(law["text"])
+    if start < 0 or not law["text"]:
+        return None
+    return start, start + len(law["text"])
+
+
+def merge_hits(laws: List[Dict]) -> List[Dict]:
+    """
+    Merge the hits of the same article whose chunks overlap or are only separated by whitespace (the chunker
+    overlaps consecutive chunks), then merge segments with identical text, whatever their article.
+
+    :param laws: Search results, best first.
+    :return: Segments with their "text", best "score" and the "references" and "links" of every merged hit,
+        best first.
+    """
+    # Group the located chunks of every article, the other hits are segments on their own
+    spans: Dict[str, List[Tuple[int, int, Dict]]] = {}
+    segments = []
+    for law in laws:
+        span = _locate(law)
+        if span is None:
+            segments.append({"text": law["text"], "score": law["score"], "references": [law["reference"]], "links": [law["link"]]})
+        else:
+            spans.setdefault(law["link"], []).append((span[0], span[1], law))
+
+    for link, article_spans in spans.items():
+        article_spans.sort(key=lambda item: item[0])
+        full_text = article_spans[0][2]["full_text"]
+        start, end, law = article_spans[0]
+        score = law["score"]
+        for next_start, next_end, next_law in article_spans[1:]:
+            if next_start <= end or not full_text[end:next_start].strip():
+                end = max(end, next_end)
+                score = max(score, next_law["score"])
+                continue
+            segments.append({"text": full_text[start:end], "score": score, "references": [law["reference"]], "links": [link]})
+            start, end, law, score = next_start, next_end, next_law, next_law["score"]
+        segments.append({"text": full_text[start:end], "score": score, "references": [law["reference"]], "links": [link]})
+
+    segments.sort(key=lambda segment: segment["score"], reverse=True)
+    unique = {}
+    for segment in segments:
+        key = WHITESPACE_RE.sub(" ", segment["text"]).strip()
+        if key in unique:
+            duplicate = unique[key]
+            duplicate["references"] += [reference for reference in segment["references"] if reference not in duplicate["references"]]
+            duplicate["links"] += [link for link in segment["links"] if link not in duplicate["links"]]
+        else:
+            unique[key] = segment
+    return list(unique.values())
+
+
+def _truncate(text: str, tokens: int, max_tokens: int) -> str:
+    """Cut a text to about `max_tokens` tokens, at a word boundary, assuming tokens are spread evenly"""
+    cut = text[:len(text) * max_tokens // tokens]
+    if " " in cut:
+        cut = cut[:cut.rindex(" ")]
+    return cut.rstrip() + " […]"
+
+
+def pack_context(laws: List[Dict], count_tokens: Callable[[str], int], budget: int) -> Tuple[List[Dict], Dict]:
+    """
+    Fit the search results into a token budget for the prompt: overlapping chunks are merged, duplicates
+    removed, and the segments are added by descending score while they fit. A segment that does not fit is
+    truncated into the remaining budget if enough of it is left; the articles of the segments left out are still linked.
+
+    :param laws: Search results, best first.
+    :param count_tokens: Number of tokens of a text.
+    :param budget: Maximum number of tokens of the segment texts.
+    :return: The segments (with "text" None when the article is only linked), and the "raw_tokens" of the
+        unpacked hit texts and "packed_tokens" of the segments.
+    """
+    raw_tokens = sum(count_tokens(law["text"]) for law in laws)
+    packed = []
+    used = 0
+    for segment in merge_hits(laws):
+        tokens = count_tokens(segment["text"])
+        remaining = budget - used
+        if tokens > remaining:
+            if remaining >= min(MIN_TRUNCATED_TOKENS, budget):
+                segment["text"] = _truncate(segment["text"], tokens, remaining)
+                tokens = count_tokens(segment["text"])
+            else:
+                segment["text"] = None
+                tokens = 0
+        used += tokens
+        packed.append(segment)
+
+    # Articles already quoted by another segment need no separate link
+    quoted = {link for segment in packed if segment["text"] is not None for link in segment["links"]}
+    for segment in packed:
+        if segment["text"] is None:
+            segment["links"] = [link for link in segment["links"] if link not in quoted]
+            quoted.update(segment["links"])
+    packed = [segment for segment in packed if segment["links"]]
+    return packed, {"raw_tokens": raw_tokens, "packed_tokens": used}
@@ -0,0 +1,123 @@
+import asyncio
+from concurrent.futures import Executor
+from functools import partial
+from typing import Dict, List
+
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, float("inf")]
+
+
+class EmbeddingBatcher:
+    def __init__(self, model, executor: Executor, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        """
+        Initializes a scheduler that groups concurrent questions into a single `model.encode` call.
+
+        :param model: SentenceTransformer model.
+        :param executor: Executor running the blocking encode calls.
+        :param max_batch_size: Maximum number of questions encoded together.
+        :param max_wait_ms: How long the first question of a batch waits for others to join it.
+        """
+        self.model = model
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = None
+        self._task = None
+
+        self.batches = 0
+        self.encoded = 0
+        self.max_queue_depth = 0
+        self.batch_size_counts = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+
+    def start(self):
+        """
+        Starts the batching loop. Must be called from the running event loop.
+        """
+        self.queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stops the batching loop.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def encode(self, text: str) -> List[float]:
+        """
+        Queues a question and waits for its embedding.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((text, future))
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+        return await future
+
+    async def _collect_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Take whatever else is already waiting, without delaying the batch further
+        while len(batch) < self.max_batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect_batch()
+            # Drop questions whose caller went away while waiting
+            batch = [(text, future) for text, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            texts = [text for text, _ in batch]
+            try:
+                vectors = await loop.run_in_executor(
+                    self.executor, partial(self.model.encode, texts, batch_size=len(texts))
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self._record_batch(len(batch))
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector.tolist())
+
+    def _record_batch(self, size: int):
+        self.batches += 1
+        self.encoded += size
+        for bucket in BATCH_SIZE_BUCKETS:
+            if size <= bucket:
+                self.batch_size_counts[bucket] += 1
+                break
+
+    def stats(self) -> Dict:
+        """
+        Returns the current queue depth and batch size statistics.
+        """
+        return {
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "batches": self.batches,
+            "encoded": self.encoded,
+            "avg_batch_size": self.encoded / self.batches if self.batches else 0.0,
+            "batch_size_counts": {f"le_{bucket}": count for bucket, count in self.batch_size_counts.items()},
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+        }
@@ -0,0 +1,119 @@
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import asyncio
+import json
+import os
+import random
+import re
+import time
+import uuid
+
+
+# Simulated latency before the first token and between tokens, in seconds
+FAKE_LLM_FIRST_TOKEN_DELAY = float(os.getenv("FAKE_LLM_FIRST_TOKEN_DELAY", "0.5"))
+FAKE_LLM_TOKEN_DELAY = float(os.getenv("FAKE_LLM_TOKEN_DELAY", "0.02"))
+# Fraction of requests rejected with a 429 and a Retry-After of FAKE_LLM_RETRY_AFTER seconds
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+FAKE_LLM_RETRY_AFTER = os.getenv("FAKE_LLM_RETRY_AFTER", "0.1")
+
+
+app = FastAPI(title="Fake OpenAI-compatible LLM")
+app.state.requests = 0
+app.state.rejected = 0
+app.state.in_flight = 0
+app.state.max_in_flight = 0
+
+
+def fake_answer(messages) -> str:
+    """Build a deterministic answer that cites every link found in the prompt"""
+    prompt = messages[-1]["content"] if messages else ""
+    links = re.findall(r"Link: (\S+)", prompt)
+    question = prompt.split("\n", 1)[0]
+    return f"Răspuns de test pentru {question}. Surse: " + ", ".join(links)
+
+
+def completion_chunk(completion_id: str, model: str, delta: dict, finish_reason=None) -> str:
+    chunk = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+
+
+@app.post("/chat/completions")
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    """Minimal implementation of the OpenAI chat completions API, with and without streaming"""
+    app.state.requests += 1
+    if random.random() < FAKE_LLM_ERROR_RATE:
+        app.state.rejected += 1
+        return JSONResponse(
+            {"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}},
+            status_code=429,
+            headers={"Retry-After": FAKE_LLM_RETRY_AFTER}
+        )
+    body = await request.json()
+    model = body.get("model", "fake-model")
+    answer = fake_answer(body.get("messages", []))
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+    app.state.in_flight += 1
+    app.state.max_in_flight = max(app.state.max_in_flight, app.state.in_flight)
+    if not body.get("stream"):
+        try:
+            await asyncio.sleep(FAKE_LLM_FIRST_TOKEN_DELAY)
+            tokens = answer.split(" ")
+            await asyncio.sleep(FAKE_LLM_TOKEN_DELAY * len(tokens))
+        finally:
+            app.state.in_flight -= 1
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": answer},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+        }
+
+    async def chunks():
+        try:
+            await asyncio.sleep(FAKE_LLM_FIRST_TOKEN_DELAY)
+            yield completion_chunk(completion_id, model, {"role": "assistant", "content": ""})
+            for idx, token in enumerate(answer.split(" ")):
+                yield completion_chunk(completion_id, model, {"content": token if idx == 0 else " " + token})
+                await asyncio.sleep(FAKE_LLM_TOKEN_DELAY)
+            yield completion_chunk(completion_id, model, {}, finish_reason="stop")
+            yield "data: [DONE]\n\n"
+        finally:
+            app.state.in_flight -= 1
+
+    return StreamingResponse(chunks(), media_type="text/event-stream")
+
+
+@app.get("/stats")
+async def stats():
+    """Requests received (including the rejected ones) and the highest number generating at the same time"""
+    return {
+        "requests": app.state.requests,
+        "rejected": app.state.rejected,
+        "in_flight": app.state.in_flight,
+        "max_in_flight": app.state.max_in_flight,
+    }
+
+
+@app.post("/stats/reset")
+async def reset_stats():
+    app.state.requests = app.state.rejected = app.state.max_in_flight = 0
+    return {"status": "ok"}
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("FAKE_LLM_PORT", "8001")))
@@ -0,0 +1,167 @@
+import json
+import random
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List
+import httpx
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, APITimeoutError, InternalServerError, RateLimitError
+from src import metrics
+
+
+# Upstream errors worth retrying: the request may succeed once the server recovers or the rate limit resets
+RETRYABLE_ERRORS = (APIConnectionError, APITimeoutError, RateLimitError, InternalServerError)
+
+
+class LLMGateway:
+    def __init__(self, base_url: str, api_key: str, model: str, max_concurrency: int = 8, timeout: float = 60.0,
+                 connect_timeout: float = 5.0, max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 8.0):
+        """
+        Initializes the single entry point for chat completions of the API.
+
+        Identical prompts in flight at the same time share one upstream call, at most `max_concurrency` calls
+        run at once over a pooled HTTP client, and failed calls are retried with exponential backoff.
+
+        :param base_url: Base URL of the OpenAI-compatible API.
+        :param api_key: API key.
+        :param model: Model name sent with every request.
+        :param max_concurrency: Maximum number of upstream calls at the same time, the others wait for a slot.
+        :param timeout: Seconds to wait for the upstream response (or the next streamed chunk).
+        :param connect_timeout: Seconds to wait for a connection to the upstream server.
+        :param max_retries: Retries of a call failing with a connection error, a timeout, a 429 or a 5xx.
+        :param backoff_base: Delay before the first retry in seconds, doubled for every following one.
+        :param backoff_max: Maximum delay between two retries in seconds.
+        """
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+        )
+        # Retries are done here, inside the concurrency limit, so backing off a rate-limited server does not make room for more calls
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=self.http_client, max_retries=0)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+        self.waiting = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.failures = 0
+
+    @staticmethod
+    def prompt_key(messages: List[Dict]) -> str:
+        return hashlib.sha256(json.dumps(messages, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    async def complete(self, messages: List[Dict]) -> str:
+        """
+        Returns the answer to a prompt. A caller sending a prompt that is already in flight waits for the
+        same upstream call. The call is not cancelled when its callers go away, so the others still get it.
+        """
+        key = self.prompt_key(messages)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._complete(messages))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+            metrics.LLM_COALESCED.inc()
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            # Mark the error as retrieved, the callers may all have gone away
+            task.exception()
+
+    async def _complete(self, messages: List[Dict]) -> str:
+        async with self._slot():
+            response = await self._create(messages, stream=False)
+            return response.choices[0].message.content
+
+    async def stream(self, messages: List[Dict]) -> AsyncIterator[str]:
+        """
+        Yields the fragments of the answer to a prompt as they are generated. Streams are not shared between
+        callers, but they count against the concurrency limit until they are consumed or closed. Only the
+        request is retried, not a stream that fails midway.
+        """
+        async with self._slot():
+            stream = await self._create(messages, stream=True)
+            # Close the upstream response when the caller stops early (e.g. the client disconnected), or its
+            # pooled connection stays checked out until garbage collection
+            async with stream:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+
+    @asynccontextmanager
+    async def _slot(self):
+        """Waits for one of the `max_concurrency` upstream slots"""
+        self.waiting += 1
+        metrics.LLM_WAITING.inc()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+            metrics.LLM_WAITING.dec()
+        self.in_flight += 1
+        metrics.LLM_IN_FLIGHT.inc()
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            metrics.LLM_IN_FLIGHT.dec()
+            self._semaphore.release()
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Delay before retry number `attempt` (from 0): the Retry-After of a 429 if given, else jittered exponential"""
+        if isinstance(error, APIStatusError):
+            retry_after = error.response.headers.get("retry-after")
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except (TypeError, ValueError):
+                pass
+        return min(self.backoff_base * 2 ** attempt, self.backoff_max) * random.uniform(0.5, 1.0)
+
+    async def _create(self, messages: List[Dict], stream: bool):
+        """Send one chat completion request, retrying retryable errors"""
+        self.calls += 1
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self.client.chat.completions.create(model=self.model, messages=messages, stream=stream)
+                metrics.LLM_CALLS.labels("success").inc()
+                return response
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    self.failures += 1
+                    metrics.LLM_CALLS.labels("failure").inc()
+                    raise
+                delay = self._backoff(attempt, e)
+                print(f"LLM call failed ({type(e).__name__}), retrying in {delay:.2f}s...")
+                self.retries += 1
+                metrics.LLM_CALLS.labels("retry").inc()
+                await asyncio.sleep(delay)
+            except Exception:
+                self.failures += 1
+                metrics.LLM_CALLS.labels("failure").inc()
+                raise
+
+    async def close(self):
+        await self.http_client.aclose()
+
+    def stats(self) -> Dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "waiting": self.waiting,
+            "in_flight": self.in_flight,
+            "coalescing": len(self._inflight),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "failures": self.failures,
+        }
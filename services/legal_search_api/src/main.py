@@ -1,13 +1,32 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, AsyncGenerator
+from fastapi.responses import StreamingResponse, Response, PlainTextResponse
+from pydantic import BaseModel, field_validator
+from typing import List, AsyncGenerator, Optional
 from contextlib import asynccontextmanager
-from sentence_transformers import SentenceTransformer
-from core.qdrant_db import search_laws
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from core.encoder import load_encoder, EMBEDDING_MODEL, ENCODER_BACKEND
+from core.qdrant_db import search_laws_by_vector, search_laws_by_vectors, reload_vector_index, EMBEDDINGS_DATA_VERSION
+from core.postgres_db import get_data_version
+from core.article_cache import ArticleCache, ARTICLES_DATA_VERSION
+from core.lexical_index import LexicalIndex, LEXICAL_INDEX_PATH
+from core.legal_docs import LegalDocsEnum
+from core.timing import span, start_timings, stop_timings
+from src.embedding_batcher import EmbeddingBatcher
+from src.query_cache import QueryCache
+from src.answer_cache import AnswerCache
+from src.profiler import SamplingProfiler
+from src.context_packing import pack_context
+from src.llm_gateway import LLMGateway
+from src import metrics
+from openai import APIError
 from dotenv import load_dotenv
+import asyncio
+import contextvars
+import json
 import os
+import time
 
 
 # Load environment variables from .env file
@@ -15,16 +34,128 @@ load_dotenv()
 
 
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
-EMBEDDING_MODEL = "BlackKakapo/stsb-xlm-r-multilingual-ro"
+# Point LLM_BASE_URL to a local OpenAI-compatible server (e.g. src.fake_llm) for testing
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.deepseek.com")
+LLM_MODEL = os.getenv("LLM_MODEL", "deepseek-chat")
+# Upstream LLM calls running at the same time (identical prompts in flight share one call)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Seconds to wait for an LLM response (or the next streamed fragment), and for the connection
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+# Retries of failed LLM calls, with exponential backoff starting at LLM_BACKOFF_BASE seconds
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+# Number of articles kept in the in-process article cache (0 disables it)
+ARTICLE_CACHE_SIZE = int(os.getenv("ARTICLE_CACHE_SIZE", "20000"))
+ARTICLE_CACHE_CHECK_INTERVAL = float(os.getenv("ARTICLE_CACHE_CHECK_INTERVAL", "30"))
+# Threads running the blocking encoder, PostgreSQL and Qdrant calls off the event loop
+API_EXECUTOR_WORKERS = int(os.getenv("API_EXECUTOR_WORKERS", "4"))
+# Concurrent questions are encoded together: a batch waits at most this long for more questions
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
+# Cache of question embeddings and search results for repeated questions (size 0 disables a level)
+QUERY_CACHE_EMBEDDINGS_SIZE = int(os.getenv("QUERY_CACHE_EMBEDDINGS_SIZE", "10000"))
+QUERY_CACHE_EMBEDDINGS_TTL = float(os.getenv("QUERY_CACHE_EMBEDDINGS_TTL", "86400"))
+QUERY_CACHE_RESULTS_SIZE = int(os.getenv("QUERY_CACHE_RESULTS_SIZE", "2000"))
+QUERY_CACHE_RESULTS_TTL = float(os.getenv("QUERY_CACHE_RESULTS_TTL", "600"))
+# Semantic cache of /ask answers (size 0 disables it); set ANSWER_CACHE_PATH to persist it across restarts
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH")
+# Fuse BM25 hits from the lexical index with the Qdrant hits
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true") == "true"
+# Seconds between checks of the article and embedding data versions
+DATA_VERSION_CHECK_INTERVAL = float(os.getenv("DATA_VERSION_CHECK_INTERVAL", "30"))
+# Tokens of law text in an /ask prompt: overlapping hits are merged and the best ones kept (0 keeps every hit verbatim)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+# Maximum number of questions in one /query/batch request
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "1000"))
+# Questions encoded and searched together when /query/batch streams its results
+QUERY_BATCH_STREAM_CHUNK = int(os.getenv("QUERY_BATCH_STREAM_CHUNK", "64"))
+# Expose the /debug/profiler endpoints that start and stop the sampling profiler at runtime
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false") == "true"
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+
+
+def read_data_versions():
+    return {
+        ARTICLES_DATA_VERSION: get_data_version(ARTICLES_DATA_VERSION),
+        EMBEDDINGS_DATA_VERSION: get_data_version(EMBEDDINGS_DATA_VERSION),
+    }
+
+
+def load_lexical_index():
+    if not HYBRID_SEARCH:
+        return None
+    if not LexicalIndex.exists(LEXICAL_INDEX_PATH):
+        print(f"No lexical index at {LEXICAL_INDEX_PATH}, using dense search only.")
+        return None
+    lexical_index = LexicalIndex.load(LEXICAL_INDEX_PATH)
+    print(f"Loaded lexical index with {len(lexical_index.doc_ids)} documents.")
+    return lexical_index
+
+
+async def watch_data_versions(app: FastAPI):
+    """Periodically compare the data versions, reload the indexes and clear the caches once a rebuild finished"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(DATA_VERSION_CHECK_INTERVAL)
+        try:
+            versions = await loop.run_in_executor(app.state.executor, read_data_versions)
+            if versions[ARTICLES_DATA_VERSION] != app.state.query_cache.versions[ARTICLES_DATA_VERSION]:
+                app.state.lexical_index = await loop.run_in_executor(app.state.executor, load_lexical_index)
+            if versions[EMBEDDINGS_DATA_VERSION] != app.state.query_cache.versions[EMBEDDINGS_DATA_VERSION]:
+                await loop.run_in_executor(app.state.executor, reload_vector_index)
+        except Exception as e:
+            print(f"Error refreshing data versions: {e}")
+            continue
+        app.state.query_cache.check_versions(versions)
+        app.state.answer_cache.check_versions(versions)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     # Load models during startup
-    app.state.embedder = SentenceTransformer(EMBEDDING_MODEL)
-    app.state.generator = OpenAI(api_key=DEEPSEEK_API_KEY, base_url="https://api.deepseek.com")
-    print(f"Loaded embeded model: {EMBEDDING_MODEL}")
+    app.state.embedder = load_encoder()
+    app.state.llm = LLMGateway(
+        LLM_BASE_URL, DEEPSEEK_API_KEY, LLM_MODEL, LLM_MAX_CONCURRENCY, LLM_TIMEOUT, LLM_CONNECT_TIMEOUT,
+        LLM_MAX_RETRIES, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX
+    )
+    tokenizer = app.state.embedder.tokenizer
+    # The embedding model's tokenizer stands in for the LLM's when measuring prompts
+    app.state.count_tokens = lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+    app.state.executor = ThreadPoolExecutor(max_workers=API_EXECUTOR_WORKERS, thread_name_prefix="blocking")
+    print(f"Loaded embeded model: {EMBEDDING_MODEL} ({ENCODER_BACKEND} backend)")
+    app.state.article_cache = None
+    if ARTICLE_CACHE_SIZE > 0:
+        app.state.article_cache = ArticleCache(ARTICLE_CACHE_SIZE, ARTICLE_CACHE_CHECK_INTERVAL)
+        app.state.article_cache.load()
+    app.state.embedding_batcher = EmbeddingBatcher(
+        app.state.embedder, app.state.executor, EMBEDDING_BATCH_MAX_SIZE, EMBEDDING_BATCH_MAX_WAIT_MS
+    )
+    app.state.embedding_batcher.start()
+    app.state.query_cache = QueryCache(
+        QUERY_CACHE_EMBEDDINGS_SIZE, QUERY_CACHE_EMBEDDINGS_TTL, QUERY_CACHE_RESULTS_SIZE, QUERY_CACHE_RESULTS_TTL
+    )
+    app.state.answer_cache = AnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_PATH)
+    versions = read_data_versions()
+    app.state.query_cache.check_versions(versions)
+    app.state.answer_cache.check_versions(versions)
+    app.state.answer_cache.load()
+    app.state.lexical_index = load_lexical_index()
+    app.state.profiler = SamplingProfiler(PROFILER_INTERVAL_MS)
+    metrics.install()
+    # Paths used as the endpoint label of the metrics, every route is registered by now
+    app.state.route_paths = frozenset(route.path for route in app.routes)
+    version_watcher = asyncio.create_task(watch_data_versions(app))
     yield
+    version_watcher.cancel()
+    app.state.profiler.stop()
+    app.state.answer_cache.save()
+    await app.state.embedding_batcher.stop()
+    await app.state.llm.close()
+    app.state.executor.shutdown(wait=False)
 
 app = FastAPI(
     title="Legal QA System",
@@ -36,14 +167,53 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+
+@app.middleware("http")
+async def record_timings(request: Request, call_next):
+    """Time every request, export the stage spans as histograms and return them in a Server-Timing header"""
+    endpoint = request.url.path if request.url.path in request.app.state.route_paths else "other"
+    timings, token = start_timings(endpoint)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        stop_timings(token)
+    elapsed = time.perf_counter() - start
+    metrics.REQUEST_SECONDS.labels(endpoint, request.method, response.status_code).observe(elapsed)
+    # Spans of a streamed body end after the headers are sent, they are only exported as histograms
+    response.headers["Server-Timing"] = timings.server_timing(elapsed)
+    return response
+
 class QueryRequest(BaseModel):
     question: str
     top_k: int = 5
+    bypass_cache: bool = False  # skip the semantic answer cache of /ask
+    source: Optional[str] = None  # only search this legal document, e.g. "CODUL_FISCAL"
+
+    @field_validator("source")
+    @classmethod
+    def check_source(cls, source: Optional[str]) -> Optional[str]:
+        if source is not None and source not in LegalDocsEnum.__members__:
+            raise ValueError(f"Unknown source, expected one of: {', '.join(LegalDocsEnum.__members__)}")
+        return source
+
+class BatchQueryRequest(BaseModel):
+    queries: List[QueryRequest]
+    stream: bool = False  # stream the results as NDJSON, one line per question, instead of one JSON array
+
+    @field_validator("queries")
+    @classmethod
+    def check_size(cls, queries: List[QueryRequest]) -> List[QueryRequest]:
+        if len(queries) > QUERY_BATCH_MAX_SIZE:
+            raise ValueError(f"At most {QUERY_BATCH_MAX_SIZE} queries per batch")
+        return queries
 
 class LawResult(BaseModel):
-    score: float
+    score: float  # ranking score: the cosine similarity, or the reciprocal rank fusion score with hybrid search
+    similarity: Optional[float] = None  # cosine similarity of the best chunk, None for hits found only by BM25
     text: str
     article_title: str
     full_text: str
@@ -53,11 +223,20 @@ class LawResult(BaseModel):
 class QAResponse(BaseModel):
     answer: str
     context: List[LawResult]
+    cached: bool = False
+
+def format_prompt(question: str, segments: List[dict]) -> List[dict]:
+    """
+    Build the chat messages of an /ask request.
 
-def format_prompt(question: str, laws: List[LawResult]) -> List[dict]:
+    :param segments: Law texts with the "references" and "links" of their articles, from `pack_context`.
+        Segments without text only link their articles.
+    """
     context = "\n\n".join(
-        f"Legea {law['reference']}:\nLink: {law['link']}\n{law['text']}\n\n"
-        for law in laws
+        f"Legea {'; '.join(segment['references'])}:\n"
+        + "".join(f"Link: {link}\n" for link in segment['links'])
+        + (f"{segment['text']}\n\n" if segment['text'] else "")
+        for segment in segments
     )
     
     return [
@@ -75,40 +254,276 @@ def format_prompt(question: str, laws: List[LawResult]) -> List[dict]:
     ]
 
 
+def build_prompt(request: Request, question: str, laws: List[dict]) -> List[dict]:
+    """Pack the retrieved laws into the context token budget and format the prompt"""
+    with span("prompt"):
+        if CONTEXT_TOKEN_BUDGET <= 0:
+            segments = [{"text": law["text"], "references": [law["reference"]], "links": [law["link"]]} for law in laws]
+            return format_prompt(question, segments)
+
+        segments, tokens = pack_context(laws, request.app.state.count_tokens, CONTEXT_TOKEN_BUDGET)
+        metrics.CONTEXT_TOKENS.labels("raw").inc(tokens["raw_tokens"])
+        metrics.CONTEXT_TOKENS.labels("packed").inc(tokens["packed_tokens"])
+        print(f"Packed {len(laws)} hits into {len(segments)} segments: {tokens['packed_tokens']} tokens instead of "
+              f"{tokens['raw_tokens']} ({tokens['raw_tokens'] - tokens['packed_tokens']} saved)")
+        return format_prompt(question, segments)
+
+
+async def run_blocking(request: Request, func, *args, **kwargs):
+    """Run a blocking call in the API's bounded executor so it does not stall the event loop"""
+    loop = asyncio.get_running_loop()
+    # Copy the context so timing spans inside the call are recorded on the request
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(request.app.state.executor, partial(context.run, func, *args, **kwargs))
+
+
+async def embed_question(request: Request, question: str) -> List[float]:
+    """Return the embedding of a question, from the query cache or through the embedding batcher"""
+    query_cache = request.app.state.query_cache
+    key = query_cache.key(question)
+    query_embedding = query_cache.get_embedding(key)
+    if query_embedding is None:
+        with span("encode"):
+            query_embedding = await request.app.state.embedding_batcher.encode(question)
+        query_cache.put_embedding(key, query_embedding)
+    return query_embedding
+
+
+async def retrieve_laws(request: Request, question: str, top_k: int, query_embedding: List[float] = None,
+                        source: Optional[str] = None) -> List[dict]:
+    """
+    Return the laws relevant to a question, from the query cache when possible. Otherwise the question
+    is encoded through the embedding batcher and the search and hydration run off the event loop.
+    """
+    query_cache = request.app.state.query_cache
+    key = query_cache.key(question)
+    filters = {"source": source} if source else None
+    results = query_cache.get_results(key, top_k, filters)
+    if results is not None:
+        return results
+
+    if query_embedding is None:
+        query_embedding = await embed_question(request, question)
+
+    with span("search"):
+        results = await run_blocking(
+            request,
+            search_laws_by_vector,
+            query_embedding,
+            top_k,
+            request.app.state.article_cache,
+            question,
+            request.app.state.lexical_index,
+            source
+        )
+    query_cache.put_results(key, top_k, results, filters)
+    return results
+
+
+async def embed_questions(request: Request, questions: List[str]) -> List[List[float]]:
+    """Return the embeddings of many questions, encoding the ones missing from the query cache in one model batch"""
+    query_cache = request.app.state.query_cache
+    keys = [query_cache.key(question) for question in questions]
+    embeddings = {key: query_cache.get_embedding(key) for key in keys}
+    # Paraphrases normalized to the same key are only encoded once
+    missing = {key: question for key, question in zip(keys, questions) if embeddings[key] is None}
+    if missing:
+        model = request.app.state.embedder
+        with span("encode"):
+            vectors = await run_blocking(request, model.encode, list(missing.values()), batch_size=EMBEDDING_BATCH_MAX_SIZE)
+        for key, vector in zip(missing, vectors):
+            embeddings[key] = vector.tolist()
+            query_cache.put_embedding(key, embeddings[key])
+    return [embeddings[key] for key in keys]
+
+
+async def retrieve_laws_batch(request: Request, queries: List[QueryRequest]) -> List[List[dict]]:
+    """
+    Batch variant of `retrieve_laws`: the questions missing from the query cache are encoded together,
+    searched with one Qdrant batch request and hydrated with one article fetch.
+    """
+    query_cache = request.app.state.query_cache
+    keys = [query_cache.key(query.question) for query in queries]
+    filters = [{"source": query.source} if query.source else None for query in queries]
+    results = [query_cache.get_results(key, query.top_k, query_filters)
+               for key, query, query_filters in zip(keys, queries, filters)]
+    missing = [idx for idx, laws in enumerate(results) if laws is None]
+    if not missing:
+        return results
+
+    embeddings = await embed_questions(request, [queries[idx].question for idx in missing])
+    with span("search"):
+        found = await run_blocking(
+            request,
+            search_laws_by_vectors,
+            [(embedding, queries[idx].top_k, queries[idx].question, queries[idx].source) for idx, embedding in zip(missing, embeddings)],
+            request.app.state.article_cache,
+            request.app.state.lexical_index
+        )
+    for idx, laws in zip(missing, found):
+        results[idx] = laws
+        query_cache.put_results(keys[idx], queries[idx].top_k, laws, filters[idx])
+    return results
+
+
+def format_sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 @app.post("/ask", response_model=QAResponse)
 async def generate_answer(request: Request, query: QueryRequest):
     # Retrieve relevant laws
-    laws = search_laws(
-        query.question,
-        request.app.state.embedder,
-        query.top_k
-    )
+    query_embedding = await embed_question(request, query.question)
+    laws = await retrieve_laws(request, query.question, query.top_k, query_embedding, query.source)
+
+    # Reuse the answer to a paraphrase of this question that was answered from the same laws
+    answer_cache = request.app.state.answer_cache
+    article_key = answer_cache.article_key(laws)
+    if not query.bypass_cache:
+        with span("answer_cache"):
+            cached_answer = answer_cache.get(query_embedding, article_key)
+        if cached_answer is not None:
+            return QAResponse(answer=cached_answer, context=laws, cached=True)
     
     # Generate LLM prompt
-    prompt = format_prompt(query.question, laws)
+    prompt = build_prompt(request, query.question, laws)
 
     print("Asking LLM...")
-    answer = app.state.generator.chat.completions.create(
-        model="deepseek-chat",
-        messages=prompt,
-        stream=False
-    )
+    try:
+        with span("llm"):
+            answer_text = await request.app.state.llm.complete(prompt)
+    except APIError as e:
+        print(f"Error getting LLM answer: {e}")
+        raise HTTPException(status_code=502, detail="LLM request failed")
+    answer_cache.put(query_embedding, article_key, answer_text)
     
     return QAResponse(
-        answer=answer.choices[0].message.content,
+        answer=answer_text,
         context=laws
     )
 
+@app.post("/ask/stream")
+async def generate_answer_stream(request: Request, query: QueryRequest):
+    """
+    Server-sent events variant of /ask: a `context` event with the retrieved laws is sent as soon as
+    retrieval finishes, followed by one `token` event per generated fragment and a final `done` event.
+    """
+    query_embedding = await embed_question(request, query.question)
+    laws = await retrieve_laws(request, query.question, query.top_k, query_embedding, query.source)
+
+    answer_cache = request.app.state.answer_cache
+    article_key = answer_cache.article_key(laws)
+    with span("answer_cache"):
+        cached_answer = None if query.bypass_cache else answer_cache.get(query_embedding, article_key)
+    # Cached answers need no prompt, skip packing the context
+    prompt = build_prompt(request, query.question, laws) if cached_answer is None else None
+
+    async def events():
+        yield format_sse("context", [LawResult(**law).model_dump() for law in laws])
+        if cached_answer is not None:
+            yield format_sse("token", {"content": cached_answer})
+            yield format_sse("done", {"cached": True})
+            return
+
+        fragments = []
+        llm_start = time.perf_counter()
+        try:
+            async for fragment in request.app.state.llm.stream(prompt):
+                if not fragments:
+                    metrics.observe_stage("/ask/stream", "llm_first_token", time.perf_counter() - llm_start)
+                fragments.append(fragment)
+                yield format_sse("token", {"content": fragment})
+        except Exception as e:
+            print(f"Error streaming LLM answer: {e}")
+            yield format_sse("error", {"detail": "LLM request failed"})
+            return
+        metrics.observe_stage("/ask/stream", "llm", time.perf_counter() - llm_start)
+        answer_cache.put(query_embedding, article_key, "".join(fragments))
+        yield format_sse("done", {"cached": False})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/query", response_model=List[LawResult])
 async def query_laws(request: Request, query_request: QueryRequest):
     """Original semantic search endpoint"""
-    results = search_laws(
-        query_request.question,
-        request.app.state.embedder,
-        query_request.top_k
-    )
+    results = await retrieve_laws(request, query_request.question, query_request.top_k, source=query_request.source)
     return results
 
+@app.post("/query/batch", response_model=List[List[LawResult]])
+async def query_laws_batch(request: Request, batch: BatchQueryRequest):
+    """
+    Search many questions at once. The results are returned in the order of the questions, or with `stream`
+    as NDJSON lines {"index", "results"} (or {"index", "error"}) sent as every chunk of questions is searched,
+    so the server never holds the results of the whole batch.
+    """
+    if not batch.stream:
+        return await retrieve_laws_batch(request, batch.queries)
+
+    async def lines():
+        for start in range(0, len(batch.queries), QUERY_BATCH_STREAM_CHUNK):
+            queries = batch.queries[start:start + QUERY_BATCH_STREAM_CHUNK]
+            try:
+                results = await retrieve_laws_batch(request, queries)
+            except Exception as e:
+                print(f"Error searching batch queries {start}-{start + len(queries) - 1}: {e}")
+                for idx in range(start, start + len(queries)):
+                    yield json.dumps({"index": idx, "error": "Search failed"}) + "\n"
+                continue
+            for idx, laws in enumerate(results, start):
+                yield json.dumps({"index": idx, "results": laws}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.get("/stats")
+async def stats(request: Request):
+    """Internal statistics of the embedding batcher, the caches and the LLM gateway"""
+    article_cache = request.app.state.article_cache
+    return {
+        "embedding_batcher": request.app.state.embedding_batcher.stats(),
+        "query_cache": request.app.state.query_cache.stats(),
+        "answer_cache": request.app.state.answer_cache.stats(),
+        "llm": request.app.state.llm.stats(),
+        "article_cache": article_cache.stats() if article_cache is not None else None,
+    }
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Request and stage latency histograms in the Prometheus text format"""
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+
+def get_profiler(request: Request) -> SamplingProfiler:
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler disabled, set PROFILER_ENABLED=true")
+    return request.app.state.profiler
+
+
+@app.post("/debug/profiler/start")
+async def start_profiler(request: Request, interval_ms: Optional[float] = None):
+    """Start sampling the stacks of every thread (previous samples are discarded)"""
+    profiler = get_profiler(request)
+    profiler.start(interval_ms)
+    return profiler.stats()
+
+
+@app.post("/debug/profiler/stop")
+async def stop_profiler(request: Request, limit: int = 30):
+    """Stop sampling and return the functions with the most samples"""
+    profiler = get_profiler(request)
+    profiler.stop()
+    return {**profiler.stats(), "top": profiler.top(limit)}
+
+
+@app.get("/debug/profiler/collapsed", response_class=PlainTextResponse)
+async def collapsed_profile(request: Request):
+    """Samples of the last profiling session in collapsed stack format, for flame graphs"""
+    return get_profiler(request).collapsed()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
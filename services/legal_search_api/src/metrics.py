@@ -0,0 +1,39 @@
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from core.timing import set_span_observer
+
+
+# Latency buckets in seconds, from cache hits to slow LLM answers
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+REQUEST_SECONDS = Histogram(
+    "legal_search_request_seconds", "Time to produce the response of a request (streamed bodies excluded)",
+    ["endpoint", "method", "status"], buckets=LATENCY_BUCKETS
+)
+STAGE_SECONDS = Histogram(
+    "legal_search_stage_seconds", "Time spent in each stage of a request",
+    ["endpoint", "stage"], buckets=LATENCY_BUCKETS
+)
+
+CONTEXT_TOKENS = Counter(
+    "legal_search_context_tokens", "Tokens of law text retrieved for /ask prompts (raw) and kept after packing (packed)",
+    ["kind"]
+)
+
+LLM_WAITING = Gauge("legal_search_llm_waiting", "LLM calls waiting for a concurrency slot")
+LLM_IN_FLIGHT = Gauge("legal_search_llm_in_flight", "LLM calls (and open streams) running upstream")
+LLM_CALLS = Counter("legal_search_llm_calls", "Upstream LLM requests by outcome (success, retry or failure)", ["outcome"])
+LLM_COALESCED = Counter("legal_search_llm_coalesced", "Prompts answered by an identical upstream call already in flight")
+
+
+def observe_stage(endpoint: str, stage: str, seconds: float):
+    STAGE_SECONDS.labels(endpoint, stage).observe(seconds)
+
+
+def install():
+    """Feed the spans of every request into STAGE_SECONDS"""
+    set_span_observer(observe_stage)
+
+
+def render():
+    """Body and content type of the Prometheus text exposition of every metric"""
+    return generate_latest(), CONTENT_TYPE_LATEST
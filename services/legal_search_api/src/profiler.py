@@ -0,0 +1,84 @@
+import sys
+import time
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+
+
+class SamplingProfiler:
+    def __init__(self, interval_ms: float = 5.0, max_depth: int = 64):
+        """
+        Statistical profiler sampling the stack of every thread from a background thread. It can be started and
+        stopped at runtime, so it only costs anything while a hot path is being analysed.
+
+        :param interval_ms: Time between two samples.
+        :param max_depth: Maximum number of frames kept per stack, innermost first.
+        """
+        self.interval = interval_ms / 1000
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, interval_ms: Optional[float] = None):
+        """Clears the previous samples and starts sampling"""
+        with self._lock:
+            if self.running:
+                return
+            if interval_ms is not None:
+                self.interval = interval_ms / 1000
+            self.stacks.clear()
+            self.samples = 0
+            self.started_at = time.time()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            if not self.running:
+                return
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Samples in the collapsed stack format read by flame graph tools"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def top(self, limit: int = 30) -> List[Dict]:
+        """Functions most often on top of a stack (self time), with their share of the samples"""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        return [{"function": function, "samples": count, "share": count / total} for function, count in leaves.most_common(limit)]
+
+    def stats(self) -> Dict:
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "started_at": self.started_at,
+        }
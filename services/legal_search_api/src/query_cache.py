@@ -0,0 +1,61 @@
+from typing import Dict, List, Optional
+from core.cache import LRUCache
+from core.text import normalize_question
+
+
+class QueryCache:
+    def __init__(self, embedding_maxsize: int, embedding_ttl: Optional[float], result_maxsize: int, result_ttl: Optional[float]):
+        """
+        Initializes a two-level cache for repeated questions.
+
+        The first level maps the normalized question text to its embedding, the second maps
+        (normalized question, top_k, filters) to the hydrated search results.
+
+        :param embedding_maxsize: Maximum number of cached embeddings (0 disables the level).
+        :param embedding_ttl: Time to live of an embedding, in seconds.
+        :param result_maxsize: Maximum number of cached result lists (0 disables the level).
+        :param result_ttl: Time to live of a result list, in seconds.
+        """
+        self.embeddings = LRUCache(embedding_maxsize, embedding_ttl)
+        self.results = LRUCache(result_maxsize, result_ttl)
+        self.versions = None
+
+    @staticmethod
+    def key(question: str) -> str:
+        return normalize_question(question)
+
+    @staticmethod
+    def _result_key(key: str, top_k: int, filters: Optional[Dict]):
+        return key, top_k, tuple(sorted((filters or {}).items()))
+
+    def get_embedding(self, key: str) -> Optional[List[float]]:
+        return self.embeddings.get(key)
+
+    def put_embedding(self, key: str, embedding: List[float]):
+        self.embeddings.put(key, embedding)
+
+    def get_results(self, key: str, top_k: int, filters: Optional[Dict] = None) -> Optional[List[Dict]]:
+        """
+        Returns cached results. The returned list is shared between requests and must not be modified.
+        """
+        return self.results.get(self._result_key(key, top_k, filters))
+
+    def put_results(self, key: str, top_k: int, results: List[Dict], filters: Optional[Dict] = None):
+        self.results.put(self._result_key(key, top_k, filters), results)
+
+    def check_versions(self, versions: Dict[str, int]):
+        """
+        Clears both levels when the data versions (e.g. of the articles or the embeddings collection) changed.
+        """
+        if self.versions is not None and versions != self.versions:
+            print(f"Data versions changed to {versions}, clearing query cache...")
+            self.embeddings.clear()
+            self.results.clear()
+        self.versions = versions
+
+    def stats(self) -> Dict:
+        return {
+            "embeddings": self.embeddings.stats(),
+            "results": self.results.stats(),
+            "versions": self.versions,
+        }
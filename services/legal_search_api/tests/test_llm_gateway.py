@@ -0,0 +1,81 @@
+import asyncio
+import httpx
+import pytest
+from openai import AsyncOpenAI, RateLimitError
+
+pytest.importorskip("prometheus_client")
+
+from src import fake_llm
+from src.llm_gateway import LLMGateway
+
+
+@pytest.fixture(autouse=True)
+def fast_fake_llm(monkeypatch):
+    monkeypatch.setattr(fake_llm, "FAKE_LLM_FIRST_TOKEN_DELAY", 0.05)
+    monkeypatch.setattr(fake_llm, "FAKE_LLM_TOKEN_DELAY", 0.0)
+    monkeypatch.setattr(fake_llm, "FAKE_LLM_ERROR_RATE", 0.0)
+    fake_llm.app.state.requests = fake_llm.app.state.rejected = fake_llm.app.state.max_in_flight = 0
+
+
+def make_gateway(**kwargs) -> LLMGateway:
+    """Gateway talking to the fake LLM in-process"""
+    gateway = LLMGateway("http://fake-llm/v1", "x", "fake-model", **kwargs)
+    gateway.http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake_llm.app))
+    gateway.client = AsyncOpenAI(api_key="x", base_url="http://fake-llm/v1", http_client=gateway.http_client, max_retries=0)
+    return gateway
+
+
+def prompt(idx: int):
+    return [{"role": "user", "content": f"Intrebarea {idx}\nLink: https://legislatie.just.ro/{idx}"}]
+
+
+async def burst(gateway: LLMGateway, prompts):
+    try:
+        return await asyncio.gather(*(gateway.complete(messages) for messages in prompts))
+    finally:
+        await gateway.close()
+
+
+def test_identical_prompts_share_one_call():
+    gateway = make_gateway()
+    answers = asyncio.run(burst(gateway, [prompt(0)] * 20))
+    assert len(set(answers)) == 1
+    assert "https://legislatie.just.ro/0" in answers[0]
+    assert fake_llm.app.state.requests == 1
+    assert gateway.stats()["coalesced"] == 19
+    assert gateway.stats()["coalescing"] == 0
+
+
+def test_concurrency_is_bounded():
+    gateway = make_gateway(max_concurrency=3)
+    answers = asyncio.run(burst(gateway, [prompt(idx) for idx in range(12)]))
+    assert all(f"https://legislatie.just.ro/{idx}" in answer for idx, answer in enumerate(answers))
+    assert fake_llm.app.state.requests == 12
+    assert fake_llm.app.state.max_in_flight == 3
+    assert gateway.stats()["in_flight"] == 0
+
+
+def test_rate_limited_calls_are_retried(monkeypatch):
+    monkeypatch.setattr(fake_llm, "FAKE_LLM_ERROR_RATE", 1.0)
+    monkeypatch.setattr(fake_llm, "FAKE_LLM_RETRY_AFTER", "0.01")
+    gateway = make_gateway(max_retries=2)
+    with pytest.raises(RateLimitError):
+        asyncio.run(burst(gateway, [prompt(0)] * 3))
+    assert fake_llm.app.state.requests == 3
+    assert gateway.stats()["retries"] == 2
+    assert gateway.stats()["failures"] == 1
+
+
+def test_stream():
+    gateway = make_gateway()
+
+    async def collect():
+        try:
+            return [fragment async for fragment in gateway.stream(prompt(1))]
+        finally:
+            await gateway.close()
+
+    fragments = asyncio.run(collect())
+    assert len(fragments) > 1
+    assert "".join(fragments) == fake_llm.fake_answer(prompt(1))
+    assert gateway.stats()["in_flight"] == 0
@@ -0,0 +1,49 @@
+import os
+from core.lexical_index import LexicalIndex, CURRENT_FILE
+
+
+ARTICLES = [
+    (1, "Articolul 1", "Evaziunea fiscală se pedepsește cu închisoare."),
+    (2, "Articolul 2", "Concediul de odihnă anual este de cel puțin 20 de zile lucrătoare."),
+    (3, "Articolul 3", "Contractul individual de muncă se încheie în formă scrisă."),
+]
+
+
+def test_search_folds_diacritics_and_stems():
+    index = LexicalIndex.build(ARTICLES)
+    assert index.search("evaziune fiscala")[0][0] == 1
+    assert index.search("concediului de odihna")[0][0] == 2
+    assert index.search("inexistent") == []
+
+
+def test_update_replaces_articles():
+    index = LexicalIndex.build(ARTICLES).update([(1, "Articolul 1", "Salariul minim se stabilește prin hotărâre.")])
+    assert index.search("evaziune") == []
+    assert index.search("salariul")[0][0] == 1
+    assert len(index.doc_ids) == 3
+
+
+def test_save_load_round_trip(tmp_path):
+    path = str(tmp_path)
+    assert not LexicalIndex.exists(path)
+    LexicalIndex.build(ARTICLES).save(path)
+    assert LexicalIndex.exists(path)
+    loaded = LexicalIndex.load(path)
+    assert loaded.search("contractul de munca")[0][0] == 3
+
+
+def test_save_keeps_previous_version(tmp_path):
+    path = str(tmp_path)
+    index = LexicalIndex.build(ARTICLES)
+    index.save(path)
+    first = open(os.path.join(path, CURRENT_FILE)).read()
+    # A reader of the first version keeps its memory-mapped files while the next version is written
+    reader = LexicalIndex.load(path)
+    index.update([(4, "Articolul 4", "Dreptul la grevă este garantat.")]).save(path)
+    assert os.path.isdir(os.path.join(path, first))
+    assert reader.search("greva") == []
+    assert LexicalIndex.load(path).search("greva")[0][0] == 4
+
+    LexicalIndex.load(path, mmap=False).update([(5, "Articolul 5", "Text nou.")]).save(path)
+    assert not os.path.exists(os.path.join(path, first))
+    assert len([name for name in os.listdir(path) if name != CURRENT_FILE]) == 2
@@ -0,0 +1,141 @@
+import atexit
+import numpy as np
+import pytest
+from qdrant_client.http import models
+from core.local_index import LocalVectorIndex
+
+
+DIM = 8
+COLLECTION = "test_collection"
+
+
+def make_index(path, quantization="none") -> LocalVectorIndex:
+    index = LocalVectorIndex(str(path), quantization=quantization)
+    # Only what a test flushes explicitly is saved
+    atexit.unregister(index.flush)
+    if not index.collection_exists(COLLECTION):
+        index.create_collection(COLLECTION, models.VectorParams(size=DIM, distance=models.Distance.COSINE))
+    return index
+
+
+def points(count: int, source: str = "a"):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(count, DIM)).astype(np.float32)
+    return vectors, [
+        models.PointStruct(id=idx, vector=vector.tolist(), payload={"article_id": idx, "source": source})
+        for idx, vector in enumerate(vectors)
+    ]
+
+
+def search_ids(index: LocalVectorIndex, vector, limit=5, query_filter=None):
+    response = index.query_points(COLLECTION, vector.tolist(), limit=limit, query_filter=query_filter)
+    return [point.id for point in response.points]
+
+
+def test_search_returns_nearest_first(tmp_path):
+    index = make_index(tmp_path)
+    vectors, batch = points(20)
+    index.upsert(COLLECTION, batch)
+    for idx in (0, 7, 19):
+        assert search_ids(index, vectors[idx])[0] == str(idx)
+
+
+def test_save_reload_round_trip(tmp_path):
+    index = make_index(tmp_path)
+    vectors, batch = points(20)
+    index.upsert(COLLECTION, batch)
+    index.flush()
+
+    reloaded = make_index(tmp_path)
+    assert reloaded.get_collection(COLLECTION)["points_count"] == 20
+    assert search_ids(reloaded, vectors[3])[0] == "3"
+    record = reloaded.retrieve(COLLECTION, ["3"])[0]
+    assert record.payload == {"article_id": 3, "source": "a"}
+
+
+def test_delete_after_reload(tmp_path):
+    index = make_index(tmp_path)
+    vectors, batch = points(20)
+    index.upsert(COLLECTION, batch)
+    index.flush()
+
+    # The reloaded vectors are a read-only memory map
+    reloaded = make_index(tmp_path)
+    reloaded.delete(COLLECTION, models.PointIdsList(points=["3", "4"]))
+    assert "3" not in search_ids(reloaded, vectors[3], limit=20)
+    assert reloaded.retrieve(COLLECTION, ["3", "4"]) == []
+    assert reloaded.get_collection(COLLECTION)["points_count"] == 18
+
+    reloaded.flush()
+    compacted = make_index(tmp_path)
+    assert compacted.get_collection(COLLECTION)["points_count"] == 18
+    assert search_ids(compacted, vectors[5])[0] == "5"
+    assert "4" not in search_ids(compacted, vectors[4], limit=20)
+
+
+def test_upsert_after_reload_replaces_point(tmp_path):
+    index = make_index(tmp_path)
+    vectors, batch = points(10)
+    index.upsert(COLLECTION, batch)
+    index.flush()
+
+    reloaded = make_index(tmp_path)
+    reloaded.upsert(COLLECTION, [models.PointStruct(id=0, vector=vectors[9].tolist(), payload={"article_id": 0, "source": "b"})])
+    assert reloaded.get_collection(COLLECTION)["points_count"] == 10
+    assert set(search_ids(reloaded, vectors[9], limit=2)) == {"0", "9"}
+
+
+def test_filter(tmp_path):
+    index = make_index(tmp_path)
+    vectors, batch = points(10)
+    index.upsert(COLLECTION, batch)
+    _, other = points(10, source="b")
+    index.upsert(COLLECTION, [models.PointStruct(id=idx + 10, vector=point.vector, payload={**point.payload, "article_id": idx + 10})
+                              for idx, point in enumerate(other)])
+    query_filter = models.Filter(must=[models.FieldCondition(key="source", match=models.MatchValue(value="b"))])
+    ids = search_ids(index, vectors[2], limit=20, query_filter=query_filter)
+    assert len(ids) == 10
+    assert all(int(point_id) >= 10 for point_id in ids)
+
+
+def test_int8_search_after_reload(tmp_path):
+    index = make_index(tmp_path, quantization="int8")
+    vectors, batch = points(50)
+    index.upsert(COLLECTION, batch)
+    index.flush()
+
+    reloaded = make_index(tmp_path, quantization="int8")
+    reloaded.delete(COLLECTION, models.PointIdsList(points=["1"]))
+    assert search_ids(reloaded, vectors[2])[0] == "2"
+    assert "1" not in search_ids(reloaded, vectors[1], limit=50)
+
+
+def test_reload_reads_collection_saved_by_another_process(tmp_path):
+    reader = make_index(tmp_path)
+    vectors, batch = points(10)
+    writer = make_index(tmp_path)
+    writer.upsert(COLLECTION, batch)
+    writer.flush()
+    # The reader loaded the empty collection before the writer saved its points
+    assert reader.get_collection(COLLECTION)["points_count"] == 0
+
+    reader.reload()
+    assert reader.get_collection(COLLECTION)["points_count"] == 10
+    assert search_ids(reader, vectors[4])[0] == "4"
+
+
+def test_reload_keeps_unsaved_changes(tmp_path):
+    index = make_index(tmp_path)
+    _, batch = points(5)
+    index.upsert(COLLECTION, batch)
+    index.reload()
+    assert index.get_collection(COLLECTION)["points_count"] == 5
+
+
+def test_unsupported_filter_condition(tmp_path):
+    index = make_index(tmp_path)
+    vectors, batch = points(5)
+    index.upsert(COLLECTION, batch)
+    query_filter = models.Filter(should=[models.FieldCondition(key="article_id", range=models.Range(gte=2))])
+    with pytest.raises(ValueError, match="Unsupported filter condition"):
+        search_ids(index, vectors[0], query_filter=query_filter)
@@ -0,0 +1,50 @@
+import pytest
+from core.postgres_db import init_engine, create_schema, bulk_upsert_articles, get_data_version, bump_data_version
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    engine = init_engine(f"sqlite:///{tmp_path / 'articles.db'}")
+    yield engine
+    engine.dispose()
+
+
+def article(article_id: str, body: str, source="CODUL_PENAL"):
+    return {
+        "source": source,
+        "article_id": article_id,
+        "article_title": f"Articolul {article_id}",
+        "article_body": body,
+        "part": None,
+        "title": None,
+        "chapter": None,
+        "section": None,
+        "link": f"https://legislatie.just.ro/{source}#{article_id}",
+    }
+
+
+def test_upsert_counts(sqlite_db):
+    create_schema()
+    first = bulk_upsert_articles([article("1", "a"), article("2", "b"), article("3", "c")], batch_size=2)
+    assert (first["inserted"], first["updated"], first["unchanged"]) == (3, 0, 0)
+    assert len(first["touched_ids"]) == 3
+
+    second = bulk_upsert_articles([article("1", "a"), article("2", "b changed"), article("4", "d")], batch_size=2)
+    assert (second["inserted"], second["updated"], second["unchanged"]) == (1, 1, 1)
+    assert len(second["touched_ids"]) == 2
+
+
+def test_last_version_of_a_duplicate_wins(sqlite_db):
+    create_schema()
+    result = bulk_upsert_articles([article("1", "old"), article("1", "new")])
+    assert (result["inserted"], result["updated"], result["unchanged"]) == (1, 0, 0)
+    again = bulk_upsert_articles([article("1", "new")])
+    assert again["unchanged"] == 1
+
+
+def test_data_version_before_schema(sqlite_db):
+    # Readers such as the search API may start before data processing created the schema
+    assert get_data_version("articles") == 0
+    create_schema()
+    assert bump_data_version("articles") == 1
+    assert get_data_version("articles") == 1